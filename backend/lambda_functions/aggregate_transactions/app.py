@@ -0,0 +1,161 @@
+import boto3
+import os
+import time
+from datetime import datetime
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+transaction_rollups_table_name = os.environ.get('TRANSACTION_ROLLUPS_TABLE_NAME')
+
+deserializer = TypeDeserializer()
+
+# Stream records are delivered at least once. Each applied transaction leaves a marker
+# for longer than the stream's 24 hour retention so a redelivered record is not counted twice.
+APPLIED_MARKER_TTL_SECONDS = 48 * 60 * 60
+
+# Payment statuses under which the money is no longer the producer's: refunded, or
+# withdrawn for a dispute that is still open or was lost
+REVERSED_PAYMENT_STATUSES = {'Refunded', 'Disputed', 'DisputeLost'}
+
+def lambda_handler(event, context):
+    """
+    Triggered by INSERT and MODIFY records on the Transactions table stream. Adds each
+    transaction to its producer's and charging point's daily rollup with atomic counters,
+    and moves the rollup's earnings when a later refund or dispute changes the amount kept.
+    """
+    batch_item_failures = []
+    applied = 0
+
+    for record in event.get('Records', []):
+        if record.get('eventName') not in ('INSERT', 'MODIFY'):
+            continue
+
+        # A successful payment's item can be created by Stripe webhook reconciliation before
+        # its audit record arrives; it is counted once, when it first names its producer
+        old_image = record['dynamodb'].get('OldImage')
+        old_transaction = deserialize_image(old_image) if old_image else None
+        transaction = deserialize_image(record['dynamodb']['NewImage'])
+        try:
+            if old_transaction and build_rollup_keys(old_transaction):
+                is_applied = apply_earnings_adjustment(transaction, old_transaction)
+            else:
+                is_applied = apply_transaction(transaction)
+            if is_applied:
+                applied += 1
+        except ClientError as e:
+            print(f"Error rolling up transaction {transaction.get('transactionId')}: {e.response['Error']['Message']}")
+            batch_item_failures.append({'itemIdentifier': record['dynamodb']['SequenceNumber']})
+
+    print(f"Applied {applied} transactions to rollups, {len(batch_item_failures)} failed")
+
+    return {'batchItemFailures': batch_item_failures}
+
+def apply_transaction(transaction):
+    """
+    Write the applied marker and the rollup increments in one DynamoDB transaction.
+    Returns False when the transaction has nothing to roll up or was already applied.
+    """
+    rollup_keys = build_rollup_keys(transaction)
+    if not rollup_keys:
+        return False
+
+    day = transaction['timestamp'][:10]
+    is_successful = bool(transaction.get('isSuccessful'))
+    updated_at = datetime.now().isoformat()
+
+    transact_items = [build_applied_marker(f"transaction#{transaction['transactionId']}")]
+    for rollup_key in rollup_keys:
+        transact_items.append({
+            'Update': {
+                'TableName': transaction_rollups_table_name,
+                'Key': {'rollupKey': rollup_key, 'day': day},
+                'UpdateExpression': "SET producerId = :producer_id, updatedAt = :updated_at "
+                                    "ADD transactionCount :one, successfulCount :successful, failedCount :failed, totalAmount :amount",
+                'ExpressionAttributeValues': {
+                    ':producer_id': transaction['producerId'],
+                    ':updated_at': updated_at,
+                    ':one': 1,
+                    ':successful': 1 if is_successful else 0,
+                    ':failed': 0 if is_successful else 1,
+                    # Only money actually taken and kept counts towards earnings
+                    ':amount': get_earned_amount(transaction)
+                }
+            }
+        })
+
+    return write_rollups(transact_items)
+
+def apply_earnings_adjustment(transaction, old_transaction):
+    """
+    Move an already counted transaction's earnings by the change in the amount kept,
+    on the day it was counted. Each payment status event is applied once.
+    Returns False when the change does not affect earnings or was already applied.
+    """
+    earned_delta = get_earned_amount(transaction) - get_earned_amount(old_transaction)
+    if not earned_delta or not transaction.get('paymentStatusEventId'):
+        return False
+
+    day = old_transaction['timestamp'][:10]
+    updated_at = datetime.now().isoformat()
+
+    transact_items = [build_applied_marker(f"transaction#{transaction['transactionId']}#{transaction['paymentStatusEventId']}")]
+    for rollup_key in build_rollup_keys(old_transaction):
+        transact_items.append({
+            'Update': {
+                'TableName': transaction_rollups_table_name,
+                'Key': {'rollupKey': rollup_key, 'day': day},
+                'UpdateExpression': "SET updatedAt = :updated_at ADD totalAmount :amount",
+                'ExpressionAttributeValues': {
+                    ':updated_at': updated_at,
+                    ':amount': earned_delta
+                }
+            }
+        })
+
+    return write_rollups(transact_items)
+
+def build_applied_marker(marker_key):
+    return {
+        'Put': {
+            'TableName': transaction_rollups_table_name,
+            'Item': {
+                'rollupKey': marker_key,
+                'day': 'applied',
+                'expiresAt': int(time.time()) + APPLIED_MARKER_TTL_SECONDS
+            },
+            'ConditionExpression': 'attribute_not_exists(rollupKey)'
+        }
+    }
+
+def write_rollups(transact_items):
+    try:
+        dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'TransactionCanceledException' and is_already_applied(e):
+            return False
+        raise
+
+    return True
+
+def get_earned_amount(transaction):
+    if not transaction.get('isSuccessful') or transaction.get('paymentStatus') in REVERSED_PAYMENT_STATUSES:
+        return 0
+    return max((transaction.get('amount') or 0) - (transaction.get('amountRefunded') or 0), 0)
+
+def deserialize_image(image):
+    return {key: deserializer.deserialize(value) for key, value in image.items()}
+
+def build_rollup_keys(transaction):
+    # Requests rejected before the producer was known are not attributable to anyone
+    if not transaction.get('producerId') or not transaction.get('timestamp'):
+        return []
+
+    rollup_keys = [f"producer#{transaction['producerId']}"]
+    if transaction.get('chargingPointId'):
+        rollup_keys.append(f"chargingPoint#{transaction['chargingPointId']}")
+    return rollup_keys
+
+def is_already_applied(error):
+    cancellation_reasons = error.response.get('CancellationReasons', [])
+    return bool(cancellation_reasons) and cancellation_reasons[0].get('Code') == 'ConditionalCheckFailed'
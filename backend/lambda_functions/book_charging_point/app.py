@@ -1,14 +1,20 @@
 import json
 import boto3
 import os
+import threading
+import time
 import uuid
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from botocore.exceptions import ClientError
 import requests
 
 dynamodb = boto3.resource('dynamodb')
 charging_points_table = dynamodb.Table(os.environ.get('CHARGING_POINTS_TABLE_NAME'))
 bookings_table = dynamodb.Table(os.environ.get('BOOKINGS_TABLE_NAME'))
+# Optional: shares circuit breaker state between concurrent Lambda containers
+cpo_health_table = dynamodb.Table(os.environ['CPO_HEALTH_TABLE_NAME']) if os.environ.get('CPO_HEALTH_TABLE_NAME') else None
 
 ssm_client = boto3.client('ssm')
 secrets_client = boto3.client('secretsmanager')
@@ -22,6 +28,40 @@ cors_header = {
     'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token'
 }
 
+MAX_BULK_BOOKING_SLOTS = 100
+# get_charging_point_availability relies on this bound to find bookings overlapping a window
+MAX_BOOKING_DURATION = timedelta(hours=24)
+CPO_FAN_OUT_WORKERS = 8
+
+# Parameters holding each CPO's bulk reservation endpoint, if it offers one
+BULK_API_URL_PARAMETERS = {
+    'Virta': 'VIRTA_BULK_API_URL',
+    'EVBox': 'EVBOX_BULK_API_URL',
+    'Siemens': 'GENERIC_CPO_BULK_API_URL',
+    'Schneider Electric': 'GENERIC_CPO_BULK_API_URL',
+}
+
+CPO_REQUEST_TIMEOUT_SECONDS = 5
+
+# Circuit breaker thresholds, evaluated over the most recent calls to each CPO backend
+CIRCUIT_WINDOW_SIZE = 20
+CIRCUIT_MIN_CALLS = 5
+CIRCUIT_ERROR_RATE_THRESHOLD = 0.5
+CIRCUIT_SLOW_CALL_SECONDS = 3
+CIRCUIT_SLOW_CALL_RATE_THRESHOLD = 0.5
+CIRCUIT_OPEN_SECONDS = 30
+SHARED_CIRCUIT_REFRESH_SECONDS = 5
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+circuit_breakers = {}
+circuit_breakers_lock = threading.Lock()
+
+class CpoUnavailableError(Exception):
+    pass
+
 def lambda_handler(event, context):
     # Handle CORS preflight requests (OPTIONS)
     if event['httpMethod'] == 'OPTIONS':
@@ -40,13 +80,23 @@ def lambda_handler(event, context):
         start_time = event_body['startTime']
         end_time = event_body['endTime']
 
+        try:
+            validate_booking_duration(parse_timestamp(start_time), parse_timestamp(end_time))
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': cors_header, 
+                'body': json.dumps({'error': str(e)})
+            }
+
         reservation_response = book_charging_point(system, oocp_charge_point_id, connector_id, start_time, end_time)
         
         if reservation_response.get('status') == 'success':
             timestamp = datetime.now().isoformat()
 
-            update_dynamodb_charging_points_table_status(oocp_charge_point_id, False, timestamp, consumer_id)
+            # The status update comes last: it invalidates cached availability timelines
             log_booking_to_dynamodb(consumer_id, oocp_charge_point_id, start_time, end_time, timestamp)
+            update_dynamodb_charging_points_table_status(oocp_charge_point_id, False, timestamp, consumer_id)
             return {
                 'statusCode': 200,
                 'headers': cors_header, 
@@ -54,7 +104,14 @@ def lambda_handler(event, context):
             }
         else:
             raise Exception(f"Reservation failed: {reservation_response.get('message')}")
-    
+
+    except CpoUnavailableError as e:
+        print(f"Error: {str(e)}")
+        return {
+            'statusCode': 503,
+            'headers': cors_header, 
+            'body': json.dumps({'error': str(e)})
+        }
     except Exception as e:
         print(f"Error: {str(e)}")
         return {
@@ -63,6 +120,101 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': str(e)})
         }
 
+def bulk_lambda_handler(event, context):
+    # Handle CORS preflight requests (OPTIONS)
+    if event['httpMethod'] == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': cors_header
+        }
+
+    try:
+        event_body = json.loads(event['body'])
+
+        consumer_id = event_body.get('consumerId')
+        slots = event_body.get('slots', [])
+
+        if not consumer_id or not slots:
+            return {
+                'statusCode': 400,
+                'headers': cors_header, 
+                'body': json.dumps({'error': 'consumerId and slots are required'})
+            }
+        if len(slots) > MAX_BULK_BOOKING_SLOTS:
+            return {
+                'statusCode': 400,
+                'headers': cors_header, 
+                'body': json.dumps({'error': f'At most {MAX_BULK_BOOKING_SLOTS} slots can be booked per request'})
+            }
+
+        results = [None] * len(slots)
+        valid_slots = validate_booking_slots(slots, results)
+
+        # One CPO round trip (or one concurrent fan-out) per backend
+        slots_by_system = {}
+        for slot in valid_slots:
+            slots_by_system.setdefault(slot['system'], []).append(slot)
+
+        reserved_slots = []
+        for system, system_slots in slots_by_system.items():
+            try:
+                reservation_responses = book_charging_points_for_system(system, system_slots)
+            except Exception as e:
+                reservation_responses = [{'status': 'failure', 'message': str(e)}] * len(system_slots)
+
+            for slot, reservation_response in zip(system_slots, reservation_responses):
+                if reservation_response.get('status') == 'success':
+                    reserved_slots.append((slot, reservation_response.get('message')))
+                else:
+                    results[slot['index']] = build_slot_result(slot, 'failed', error=f"Reservation failed: {reservation_response.get('message')}")
+
+        booked_slots = []
+        if reserved_slots:
+            timestamp = datetime.now().isoformat()
+            booking_items = [
+                build_booking_item(consumer_id, slot['oocpChargePointId'], slot['startTime'], slot['endTime'], timestamp)
+                for slot, _ in reserved_slots
+            ]
+            write_errors = log_bookings_to_dynamodb(booking_items)
+
+            for (slot, reservation), item, write_error in zip(reserved_slots, booking_items, write_errors):
+                if write_error:
+                    # The CPO holds the reservation but we have no booking for it. There is no
+                    # CPO cancellation API, so report the reservation for it to be released
+                    print(f"Unrecorded CPO reservation for consumer {consumer_id}, slot {slot['index']}: {reservation}")
+                    results[slot['index']] = build_slot_result(
+                        slot, 'unrecorded',
+                        error=f"Reserved with the CPO but the booking could not be recorded: {write_error}"
+                    )
+                else:
+                    booked_slots.append(slot)
+                    results[slot['index']] = build_slot_result(slot, 'booked', booking_id=item['bookingId'])
+
+            for oocp_charge_point_id in {slot['oocpChargePointId'] for slot in booked_slots}:
+                try:
+                    update_dynamodb_charging_points_table_status(oocp_charge_point_id, False, timestamp, consumer_id)
+                except Exception as e:
+                    # The bookings are recorded; availability catches up on the next update
+                    print(f"Error: {str(e)}")
+
+        return {
+            'statusCode': 200,
+            'headers': cors_header, 
+            'body': json.dumps({
+                'bookedCount': len(booked_slots),
+                'results': results
+            })
+        }
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_header, 
+            'body': json.dumps({'error': str(e)})
+        }
+
+
 def book_charging_point(system, oocp_charge_point_id, connector_id, start_time, end_time):
     if system == 'Virta':
         return book_virta_charging_point(oocp_charge_point_id, connector_id, start_time, end_time)
@@ -74,47 +226,317 @@ def book_charging_point(system, oocp_charge_point_id, connector_id, start_time,
         raise ValueError(f"Unsupported system: {system}")
 
 def book_virta_charging_point(oocp_charge_point_id, connector_id, start_time, end_time):
-    url = get_parameter_or_secret('VIRTA_API_URL')
-    headers = {'X-API-Key': get_parameter_or_secret('VIRTA_API_KEY')}
-    payload = {
-        'chargePointId': oocp_charge_point_id,
-        'connectorId': connector_id,
-        'startTime': start_time,
-        'endTime': end_time
-    }
-    response = requests.post(url, json=payload, headers=headers)
+    url, headers = get_cpo_api_config('Virta')
+    payload = build_reservation_payload(oocp_charge_point_id, connector_id, start_time, end_time)
+    response = call_cpo('Virta', url, payload, headers)
     return handle_response(response)
 
 def book_evbox_charging_point(oocp_charge_point_id, connector_id, start_time, end_time):
-    url = get_parameter_or_secret('EVBOX_API_URL')
-    headers = {'Authorization': f"Bearer {get_parameter_or_secret('EVBOX_TOKEN')}"}
-    payload = {
-        'chargePointId': oocp_charge_point_id,
-        'connectorId': connector_id,
-        'startTime': start_time,
-        'endTime': end_time
-    }
-    response = requests.post(url, json=payload, headers=headers)
+    url, headers = get_cpo_api_config('EVBox')
+    payload = build_reservation_payload(oocp_charge_point_id, connector_id, start_time, end_time)
+    response = call_cpo('EVBox', url, payload, headers)
     return handle_response(response)
 
 def book_generic_cpo_charging_point(oocp_charge_point_id, connector_id, start_time, end_time):
-    url = get_parameter_or_secret('GENERIC_CPO_API_URL')
-    headers = {'Authorization': f"Bearer {get_parameter_or_secret('GENERIC_CPO_TOKEN')}"}
-    payload = {
+    url, headers = get_cpo_api_config('Siemens')
+    payload = build_reservation_payload(oocp_charge_point_id, connector_id, start_time, end_time)
+    response = call_cpo('Siemens', url, payload, headers)
+    return handle_response(response)
+
+def get_cpo_api_config(system):
+    if system == 'Virta':
+        return get_parameter_or_secret('VIRTA_API_URL'), {'X-API-Key': get_parameter_or_secret('VIRTA_API_KEY')}
+    elif system == 'EVBox':
+        return get_parameter_or_secret('EVBOX_API_URL'), {'Authorization': f"Bearer {get_parameter_or_secret('EVBOX_TOKEN')}"}
+    elif system in ['Siemens', 'Schneider Electric']:
+        return get_parameter_or_secret('GENERIC_CPO_API_URL'), {'Authorization': f"Bearer {get_parameter_or_secret('GENERIC_CPO_TOKEN')}"}
+    else:
+        raise ValueError(f"Unsupported system: {system}")
+
+def build_reservation_payload(oocp_charge_point_id, connector_id, start_time, end_time):
+    return {
         'chargePointId': oocp_charge_point_id,
         'connectorId': connector_id,
         'startTime': start_time,
         'endTime': end_time
     }
-    response = requests.post(url, json=payload, headers=headers)
-    return handle_response(response)
+
+def call_cpo(system, url, payload, headers):
+    """
+    POST to a CPO backend through its circuit breaker. Fails fast with
+    CpoUnavailableError while the backend's circuit is open.
+    """
+    backend = get_cpo_backend(system)
+    allow_cpo_request(backend)
+
+    started_at = time.monotonic()
+    try:
+        response = requests.post(url, json=payload, headers=headers, timeout=CPO_REQUEST_TIMEOUT_SECONDS)
+    except requests.RequestException:
+        record_cpo_call(backend, False, time.monotonic() - started_at)
+        raise
+
+    # 4xx responses are rejected bookings, not a sign of an unhealthy backend
+    record_cpo_call(backend, response.status_code < 500, time.monotonic() - started_at)
+    return response
+
+def get_cpo_backend(system):
+    if system in ['Siemens', 'Schneider Electric']:
+        return 'GenericCPO'
+    return system
+
+def get_circuit_breaker(backend):
+    if backend not in circuit_breakers:
+        circuit_breakers[backend] = {
+            'state': CIRCUIT_CLOSED,
+            'openedAt': None,
+            'probeInFlight': False,
+            'calls': deque(maxlen=CIRCUIT_WINDOW_SIZE),
+            'sharedStateCheckedAt': None
+        }
+    return circuit_breakers[backend]
+
+def allow_cpo_request(backend):
+    # The shared state is read outside the lock so other CPO calls are not held up
+    # behind the CpoHealth round trip; only the in-memory swap happens under it
+    shared_state = read_shared_circuit_state(backend) if claim_shared_state_refresh(backend) else None
+
+    with circuit_breakers_lock:
+        breaker = get_circuit_breaker(backend)
+        if breaker['state'] == CIRCUIT_CLOSED and shared_state:
+            breaker['state'] = CIRCUIT_OPEN
+            breaker['openedAt'] = shared_state['openedAt']
+
+        if breaker['state'] == CIRCUIT_OPEN:
+            if time.time() - breaker['openedAt'] < CIRCUIT_OPEN_SECONDS:
+                raise CpoUnavailableError(f"{backend} is currently unavailable, please try again shortly")
+            breaker['state'] = CIRCUIT_HALF_OPEN
+            breaker['probeInFlight'] = False
+
+        if breaker['state'] == CIRCUIT_HALF_OPEN:
+            # Let a single probe through to test whether the backend has recovered
+            if breaker['probeInFlight']:
+                raise CpoUnavailableError(f"{backend} is currently unavailable, please try again shortly")
+            breaker['probeInFlight'] = True
+
+def record_cpo_call(backend, is_successful, duration):
+    shared_state = None
+    with circuit_breakers_lock:
+        breaker = get_circuit_breaker(backend)
+        is_slow = duration >= CIRCUIT_SLOW_CALL_SECONDS
+
+        if breaker['state'] == CIRCUIT_HALF_OPEN:
+            if is_successful and not is_slow:
+                shared_state = close_circuit(backend, breaker)
+            else:
+                shared_state = open_circuit(backend, breaker)
+        else:
+            breaker['calls'].append((is_successful, is_slow))
+            calls = breaker['calls']
+            if breaker['state'] == CIRCUIT_CLOSED and len(calls) >= CIRCUIT_MIN_CALLS:
+                error_rate = sum(1 for ok, _ in calls if not ok) / len(calls)
+                slow_rate = sum(1 for _, slow in calls if slow) / len(calls)
+                if error_rate >= CIRCUIT_ERROR_RATE_THRESHOLD or slow_rate >= CIRCUIT_SLOW_CALL_RATE_THRESHOLD:
+                    shared_state = open_circuit(backend, breaker)
+
+    if shared_state:
+        store_shared_circuit_state(backend, shared_state)
+
+def open_circuit(backend, breaker):
+    """
+    Open the in-memory circuit, returning the state to share once the lock is released.
+    """
+    print(f"Opening circuit for CPO backend {backend}")
+    breaker['state'] = CIRCUIT_OPEN
+    breaker['openedAt'] = time.time()
+    breaker['probeInFlight'] = False
+    breaker['calls'].clear()
+    return {'state': CIRCUIT_OPEN, 'openedAt': breaker['openedAt']}
+
+def close_circuit(backend, breaker):
+    """
+    Close the in-memory circuit, returning the state to share once the lock is released.
+    """
+    print(f"Closing circuit for CPO backend {backend}")
+    breaker['state'] = CIRCUIT_CLOSED
+    breaker['openedAt'] = None
+    breaker['probeInFlight'] = False
+    breaker['calls'].clear()
+    return {'state': CIRCUIT_CLOSED, 'openedAt': None}
+
+def claim_shared_state_refresh(backend):
+    """
+    Return True when this call should read the shared state for a closed circuit. The
+    shared item is read at most once every SHARED_CIRCUIT_REFRESH_SECONDS per backend.
+    """
+    if not cpo_health_table:
+        return False
+    now = time.monotonic()
+    with circuit_breakers_lock:
+        breaker = get_circuit_breaker(backend)
+        if breaker['state'] != CIRCUIT_CLOSED:
+            return False
+        if breaker['sharedStateCheckedAt'] and now - breaker['sharedStateCheckedAt'] < SHARED_CIRCUIT_REFRESH_SECONDS:
+            return False
+        breaker['sharedStateCheckedAt'] = now
+        return True
+
+def read_shared_circuit_state(backend):
+    """
+    Return an open circuit recorded by another container, or None.
+    """
+    try:
+        item = cpo_health_table.get_item(Key={'backend': backend}).get('Item')
+    except ClientError as e:
+        print(f"Error reading CPO health for {backend}: {e.response['Error']['Message']}")
+        return None
+
+    if item and item.get('state') == CIRCUIT_OPEN and time.time() - float(item['openedAt']) < CIRCUIT_OPEN_SECONDS:
+        return {'state': CIRCUIT_OPEN, 'openedAt': float(item['openedAt'])}
+    return None
+
+def store_shared_circuit_state(backend, shared_state):
+    if not cpo_health_table:
+        return
+    try:
+        cpo_health_table.put_item(Item={
+            'backend': backend,
+            'state': shared_state['state'],
+            'openedAt': int(shared_state['openedAt'] or 0),
+            'updatedAt': datetime.now().isoformat()
+        })
+    except ClientError as e:
+        print(f"Error storing CPO health for {backend}: {e.response['Error']['Message']}")
 
 def handle_response(response):
     if response.status_code == 200:
         return {'status': 'success', 'message': response.json()}
     else:
         return {'status': 'failure', 'message': response.text}
-    
+
+def validate_booking_slots(slots, results):
+    """
+    Validate every slot in memory before any CPO call. Rejected slots are written
+    into results; the remaining slots are returned in their original order.
+    """
+    parsed_slots = []
+    for index, slot in enumerate(slots):
+        if not isinstance(slot, dict):
+            results[index] = build_slot_result({'index': index}, 'rejected', error='Slot must be an object')
+            continue
+        try:
+            parsed_slots.append(parse_booking_slot(index, slot))
+        except ValueError as e:
+            results[index] = build_slot_result({'index': index, **slot}, 'rejected', error=str(e))
+
+    # Sort by charger then start time so overlaps are found in a single pass
+    overlapping = set()
+    previous = None
+    for slot in sorted(parsed_slots, key=lambda s: (s['oocpChargePointId'], s['start'])):
+        if previous and previous['oocpChargePointId'] == slot['oocpChargePointId'] and slot['start'] < previous['end']:
+            overlapping.add(slot['index'])
+            results[slot['index']] = build_slot_result(slot, 'rejected', error='Slot overlaps another slot in this request')
+            continue
+        previous = slot
+
+    return [slot for slot in parsed_slots if slot['index'] not in overlapping]
+
+def parse_booking_slot(index, slot):
+    required_fields = ['oocpChargePointId', 'system', 'connectorId', 'startTime', 'endTime']
+    missing_fields = [field for field in required_fields if not slot.get(field)]
+    if missing_fields:
+        raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
+    if slot['system'] not in BULK_API_URL_PARAMETERS:
+        raise ValueError(f"Unsupported system: {slot['system']}")
+
+    start = parse_timestamp(slot['startTime'])
+    end = parse_timestamp(slot['endTime'])
+    validate_booking_duration(start, end)
+
+    return {
+        'index': index,
+        'oocpChargePointId': slot['oocpChargePointId'],
+        'system': slot['system'],
+        'connectorId': slot['connectorId'],
+        'startTime': slot['startTime'],
+        'endTime': slot['endTime'],
+        'start': start,
+        'end': end
+    }
+
+def validate_booking_duration(start, end):
+    if start >= end:
+        raise ValueError('startTime must be before endTime')
+    if end - start > MAX_BOOKING_DURATION:
+        raise ValueError(f'A booking can last at most {int(MAX_BOOKING_DURATION.total_seconds() // 3600)} hours')
+
+def parse_timestamp(value):
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid timestamp: {value}")
+    # Treat naive timestamps as UTC so they compare with offset-aware ones
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+def build_slot_result(slot, status, booking_id=None, error=None):
+    result = {
+        'index': slot['index'],
+        'oocpChargePointId': slot.get('oocpChargePointId'),
+        'startTime': slot.get('startTime'),
+        'endTime': slot.get('endTime'),
+        'status': status
+    }
+    if booking_id:
+        result['bookingId'] = booking_id
+    if error:
+        result['error'] = error
+    return result
+
+def book_charging_points_for_system(system, slots):
+    """
+    Reserve all slots for one CPO backend. Uses the CPO's bulk endpoint when one is
+    configured, otherwise fans the single-slot calls out concurrently.
+    Returns one reservation response per slot, in order.
+    """
+    url, headers = get_cpo_api_config(system)
+    payloads = [
+        build_reservation_payload(slot['oocpChargePointId'], slot['connectorId'], slot['startTime'], slot['endTime'])
+        for slot in slots
+    ]
+
+    bulk_url = get_bulk_api_url(system)
+    if bulk_url:
+        response = call_cpo(system, bulk_url, {'reservations': payloads}, headers)
+        return handle_bulk_response(response, len(payloads))
+
+    def post_reservation(payload):
+        try:
+            return handle_response(call_cpo(system, url, payload, headers))
+        except (requests.RequestException, CpoUnavailableError) as e:
+            return {'status': 'failure', 'message': str(e)}
+
+    with ThreadPoolExecutor(max_workers=min(CPO_FAN_OUT_WORKERS, len(payloads))) as executor:
+        return list(executor.map(post_reservation, payloads))
+
+def get_bulk_api_url(system):
+    try:
+        return get_parameter_or_secret(BULK_API_URL_PARAMETERS[system])
+    except ValueError:
+        return None
+
+def handle_bulk_response(response, slot_count):
+    if response.status_code != 200:
+        return [{'status': 'failure', 'message': response.text}] * slot_count
+
+    reservations = response.json().get('reservations', [])
+    results = []
+    for index in range(slot_count):
+        reservation = reservations[index] if index < len(reservations) else None
+        if reservation and reservation.get('status') == 'success':
+            results.append({'status': 'success', 'message': reservation})
+        else:
+            results.append({'status': 'failure', 'message': reservation or 'No reservation result returned'})
+    return results
 
 def log_booking_to_dynamodb(
     consumer_id, 
@@ -123,17 +545,53 @@ def log_booking_to_dynamodb(
     end_time, 
     timestamp
 ): 
-    booking_id = str(uuid.uuid4())
     try: 
-        bookings_table.put_item(Item={
-            'bookingId': booking_id, 
-            'consumerId': consumer_id, 
-            'oocpChargePointId': oocp_charge_point_id, 
-            'startTime#endTime': f'{start_time}#{end_time}', 
-            'timestamp': timestamp
-        })
+        bookings_table.put_item(Item=build_booking_item(consumer_id, oocp_charge_point_id, start_time, end_time, timestamp))
     except ClientError as e: 
         raise Exception(f"Error writing DynamoDB Bookings table: {e.response['Error']['Message']}")
+
+def log_bookings_to_dynamodb(booking_items):
+    """
+    Write the booking items, returning one error message (or None) per item. If the
+    batch write fails the items are retried one at a time, so a failure is reported
+    only for the bookings that could not be written.
+    """
+    try:
+        with bookings_table.batch_writer() as batch:
+            for item in booking_items:
+                batch.put_item(Item=item)
+        return [None] * len(booking_items)
+    except ClientError as e:
+        print(f"Error writing DynamoDB Bookings table in batch: {e.response['Error']['Message']}")
+
+    write_errors = []
+    for item in booking_items:
+        try:
+            bookings_table.put_item(Item=item)
+            write_errors.append(None)
+        except ClientError as e:
+            write_errors.append(f"Error writing DynamoDB Bookings table: {e.response['Error']['Message']}")
+    return write_errors
+
+def build_booking_item(consumer_id, oocp_charge_point_id, start_time, end_time, timestamp):
+    item = {
+        'bookingId': str(uuid.uuid4()), 
+        'consumerId': consumer_id, 
+        'oocpChargePointId': oocp_charge_point_id, 
+        'startTime#endTime': f'{start_time}#{end_time}', 
+        'timestamp': timestamp
+    }
+    # releaseStatus/releaseAt place the booking in the sparse releaseStatus-releaseAt-Index,
+    # which the release scheduler reads to free the charger once the booking ends
+    try:
+        release_at = int(parse_timestamp(end_time).timestamp())
+    except ValueError:
+        print(f"Unable to schedule release for booking {item['bookingId']}: invalid endTime {end_time}")
+        return item
+
+    item['releaseStatus'] = 'Pending'
+    item['releaseAt'] = release_at
+    return item
         
 def update_dynamodb_charging_points_table_status(oocp_charge_point_id, is_available, timestamp, consumer_id):
     try:
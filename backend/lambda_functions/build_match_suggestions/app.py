@@ -0,0 +1,275 @@
+import boto3
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+
+charging_points_table = dynamodb.Table(os.environ.get('CHARGING_POINTS_TABLE_NAME'))
+bookings_table = dynamodb.Table(os.environ.get('BOOKINGS_TABLE_NAME'))
+match_suggestions_table = dynamodb.Table(os.environ.get('MATCH_SUGGESTIONS_TABLE_NAME'))
+
+# Must match the precision store_producers_charging_points writes geohashes with.
+# Cells are about 4.9 km tall and narrower away from the equator; the 3x3 block of
+# cells around a charger covers NEARBY_RADIUS_KM in every direction up to about 60°
+GEOHASH_PRECISION = 5
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+NEARBY_RADIUS_KM = 2
+EARTH_RADIUS_KM = 6371
+
+# Bookings are stored with a '<start>#<end>' sort key in whatever UTC offset the client
+# sent, so the key range is widened and the exact overlap checked afterwards
+MAX_BOOKING_DURATION = timedelta(hours=24)
+SLOT_KEY_PADDING = timedelta(days=1)
+
+# Best candidates kept for each new booking
+MAX_SUGGESTIONS_PER_BOOKING = 20
+
+# Runs the geohash cell and charger booking lookups concurrently
+io_executor = ThreadPoolExecutor(max_workers=8)
+
+deserializer = TypeDeserializer()
+
+def lambda_handler(event, context):
+    """
+    Triggered by INSERT records on the Bookings table stream. For each new booking, finds
+    consumers with overlapping bookings at chargers within NEARBY_RADIUS_KM, ranks them
+    and stores the best as match suggestions for both consumers, so get_match_suggestions
+    is a single query. On an error the batch stops and is retried from that record;
+    suggestions are keyed by the two bookings, so rewriting them is harmless.
+    """
+    suggested = 0
+    charger_locations = {}
+    for record in event.get('Records', []):
+        if record.get('eventName') != 'INSERT':
+            continue
+
+        booking = {key: deserializer.deserialize(value) for key, value in record['dynamodb']['NewImage'].items()}
+        try:
+            suggested += suggest_matches_for_booking(booking, charger_locations)
+        except ClientError as e:
+            print(f"Error building match suggestions for booking {booking.get('bookingId')}: {e.response['Error']['Message']}")
+            print(f"Stored {suggested} match suggestions before stopping")
+            return {'batchItemFailures': [{'itemIdentifier': record['dynamodb']['SequenceNumber']}]}
+
+    print(f"Stored {suggested} match suggestions")
+
+    return {'batchItemFailures': []}
+
+def suggest_matches_for_booking(booking, charger_locations):
+    booking_window = parse_slot(booking.get('startTime#endTime'))
+    if not booking_window:
+        print(f"Skipping booking {booking.get('bookingId')}: invalid slot {booking.get('startTime#endTime')}")
+        return 0
+
+    location = get_charger_location(booking['oocpChargePointId'], charger_locations)
+    if not location:
+        print(f"Skipping booking {booking['bookingId']}: charger {booking['oocpChargePointId']} has no location")
+        return 0
+
+    nearby_chargers = find_nearby_chargers(*location)
+    candidates = find_overlapping_bookings(booking, booking_window, nearby_chargers)
+    ranked = rank_candidates(candidates)[:MAX_SUGGESTIONS_PER_BOOKING]
+
+    timestamp = datetime.now().isoformat()
+    with match_suggestions_table.batch_writer(overwrite_by_pkeys=['consumerId', 'suggestionId']) as batch:
+        for candidate in ranked:
+            # Each consumer sees the other as the suggestion
+            batch.put_item(Item=build_suggestion(booking, candidate['booking'], candidate, timestamp))
+            batch.put_item(Item=build_suggestion(candidate['booking'], booking, candidate, timestamp))
+
+    return len(ranked)
+
+def get_charger_location(oocp_charge_point_id, charger_locations):
+    if oocp_charge_point_id not in charger_locations:
+        response = charging_points_table.get_item(
+            Key={'oocpChargePointId': oocp_charge_point_id},
+            ProjectionExpression='#location',
+            ExpressionAttributeNames={'#location': 'location'}
+        )
+        charger_locations[oocp_charge_point_id] = parse_location(response.get('Item', {}).get('location'))
+    return charger_locations[oocp_charge_point_id]
+
+def find_nearby_chargers(latitude, longitude):
+    """
+    Return {oocpChargePointId: distance in km} for chargers within NEARBY_RADIUS_KM,
+    read from the geohash index one cell of the surrounding 3x3 block at a time.
+    """
+    futures = [
+        io_executor.submit(query_chargers_in_cell, cell)
+        for cell in geohash_cells_around(latitude, longitude)
+    ]
+
+    nearby_chargers = {}
+    for future in futures:
+        for charger in future.result():
+            charger_location = parse_location(charger.get('location'))
+            if not charger_location:
+                continue
+            distance_km = haversine_km(latitude, longitude, *charger_location)
+            if distance_km <= NEARBY_RADIUS_KM:
+                nearby_chargers[charger['oocpChargePointId']] = distance_km
+    return nearby_chargers
+
+def query_chargers_in_cell(cell):
+    query_kwargs = {
+        'IndexName': 'geohash-Index',
+        'KeyConditionExpression': Key('geohash').eq(cell),
+        'ProjectionExpression': 'oocpChargePointId, #location',
+        'ExpressionAttributeNames': {'#location': 'location'}
+    }
+    chargers = []
+    while True:
+        response = charging_points_table.query(**query_kwargs)
+        chargers.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return chargers
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def find_overlapping_bookings(booking, booking_window, nearby_chargers):
+    futures = {
+        oocp_charge_point_id: io_executor.submit(query_charger_bookings, oocp_charge_point_id, *booking_window)
+        for oocp_charge_point_id in nearby_chargers
+    }
+
+    candidates = []
+    for oocp_charge_point_id, future in futures.items():
+        for other_booking in future.result():
+            if other_booking['consumerId'] == booking['consumerId']:
+                continue
+            other_window = parse_slot(other_booking.get('startTime#endTime'))
+            if not other_window:
+                continue
+            overlap_start = max(booking_window[0], other_window[0])
+            overlap_end = min(booking_window[1], other_window[1])
+            if overlap_start >= overlap_end:
+                continue
+            candidates.append({
+                'booking': other_booking,
+                'distanceKm': nearby_chargers[oocp_charge_point_id],
+                'overlapStart': overlap_start,
+                'overlapEnd': overlap_end,
+                # Share of the shorter booking the two consumers spend charging together
+                'overlapRatio': (overlap_end - overlap_start) / min(booking_window[1] - booking_window[0], other_window[1] - other_window[0])
+            })
+    return candidates
+
+def query_charger_bookings(oocp_charge_point_id, booking_start, booking_end):
+    earliest_start = (booking_start - MAX_BOOKING_DURATION - SLOT_KEY_PADDING).astimezone(timezone.utc).date().isoformat()
+    latest_start = (booking_end + SLOT_KEY_PADDING * 2).astimezone(timezone.utc).date().isoformat()
+    query_kwargs = {
+        'IndexName': 'oocpChargePointId-startTime-endTime-Index',
+        'KeyConditionExpression': Key('oocpChargePointId').eq(oocp_charge_point_id) & Key('startTime#endTime').between(earliest_start, latest_start),
+        'ProjectionExpression': 'bookingId, consumerId, oocpChargePointId, #slot',
+        'ExpressionAttributeNames': {'#slot': 'startTime#endTime'}
+    }
+    bookings = []
+    while True:
+        response = bookings_table.query(**query_kwargs)
+        bookings.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return bookings
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def rank_candidates(candidates):
+    """
+    Keep each consumer's best booking and order them by score: the overlap ratio, scaled
+    down linearly with distance to half at NEARBY_RADIUS_KM.
+    """
+    best_by_consumer = {}
+    for candidate in candidates:
+        candidate['score'] = candidate['overlapRatio'] * (1 - candidate['distanceKm'] / NEARBY_RADIUS_KM / 2)
+        consumer_id = candidate['booking']['consumerId']
+        if consumer_id not in best_by_consumer or candidate['score'] > best_by_consumer[consumer_id]['score']:
+            best_by_consumer[consumer_id] = candidate
+    return sorted(best_by_consumer.values(), key=lambda candidate: candidate['score'], reverse=True)
+
+def build_suggestion(booking, other_booking, candidate, timestamp):
+    return {
+        'consumerId': booking['consumerId'],
+        'suggestionId': f"{booking['bookingId']}#{other_booking['bookingId']}",
+        'bookingId': booking['bookingId'],
+        'oocpChargePointId': booking['oocpChargePointId'],
+        'candidateConsumerId': other_booking['consumerId'],
+        'candidateBookingId': other_booking['bookingId'],
+        'candidateChargePointId': other_booking['oocpChargePointId'],
+        'overlapStartTime': candidate['overlapStart'].isoformat(),
+        'overlapEndTime': candidate['overlapEnd'].isoformat(),
+        # DynamoDB does not accept floats
+        'distanceKm': Decimal(str(round(candidate['distanceKm'], 3))),
+        'score': Decimal(str(round(candidate['score'], 4))),
+        'createdAt': timestamp,
+        # A suggestion is of no use once the shared window has passed
+        'expiresAt': int(candidate['overlapEnd'].timestamp())
+    }
+
+def parse_timestamp(value):
+    # Timestamps without an offset are taken as UTC
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def parse_slot(slot):
+    try:
+        start_time, end_time = slot.split('#')
+        start, end = parse_timestamp(start_time), parse_timestamp(end_time)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return (start, end) if start < end else None
+
+def parse_location(location):
+    # Charging points store their location as '<latitude>,<longitude>'
+    try:
+        latitude, longitude = (float(value) for value in location.split(','))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return latitude, longitude
+
+def haversine_km(latitude_a, longitude_a, latitude_b, longitude_b):
+    d_latitude = math.radians(latitude_b - latitude_a)
+    d_longitude = math.radians(longitude_b - longitude_a)
+    a = (
+        math.sin(d_latitude / 2) ** 2
+        + math.cos(math.radians(latitude_a)) * math.cos(math.radians(latitude_b)) * math.sin(d_longitude / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    latitude_range, longitude_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash = []
+    bits = bit_count = 0
+    use_longitude = True
+    while len(geohash) < precision:
+        value, value_range = (longitude, longitude_range) if use_longitude else (latitude, latitude_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            value_range[0] = mid
+        else:
+            value_range[1] = mid
+        use_longitude = not use_longitude
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_BASE32[bits])
+            bits = bit_count = 0
+    return ''.join(geohash)
+
+def geohash_cells_around(latitude, longitude, precision=GEOHASH_PRECISION):
+    # Longitude takes the extra bit when the total is odd
+    latitude_bits = precision * 5 // 2
+    longitude_bits = precision * 5 - latitude_bits
+    cell_height = 180 / 2 ** latitude_bits
+    cell_width = 360 / 2 ** longitude_bits
+
+    cells = set()
+    for row in (-1, 0, 1):
+        for column in (-1, 0, 1):
+            cell_latitude = min(max(latitude + row * cell_height, -90.0), 89.999999)
+            cell_longitude = (longitude + column * cell_width + 180) % 360 - 180
+            cells.add(encode_geohash(cell_latitude, cell_longitude, precision))
+    return cells
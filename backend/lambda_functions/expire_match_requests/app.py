@@ -0,0 +1,113 @@
+import json
+import boto3
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+
+match_requests_table = dynamodb.Table(os.environ.get('MATCH_REQUESTS_TABLE_NAME'))
+match_requests_table_name = os.environ.get('MATCH_REQUESTS_TABLE_NAME')
+notification_counters_table_name = os.environ.get('NOTIFICATION_COUNTERS_TABLE_NAME')
+
+EXPIRY_BATCH_SIZE = 100
+MAX_EXPIRIES_PER_TICK = 1000
+EXPIRY_WORKERS = 8
+
+# Expired requests are deleted by TTL this long after their meeting ends. Only the
+# expiry sets expiresAt, so accepted and rejected requests are kept
+MATCH_REQUEST_RETENTION_SECONDS = 30 * 24 * 60 * 60
+
+def lambda_handler(event, context):
+    """
+    Scheduled every 15 minutes. Marks pending match requests whose meeting has ended as
+    Expired, reading them from the sparse expiryStatus-meetingEndAt-Index in time order
+    instead of scanning the Match Requests table. Expired requests leave the isRead
+    indexes, so inbox and outbox reads only cover live requests, and are deleted by TTL
+    MATCH_REQUEST_RETENTION_SECONDS after their meeting ended.
+    """
+    now = int(time.time())
+    expired = 0
+    skipped = 0
+
+    exclusive_start_key = None
+    while expired + skipped < MAX_EXPIRIES_PER_TICK:
+        match_requests, exclusive_start_key = query_due_match_requests(now, exclusive_start_key)
+        if not match_requests:
+            break
+
+        with ThreadPoolExecutor(max_workers=EXPIRY_WORKERS) as executor:
+            outcomes = list(executor.map(expire_match_request, match_requests))
+
+        expired += outcomes.count(True)
+        skipped += outcomes.count(False)
+
+        if not exclusive_start_key:
+            break
+
+    summary = {'expired': expired, 'skipped': skipped}
+    print(f"Match request expiry tick: {json.dumps(summary)}")
+
+    return summary
+
+def query_due_match_requests(now, exclusive_start_key=None):
+    query_kwargs = {
+        'IndexName': 'expiryStatus-meetingEndAt-Index',
+        'KeyConditionExpression': Key('expiryStatus').eq('Pending') & Key('meetingEndAt').lte(now),
+        'Limit': EXPIRY_BATCH_SIZE
+    }
+    if exclusive_start_key:
+        query_kwargs['ExclusiveStartKey'] = exclusive_start_key
+
+    try:
+        response = match_requests_table.query(**query_kwargs)
+    except ClientError as e:
+        raise Exception(f"Error querying DynamoDB Match Requests table: {e.response['Error']['Message']}")
+
+    return response.get('Items', []), response.get('LastEvaluatedKey')
+
+def expire_match_request(match_request):
+    """
+    Expire one request. Returns False when it could not be expired: it was answered
+    meanwhile and has left the index, or was read meanwhile and is retried next tick.
+    """
+    is_unread = match_request.get('isRead') == int(False)
+
+    # Removing isRead takes the request out of both isRead indexes and removing
+    # expiryStatus takes it out of the expiry index
+    transact_items = [{
+        'Update': {
+            'TableName': match_requests_table_name,
+            'Key': {'requestId': match_request['requestId']},
+            'UpdateExpression': 'SET matchStatus = :expired, statusUpdatedAt = :timestamp, expiresAt = :expires_at REMOVE isRead, expiryStatus',
+            'ConditionExpression': 'matchStatus = :pending AND isRead = :is_read',
+            'ExpressionAttributeValues': {
+                ':expired': 'Expired',
+                ':pending': 'Pending',
+                ':is_read': match_request.get('isRead'),
+                ':timestamp': datetime.now().isoformat(),
+                ':expires_at': int(match_request['meetingEndAt']) + MATCH_REQUEST_RETENTION_SECONDS
+            }
+        }
+    }]
+    if is_unread:
+        # An unread request leaves the recipient's unread badge with it
+        transact_items.append({
+            'Update': {
+                'TableName': notification_counters_table_name,
+                'Key': {'consumerId': match_request['recipientConsumerId']},
+                'UpdateExpression': 'ADD unreadMatchRequests :minus_one',
+                'ExpressionAttributeValues': {':minus_one': -1}
+            }
+        })
+
+    try:
+        dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+    except ClientError as e:
+        print(f"Error expiring match request {match_request['requestId']}: {e.response['Error']['Message']}")
+        return False
+
+    return True
@@ -0,0 +1,200 @@
+import json
+import boto3
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+charging_points_table = dynamodb.Table(os.environ.get('CHARGING_POINTS_TABLE_NAME'))
+bookings_table = dynamodb.Table(os.environ.get('BOOKINGS_TABLE_NAME'))
+
+cors_header = {
+    'Access-Control-Allow-Origin': 'http://localhost:3000',
+    'Access-Control-Allow-Methods': 'OPTIONS, POST, GET',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token'
+}
+
+# book_charging_point rejects longer bookings, so a booking overlapping the window
+# starts at most this long before it
+MAX_BOOKING_DURATION = timedelta(hours=24)
+MAX_WINDOW_DURATION = timedelta(days=7)
+
+# A new booking invalidates the charger's cached timelines through its statusUpdatedAt.
+# The TTL bounds staleness when that update was missed
+TIMELINE_CACHE_TTL_SECONDS = 30
+TIMELINE_CACHE_MAX_ENTRIES = 500
+
+# (oocpChargePointId, windowStart, windowEnd) -> (expiresAt, statusUpdatedAt, timeline)
+timeline_cache = {}
+
+def lambda_handler(event, context):
+    # Handle CORS preflight requests (OPTIONS)
+    if event['httpMethod'] == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': cors_header
+        }
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+
+        oocp_charge_point_id = body.get('oocpChargePointId')
+        window_start_time = body.get('windowStart')
+        window_end_time = body.get('windowEnd')
+
+        if not oocp_charge_point_id or not window_start_time or not window_end_time:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': 'Missing required fields in request body'})
+            }
+
+        try:
+            window_start = parse_timestamp(window_start_time)
+            window_end = parse_timestamp(window_end_time)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': str(e)})
+            }
+
+        if window_start >= window_end or window_end - window_start > MAX_WINDOW_DURATION:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': f'Window must end after it starts and span at most {MAX_WINDOW_DURATION.days} days'})
+            }
+
+        timeline = get_availability_timeline(oocp_charge_point_id, window_start, window_end)
+
+        return {
+            'statusCode': 200,
+            'headers': cors_header,
+            'body': json.dumps({
+                'oocpChargePointId': oocp_charge_point_id,
+                'windowStart': window_start.isoformat(),
+                'windowEnd': window_end.isoformat(),
+                **timeline
+            })
+        }
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_header,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def get_availability_timeline(oocp_charge_point_id, window_start, window_end):
+    """
+    Return the free/busy timeline for a charger, served from the in-process cache while
+    the charger's statusUpdatedAt is unchanged. book_charging_point sets statusUpdatedAt
+    after writing a booking, so a new booking invalidates every cached window for that
+    charger. A cache hit costs a single-attribute get_item instead of the range query.
+    """
+    cache_key = (oocp_charge_point_id, window_start, window_end)
+    # Read before the bookings, so a booking written in between changes it again
+    status_updated_at = get_status_updated_at(oocp_charge_point_id)
+
+    cached = timeline_cache.get(cache_key)
+    if cached and cached[0] > time.monotonic() and cached[1] == status_updated_at:
+        return cached[2]
+
+    bookings = query_bookings_in_window(oocp_charge_point_id, window_start, window_end)
+    timeline = build_timeline(bookings, window_start, window_end)
+
+    store_in_cache(cache_key, status_updated_at, timeline)
+    return timeline
+
+def get_status_updated_at(oocp_charge_point_id):
+    try:
+        response = charging_points_table.get_item(
+            Key={'oocpChargePointId': oocp_charge_point_id},
+            ProjectionExpression='statusUpdatedAt'
+        )
+        return response.get('Item', {}).get('statusUpdatedAt')
+    except ClientError as e:
+        raise Exception(f"Error reading DynamoDB Charging Points table: {e.response['Error']['Message']}")
+
+def query_bookings_in_window(oocp_charge_point_id, window_start, window_end):
+    """
+    Range-query the charger's bookings whose start falls between
+    window_start - MAX_BOOKING_DURATION and window_end, returned in start order.
+    """
+    # A bare date sorts before every timestamp on that day, whatever format the booking used
+    lower_bound = (window_start - MAX_BOOKING_DURATION).strftime('%Y-%m-%d')
+    upper_bound = window_end.strftime('%Y-%m-%dT%H:%M:%S')
+
+    query_kwargs = {
+        'IndexName': 'oocpChargePointId-startTime-endTime-Index',
+        'KeyConditionExpression': Key('oocpChargePointId').eq(oocp_charge_point_id) & Key('startTime#endTime').between(lower_bound, upper_bound),
+        'ProjectionExpression': '#slot',
+        'ExpressionAttributeNames': {'#slot': 'startTime#endTime'}
+    }
+
+    bookings = []
+    try:
+        while True:
+            response = bookings_table.query(**query_kwargs)
+            bookings.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return bookings
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    except ClientError as e:
+        raise Exception(f"Error querying DynamoDB Bookings table: {e.response['Error']['Message']}")
+
+def build_timeline(bookings, window_start, window_end):
+    """
+    Merge bookings into busy intervals clipped to the window and derive the free gaps,
+    in a single pass over the start-ordered bookings.
+    """
+    busy = []
+    for booking in bookings:
+        start_time, end_time = booking['startTime#endTime'].split('#')
+        start = max(parse_timestamp(start_time), window_start)
+        end = min(parse_timestamp(end_time), window_end)
+        if start >= end:
+            continue
+        if busy and start <= busy[-1][1]:
+            busy[-1][1] = max(busy[-1][1], end)
+        else:
+            busy.append([start, end])
+
+    free = []
+    cursor = window_start
+    for start, end in busy:
+        if cursor < start:
+            free.append((cursor, start))
+        cursor = end
+    if cursor < window_end:
+        free.append((cursor, window_end))
+
+    return {
+        'busy': [format_interval(start, end) for start, end in busy],
+        'free': [format_interval(start, end) for start, end in free]
+    }
+
+def format_interval(start, end):
+    return {'startTime': start.isoformat(), 'endTime': end.isoformat()}
+
+def parse_timestamp(value):
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid timestamp: {value}")
+    # Treat naive timestamps as UTC so they compare with offset-aware ones
+    return timestamp.astimezone(timezone.utc) if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+def store_in_cache(cache_key, status_updated_at, timeline):
+    now = time.monotonic()
+    if len(timeline_cache) >= TIMELINE_CACHE_MAX_ENTRIES:
+        for key in [key for key, entry in timeline_cache.items() if entry[0] <= now]:
+            del timeline_cache[key]
+    if len(timeline_cache) >= TIMELINE_CACHE_MAX_ENTRIES:
+        # Evict the oldest entry (dicts keep insertion order)
+        del timeline_cache[next(iter(timeline_cache))]
+    timeline_cache[cache_key] = (now + TIMELINE_CACHE_TTL_SECONDS, status_updated_at, timeline)
@@ -0,0 +1,140 @@
+import base64
+import json
+import boto3
+import os
+from datetime import datetime, timezone
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+bookings_table = dynamodb.Table(os.environ.get('BOOKINGS_TABLE_NAME'))
+
+cors_header = {
+    'Access-Control-Allow-Origin': 'http://localhost:3000',
+    'Access-Control-Allow-Methods': 'OPTIONS, POST, GET',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token'
+}
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+BOOKING_PERIODS = ['upcoming', 'past']
+
+def lambda_handler(event, context):
+    # Handle CORS preflight requests (OPTIONS)
+    if event['httpMethod'] == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': cors_header
+        }
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+
+        consumer_id = body.get('consumerId')
+        period = body.get('period', 'upcoming')
+        cursor = body.get('cursor')
+
+        if not consumer_id:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': 'Missing required fields in request body'})
+            }
+        if period not in BOOKING_PERIODS:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': f"period must be one of: {', '.join(BOOKING_PERIODS)}"})
+            }
+
+        try:
+            limit = parse_limit(body.get('limit', DEFAULT_PAGE_SIZE))
+            exclusive_start_key = decode_cursor(cursor, consumer_id) if cursor else None
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': str(e)})
+            }
+
+        bookings, last_evaluated_key = query_consumer_bookings(consumer_id, period, limit, exclusive_start_key)
+
+        return {
+            'statusCode': 200,
+            'headers': cors_header,
+            'body': json.dumps({
+                'bookings': bookings,
+                'nextCursor': encode_cursor(last_evaluated_key) if last_evaluated_key else None
+            })
+        }
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_header,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def query_consumer_bookings(consumer_id, period, limit, exclusive_start_key=None):
+    """
+    Fetch one page of a consumer's bookings from consumerId-startTime-endTime-Index.
+    Upcoming bookings are returned soonest first, past bookings most recent first.
+    """
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+    if period == 'upcoming':
+        key_condition = Key('consumerId').eq(consumer_id) & Key('startTime#endTime').gte(now)
+    else:
+        key_condition = Key('consumerId').eq(consumer_id) & Key('startTime#endTime').lt(now)
+
+    query_kwargs = {
+        'IndexName': 'consumerId-startTime-endTime-Index',
+        'KeyConditionExpression': key_condition,
+        'ProjectionExpression': 'bookingId, oocpChargePointId, #slot, #timestamp',
+        'ExpressionAttributeNames': {'#slot': 'startTime#endTime', '#timestamp': 'timestamp'},
+        'ScanIndexForward': period == 'upcoming',
+        'Limit': limit
+    }
+    if exclusive_start_key:
+        query_kwargs['ExclusiveStartKey'] = exclusive_start_key
+
+    try:
+        response = bookings_table.query(**query_kwargs)
+    except ClientError as e:
+        raise Exception(f"Error querying DynamoDB Bookings table: {e.response['Error']['Message']}")
+
+    bookings = []
+    for item in response.get('Items', []):
+        start_time, end_time = item['startTime#endTime'].split('#')
+        bookings.append({
+            'bookingId': item['bookingId'],
+            'oocpChargePointId': item.get('oocpChargePointId'),
+            'startTime': start_time,
+            'endTime': end_time,
+            'bookedAt': item.get('timestamp')
+        })
+
+    return bookings, response.get('LastEvaluatedKey')
+
+def encode_cursor(last_evaluated_key):
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+def parse_limit(value):
+    try:
+        limit = int(value)
+    except (ValueError, TypeError):
+        raise ValueError('limit must be a positive integer')
+    # DynamoDB rejects a Limit below 1
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(limit, MAX_PAGE_SIZE)
+
+def decode_cursor(cursor, consumer_id):
+    try:
+        exclusive_start_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    # Cursors are only valid for the consumer whose listing produced them
+    if not isinstance(exclusive_start_key, dict) or exclusive_start_key.get('consumerId') != consumer_id:
+        raise ValueError('Invalid cursor')
+    return exclusive_start_key
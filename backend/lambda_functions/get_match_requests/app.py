@@ -0,0 +1,148 @@
+import base64
+import json
+import boto3
+import os
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+match_requests_table = dynamodb.Table(os.environ.get('MATCH_REQUESTS_TABLE_NAME'))
+
+cors_header = {
+    'Access-Control-Allow-Origin': 'http://localhost:3000',
+    'Access-Control-Allow-Methods': 'OPTIONS, POST, GET',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token'
+}
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# The inbox lists requests a consumer received and the outbox those they sent;
+# isRead is the recipient's read flag in both
+MATCH_REQUEST_BOXES = {
+    'inbox': ('recipientConsumerId', 'recipientConsumerId-isRead-Index'),
+    'outbox': ('senderConsumerId', 'senderConsumerId-isRead-Index')
+}
+
+def lambda_handler(event, context):
+    """
+    Returns one page of a consumer's match request inbox or outbox, unread requests
+    first, from the isRead indexes on the Match Requests table.
+    """
+    # Handle CORS preflight requests (OPTIONS)
+    if event['httpMethod'] == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': cors_header
+        }
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+
+        consumer_id = body.get('consumerId')
+        box = body.get('box', 'inbox')
+        unread_only = bool(body.get('unreadOnly', False))
+        cursor = body.get('cursor')
+
+        if not consumer_id:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': 'Missing required fields in request body'})
+            }
+        if box not in MATCH_REQUEST_BOXES:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': f"box must be one of: {', '.join(MATCH_REQUEST_BOXES)}"})
+            }
+
+        try:
+            limit = parse_limit(body.get('limit', DEFAULT_PAGE_SIZE))
+            exclusive_start_key = decode_cursor(cursor, box, consumer_id) if cursor else None
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': str(e)})
+            }
+
+        match_requests, last_evaluated_key = query_match_requests(consumer_id, box, unread_only, limit, exclusive_start_key)
+
+        return {
+            'statusCode': 200,
+            'headers': cors_header,
+            'body': json.dumps({
+                'matchRequests': match_requests,
+                'nextCursor': encode_cursor(last_evaluated_key) if last_evaluated_key else None
+            })
+        }
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_header,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def query_match_requests(consumer_id, box, unread_only, limit, exclusive_start_key=None):
+    consumer_key, index_name = MATCH_REQUEST_BOXES[box]
+    key_condition = Key(consumer_key).eq(consumer_id)
+    if unread_only:
+        key_condition = key_condition & Key('isRead').eq(int(False))
+
+    query_kwargs = {
+        'IndexName': index_name,
+        'KeyConditionExpression': key_condition,
+        'Limit': limit
+    }
+    if exclusive_start_key:
+        query_kwargs['ExclusiveStartKey'] = exclusive_start_key
+
+    try:
+        response = match_requests_table.query(**query_kwargs)
+    except ClientError as e:
+        raise Exception(f"Error querying DynamoDB Match Requests table: {e.response['Error']['Message']}")
+
+    match_requests = []
+    for item in response.get('Items', []):
+        start_time, _, end_time = item.get('startTime#endTime', '').partition('#')
+        match_requests.append({
+            'requestId': item['requestId'],
+            'senderConsumerId': item.get('senderConsumerId'),
+            'recipientConsumerId': item.get('recipientConsumerId'),
+            'matchEventType': item.get('matchEventType'),
+            'matchStatus': item.get('matchStatus'),
+            'startTime': start_time,
+            'endTime': end_time,
+            'isRead': bool(item.get('isRead')),
+            'requestedAt': item.get('timestamp')
+        })
+
+    return match_requests, response.get('LastEvaluatedKey')
+
+def encode_cursor(last_evaluated_key):
+    # isRead comes back from DynamoDB as a Decimal
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key, default=int).encode()).decode()
+
+def parse_limit(value):
+    try:
+        limit = int(value)
+    except (ValueError, TypeError):
+        raise ValueError('limit must be a positive integer')
+    # DynamoDB rejects a Limit below 1
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(limit, MAX_PAGE_SIZE)
+
+def decode_cursor(cursor, box, consumer_id):
+    try:
+        exclusive_start_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    # Cursors are only valid for the consumer and box whose listing produced them
+    consumer_key, _ = MATCH_REQUEST_BOXES[box]
+    if not isinstance(exclusive_start_key, dict) or exclusive_start_key.get(consumer_key) != consumer_id:
+        raise ValueError('Invalid cursor')
+    return exclusive_start_key
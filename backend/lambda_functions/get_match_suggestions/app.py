@@ -0,0 +1,112 @@
+import json
+import time
+import boto3
+import os
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+match_suggestions_table = dynamodb.Table(os.environ.get('MATCH_SUGGESTIONS_TABLE_NAME'))
+
+cors_header = {
+    'Access-Control-Allow-Origin': 'http://localhost:3000',
+    'Access-Control-Allow-Methods': 'OPTIONS, POST, GET',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token'
+}
+
+DEFAULT_SUGGESTION_COUNT = 10
+MAX_SUGGESTION_COUNT = 50
+
+def lambda_handler(event, context):
+    """
+    Returns the best match suggestions for a consumer, optionally for one of their
+    bookings. build_match_suggestions precomputes them from the Bookings stream, so
+    this is a single query on the consumer's partition.
+    """
+    # Handle CORS preflight requests (OPTIONS)
+    if event['httpMethod'] == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': cors_header
+        }
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+
+        consumer_id = body.get('consumerId')
+        booking_id = body.get('bookingId')
+
+        if not consumer_id:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': 'Missing required fields in request body'})
+            }
+
+        try:
+            limit = min(int(body.get('limit', DEFAULT_SUGGESTION_COUNT)), MAX_SUGGESTION_COUNT)
+        except ValueError:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': 'limit must be a number'})
+            }
+
+        suggestions = get_match_suggestions(consumer_id, booking_id)
+
+        return {
+            'statusCode': 200,
+            'headers': cors_header,
+            'body': json.dumps({'suggestions': suggestions[:limit]})
+        }
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_header,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def get_match_suggestions(consumer_id, booking_id=None):
+    key_condition = Key('consumerId').eq(consumer_id)
+    if booking_id:
+        key_condition = key_condition & Key('suggestionId').begins_with(f"{booking_id}#")
+
+    query_kwargs = {
+        'KeyConditionExpression': key_condition,
+        # TTL deletion lags, so suggestions whose shared window has passed are dropped here
+        'FilterExpression': Attr('expiresAt').gt(int(time.time()))
+    }
+
+    items = []
+    try:
+        while True:
+            response = match_suggestions_table.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    except ClientError as e:
+        raise Exception(f"Error querying DynamoDB Match Suggestions table: {e.response['Error']['Message']}")
+
+    # The same consumer can be suggested for several bookings; keep the best one
+    best_by_consumer = {}
+    for item in items:
+        candidate_consumer_id = item['candidateConsumerId']
+        if candidate_consumer_id not in best_by_consumer or item['score'] > best_by_consumer[candidate_consumer_id]['score']:
+            best_by_consumer[candidate_consumer_id] = item
+
+    return [
+        {
+            'candidateConsumerId': item['candidateConsumerId'],
+            'bookingId': item['bookingId'],
+            'oocpChargePointId': item['oocpChargePointId'],
+            'candidateChargePointId': item['candidateChargePointId'],
+            'overlapStartTime': item['overlapStartTime'],
+            'overlapEndTime': item['overlapEndTime'],
+            'distanceKm': float(item['distanceKm']),
+            'score': float(item['score'])
+        }
+        for item in sorted(best_by_consumer.values(), key=lambda item: item['score'], reverse=True)
+    ]
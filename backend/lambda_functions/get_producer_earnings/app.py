@@ -0,0 +1,107 @@
+import json
+import boto3
+import os
+from datetime import date, timedelta
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+transaction_rollups_table = dynamodb.Table(os.environ.get('TRANSACTION_ROLLUPS_TABLE_NAME'))
+
+cors_header = {
+    'Access-Control-Allow-Origin': 'http://localhost:3000',
+    'Access-Control-Allow-Methods': 'OPTIONS, POST, GET',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token'
+}
+
+MAX_RANGE_DAYS = 366
+ROLLUP_COUNTERS = ['transactionCount', 'successfulCount', 'failedCount', 'totalAmount']
+
+def lambda_handler(event, context):
+    # Handle CORS preflight requests (OPTIONS)
+    if event['httpMethod'] == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': cors_header
+        }
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+
+        producer_id = body.get('producerId')
+        charging_point_id = body.get('chargingPointId')
+        from_date = body.get('fromDate')
+        to_date = body.get('toDate')
+
+        if not producer_id or not from_date or not to_date:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': 'Missing required fields in request body'})
+            }
+
+        try:
+            from_day = date.fromisoformat(from_date)
+            to_day = date.fromisoformat(to_date)
+        except (TypeError, ValueError):
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': 'fromDate and toDate must be dates in YYYY-MM-DD format'})
+            }
+
+        if from_day > to_day or to_day - from_day >= timedelta(days=MAX_RANGE_DAYS):
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': f'fromDate must not be after toDate and the range must span at most {MAX_RANGE_DAYS} days'})
+            }
+
+        rollup_key = f"chargingPoint#{charging_point_id}" if charging_point_id else f"producer#{producer_id}"
+        rollups = query_rollups(rollup_key, from_day.isoformat(), to_day.isoformat())
+        # Charging point rollups carry their producer, so producers only see their own chargers
+        days = [build_day(rollup) for rollup in rollups if rollup.get('producerId') == producer_id]
+
+        return {
+            'statusCode': 200,
+            'headers': cors_header,
+            'body': json.dumps({
+                'producerId': producer_id,
+                'chargingPointId': charging_point_id,
+                'days': days,
+                'totals': {counter: sum(day[counter] for day in days) for counter in ROLLUP_COUNTERS}
+            })
+        }
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_header,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def query_rollups(rollup_key, from_day, to_day):
+    """
+    Read the pre-aggregated daily rows for the range, at most one item per day.
+    """
+    query_kwargs = {
+        'KeyConditionExpression': Key('rollupKey').eq(rollup_key) & Key('day').between(from_day, to_day)
+    }
+
+    rollups = []
+    try:
+        while True:
+            response = transaction_rollups_table.query(**query_kwargs)
+            rollups.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return rollups
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    except ClientError as e:
+        raise Exception(f"Error querying DynamoDB Transaction Rollups table: {e.response['Error']['Message']}")
+
+def build_day(rollup):
+    day = {'date': rollup['day']}
+    for counter in ROLLUP_COUNTERS:
+        day[counter] = int(rollup.get(counter, 0))
+    return day
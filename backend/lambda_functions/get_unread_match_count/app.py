@@ -0,0 +1,58 @@
+import json
+import boto3
+import os
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+notification_counters_table = dynamodb.Table(os.environ.get('NOTIFICATION_COUNTERS_TABLE_NAME'))
+
+cors_header = {
+    'Access-Control-Allow-Origin': 'http://localhost:3000',
+    'Access-Control-Allow-Methods': 'OPTIONS, POST, GET',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token'
+}
+
+def lambda_handler(event, context):
+    """
+    Returns the number of unread match requests for a consumer's badge. The counter is
+    kept by request_match and mark_match_requests_read, so this is a single get_item.
+    """
+    # Handle CORS preflight requests (OPTIONS)
+    if event['httpMethod'] == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': cors_header
+        }
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+        consumer_id = body.get('consumerId')
+
+        if not consumer_id:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': 'Missing required fields in request body'})
+            }
+
+        try:
+            response = notification_counters_table.get_item(
+                Key={'consumerId': consumer_id},
+                ProjectionExpression='unreadMatchRequests'
+            )
+        except ClientError as e:
+            raise Exception(f"Error reading unread match count: {e.response['Error']['Message']}")
+
+        return {
+            'statusCode': 200,
+            'headers': cors_header,
+            'body': json.dumps({'unreadCount': max(0, int(response.get('Item', {}).get('unreadMatchRequests', 0)))})
+        }
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_header,
+            'body': json.dumps({'error': str(e)})
+        }
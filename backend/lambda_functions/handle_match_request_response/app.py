@@ -1,15 +1,29 @@
 import json
+import time
 import boto3
 import os
 from datetime import datetime
+from boto3.dynamodb.types import TypeDeserializer
 from botocore.exceptions import ClientError
 
 dynamodb = boto3.resource('dynamodb')
-ses_client = boto3.client('ses')
-ssm_client = boto3.client('ssm')
 
-match_requests_table = dynamodb.Table(os.environ.get('MATCH_REQUESTS_TABLE_NAME'))
-users_table = dynamodb.Table(os.environ.get('USERS_TABLE_NAME'))
+match_requests_table_name = os.environ.get('MATCH_REQUESTS_TABLE_NAME')
+notification_outbox_table_name = os.environ.get('NOTIFICATION_OUTBOX_TABLE_NAME')
+
+# Notifications still unsent after a week are dropped
+NOTIFICATION_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# The answers a recipient can give and the status each one moves the request to
+MATCH_RESPONSES = {
+    'Accept': 'Accepted',
+    'Reject': 'Rejected'
+}
+
+# Allowed status transitions; Accepted, Rejected and Expired are final
+MATCH_STATUS_TRANSITIONS = {
+    'Pending': {'Accepted', 'Rejected', 'Expired'}
+}
 
 cors_header = {
     'Access-Control-Allow-Origin': 'http://localhost:3000',
@@ -17,23 +31,15 @@ cors_header = {
     'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token'
 }
 
-def get_ssm_parameter(param_name):
-    try:
-        value = os.environ.get('SES_EMAIL')
-        if value: 
-            return value
-        response = ssm_client.get_parameter(
-            Name=param_name,
-            WithDecryption=True
-        )
-        return response['Parameter']['Value']
-    except ClientError as e:
-        print(f"Error fetching {param_name} from SSM: {str(e)}")
-        return None
-
-PARAMETER_PREFIX = os.environ.get('PARAMETER_PREFIX')
+deserializer = TypeDeserializer()
 
 def lambda_handler(event, context):
+    """
+    Records the recipient's answer to a match request and, in the same transaction,
+    queues an email telling the sender. send_notifications delivers it from the outbox.
+    The update is conditional on the request still being Pending, so only a real status
+    change writes anything or sends an email.
+    """
 
     # Handle CORS preflight requests (OPTIONS)
     if event['httpMethod'] == 'OPTIONS':
@@ -43,60 +49,90 @@ def lambda_handler(event, context):
         }
 
     try:
-        ses_email = get_ssm_parameter(PARAMETER_PREFIX + 'SES_EMAIL')
         body = json.loads(event['body'])
 
         request_id = body.get('requestId')
         sender_consumer_id = body.get('senderConsumerId')
         recipient_consumer_id = body.get('recipientConsumerId')
         request_response = body.get('requestResponse')
-        
+
         if not sender_consumer_id or not recipient_consumer_id or not request_id or not request_response:
             return {
                 'statusCode': 400,
-                'headers': cors_header, 
+                'headers': cors_header,
                 'body': json.dumps({'error': 'Missing required fields in request body'})
             }
 
-        timestamp = datetime.now().isoformat()
-        
-        # 'Accepted' or 'Rejected'
-        match_status = f'{request_response}ed'
-
-        # Update requests table
-        match_requests_table.update_item(
-            Key={'requestId': request_id},
-            UpdateExpression=(
-                'SET matchStatus = :match_status, '
-                'statusUpdatedAt = :timestamp'
-            ),
-            ExpressionAttributeValues={
-                ':match_status': match_status,
-                ':timestamp': timestamp
-            }
-        )
-
-        # Send email to sender for outcome
-        sender_email = get_user_email(sender_consumer_id)
-        if not sender_email:
+        match_status = MATCH_RESPONSES.get(request_response)
+        if not match_status:
             return {
-                'statusCode': 404,
+                'statusCode': 400,
                 'headers': cors_header,
-                'body': json.dumps({'error': 'Sender user not found'})
+                'body': json.dumps({'error': f"requestResponse must be one of: {', '.join(MATCH_RESPONSES)}"})
             }
 
-        send_email_notification_to_sender(
-            ses_email, 
-            sender_email,
-            recipient_consumer_id
-        )
-        
+        timestamp = datetime.now().isoformat()
+
+        # Only the recipient can answer, and only while the request is in a status that can
+        # move to match_status, so a repeated click fails the condition and queues no email
+        from_statuses = [status for status, to_statuses in MATCH_STATUS_TRANSITIONS.items() if match_status in to_statuses]
+        from_status_values = {f':from_status_{i}': status for i, status in enumerate(from_statuses)}
+        try:
+            dynamodb.meta.client.transact_write_items(
+                TransactItems=[
+                    {
+                        'Update': {
+                            'TableName': match_requests_table_name,
+                            'Key': {'requestId': request_id},
+                            # An answered request no longer needs expiring
+                            'UpdateExpression': (
+                                'SET matchStatus = :match_status, '
+                                'statusUpdatedAt = :timestamp '
+                                'REMOVE expiryStatus'
+                            ),
+                            'ConditionExpression': (
+                                f"matchStatus IN ({', '.join(from_status_values)}) AND "
+                                'senderConsumerId = :sender_consumer_id AND '
+                                'recipientConsumerId = :recipient_consumer_id'
+                            ),
+                            'ExpressionAttributeValues': {
+                                ':match_status': match_status,
+                                ':timestamp': timestamp,
+                                ':sender_consumer_id': sender_consumer_id,
+                                ':recipient_consumer_id': recipient_consumer_id,
+                                **from_status_values
+                            },
+                            'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+                        }
+                    },
+                    {
+                        'Put': {
+                            'TableName': notification_outbox_table_name,
+                            'Item': build_match_response_notification(
+                                request_id,
+                                match_status,
+                                sender_consumer_id,
+                                recipient_consumer_id,
+                                timestamp
+                            )
+                        }
+                    }
+                ]
+            )
+        except ClientError as e:
+            reasons = e.response.get('CancellationReasons', [])
+            if e.response['Error']['Code'] != 'TransactionCanceledException' or not reasons or reasons[0].get('Code') != 'ConditionalCheckFailed':
+                raise
+            # The client returns the old item in its raw attribute value form
+            match_request = {key: deserializer.deserialize(value) for key, value in reasons[0].get('Item', {}).items()}
+            return rejected_transition_response(match_request, match_status, sender_consumer_id, recipient_consumer_id)
+
         return {
             'statusCode': 200,
             'headers': cors_header,
-            'body': json.dumps({'message': 'Match request response sent successfully'})
+            'body': json.dumps({'message': 'Match request response sent successfully', 'matchStatus': match_status})
         }
-    
+
     except Exception as e:
         print(f"Error: {str(e)}")
         return {
@@ -105,40 +141,46 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': str(e)})
         }
 
-def get_user_email(consumer_id):
-    try:
-        response = users_table.query(
-            IndexName='consumerIdEmailIndex',
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('consumerId').eq(consumer_id)
-        )   
-        items = response.get('Items', [])
-        if items:
-            return items[0].get('email')
-        else:
-            return None    
-         
-    except ClientError as e:
-        print(f"Error fetching user email: {e.response['Error']['Message']}")
-        return None
-
-def send_email_notification_to_sender(ses_email, sender_email, recipient_consumer_id):
-    try:
-        subject = "Someone responded to your match request!"
-        body = (
-            f"Hello,\n\n"
-            f"You've received a response to your match request from user {recipient_consumer_id}.\n\n"
-            f"Please log in to your account to view the outcome.\n\n"
-            f"Thank you!"
-        )
-
-        ses_client.send_email(
-            Source=ses_email,
-            Destination={'ToAddresses': [sender_email]},
-            Message={
-                'Subject': {'Data': subject},
-                'Body': {'Text': {'Data': body}}
-            }
-        )
-    except ClientError as e:
-        print(f"Error sending email: {e.response['Error']['Message']}")
-        raise
\ No newline at end of file
+def rejected_transition_response(match_request, match_status, sender_consumer_id, recipient_consumer_id):
+    """
+    Explain a failed status update from the request as it was when the condition failed.
+    Repeating the answer already recorded succeeds without doing anything.
+    """
+    if not match_request:
+        return {
+            'statusCode': 404,
+            'headers': cors_header,
+            'body': json.dumps({'error': 'Match request not found'})
+        }
+    if match_request.get('senderConsumerId') != sender_consumer_id or match_request.get('recipientConsumerId') != recipient_consumer_id:
+        return {
+            'statusCode': 403,
+            'headers': cors_header,
+            'body': json.dumps({'error': 'Only the recipient of a match request can respond to it'})
+        }
+
+    current_status = match_request.get('matchStatus')
+    if current_status == match_status:
+        return {
+            'statusCode': 200,
+            'headers': cors_header,
+            'body': json.dumps({'message': f'Match request already {match_status}', 'matchStatus': match_status})
+        }
+    return {
+        'statusCode': 409,
+        'headers': cors_header,
+        'body': json.dumps({'error': f'Match request is already {current_status}', 'matchStatus': current_status})
+    }
+
+def build_match_response_notification(request_id, match_status, sender_consumer_id, recipient_consumer_id, timestamp):
+    # The sender of the match request is the one notified of the response
+    return {
+        'notificationId': f"match-response#{request_id}#{match_status}",
+        'notificationType': 'MatchResponse',
+        'notificationStatus': 'Pending',
+        'recipientConsumerId': sender_consumer_id,
+        'responderConsumerId': recipient_consumer_id,
+        'matchStatus': match_status,
+        'createdAt': timestamp,
+        'expiresAt': int(time.time()) + NOTIFICATION_TTL_SECONDS
+    }
@@ -0,0 +1,129 @@
+import base64
+import json
+import boto3
+import os
+import time
+import stripe
+from datetime import datetime
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+secrets_client = boto3.client('secretsmanager')
+
+stripe_events_table = dynamodb.Table(os.environ.get('STRIPE_EVENTS_TABLE_NAME'))
+
+# Stripe retries an undelivered event for up to three days; ids are remembered for longer
+STRIPE_EVENT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+PAYMENT_INTENT_STATUSES = {
+    'payment_intent.succeeded': 'Succeeded',
+    'payment_intent.payment_failed': 'Failed',
+    'payment_intent.canceled': 'Canceled'
+}
+
+# Fetched once per container
+webhook_secret = None
+
+def get_webhook_secret():
+    global webhook_secret
+    if webhook_secret:
+        return webhook_secret
+
+    webhook_secret = os.environ.get('STRIPE_WEBHOOK_SECRET')
+    if webhook_secret:
+        return webhook_secret
+
+    try:
+        response = secrets_client.get_secret_value(SecretId=os.environ.get('SECRET_NAME'))
+        webhook_secret = json.loads(response['SecretString'])['STRIPE_WEBHOOK_SECRET']
+        return webhook_secret
+    except ClientError as e:
+        print(f"Error fetching Stripe webhook secret from Secrets Manager: {str(e)}")
+        raise Exception("Stripe webhook secret not found.")
+    except KeyError:
+        print("STRIPE_WEBHOOK_SECRET not found in Secrets Manager's response.")
+        raise Exception("Stripe webhook secret not found in the secret.")
+
+def lambda_handler(event, context):
+    """
+    Receives Stripe webhooks. Each verified payment event is stored once, keyed by its
+    Stripe event id, and reconcile_stripe_events applies it to the Transactions table
+    from the Stripe Events table stream.
+    """
+    payload = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        payload = base64.b64decode(payload).decode('utf-8')
+    headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+
+    try:
+        stripe.Webhook.construct_event(payload, headers.get('stripe-signature'), get_webhook_secret())
+    except (ValueError, stripe.error.SignatureVerificationError) as e:
+        print(f"Rejected Stripe webhook: {str(e)}")
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Invalid Stripe webhook'})
+        }
+
+    # The payload is authentic; read it as plain JSON rather than through Stripe objects
+    stripe_event = json.loads(payload)
+    payment_intent_id, payment_status = resolve_payment_status(stripe_event)
+    if payment_intent_id:
+        try:
+            record_stripe_event(stripe_event, payment_intent_id, payment_status)
+        except Exception as e:
+            # Stripe retries the delivery
+            print(f"Error: {str(e)}")
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': str(e)})
+            }
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'received': True})
+    }
+
+def resolve_payment_status(stripe_event):
+    """
+    Map a Stripe event to (paymentIntentId, paymentStatus), or (None, None) for event
+    types that do not change a payment.
+    """
+    event_type = stripe_event['type']
+    stripe_object = stripe_event['data']['object']
+
+    if event_type in PAYMENT_INTENT_STATUSES:
+        return stripe_object['id'], PAYMENT_INTENT_STATUSES[event_type]
+    if event_type == 'charge.refunded':
+        fully_refunded = stripe_object['amount_refunded'] >= stripe_object['amount']
+        return stripe_object.get('payment_intent'), 'Refunded' if fully_refunded else 'PartiallyRefunded'
+    if event_type == 'charge.dispute.created':
+        return stripe_object.get('payment_intent'), 'Disputed'
+    if event_type == 'charge.dispute.closed':
+        return stripe_object.get('payment_intent'), 'DisputeWon' if stripe_object.get('status') == 'won' else 'DisputeLost'
+    return None, None
+
+def record_stripe_event(stripe_event, payment_intent_id, payment_status):
+    item = {
+        'eventId': stripe_event['id'],
+        'eventType': stripe_event['type'],
+        'paymentIntentId': payment_intent_id,
+        'paymentStatus': payment_status,
+        'created': stripe_event['created'],
+        'receivedAt': datetime.now().isoformat(),
+        'expiresAt': int(time.time()) + STRIPE_EVENT_TTL_SECONDS
+    }
+    if stripe_event['type'] == 'charge.refunded':
+        # Cumulative, so the newest refund event carries the total taken back
+        item['amountRefunded'] = stripe_event['data']['object']['amount_refunded']
+
+    # Stripe delivers events at least once; the conditional put drops redeliveries
+    try:
+        stripe_events_table.put_item(
+            Item=item,
+            ConditionExpression='attribute_not_exists(eventId)'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Ignoring duplicate Stripe event {stripe_event['id']}")
+            return
+        raise Exception(f"Error storing Stripe event: {e.response['Error']['Message']}")
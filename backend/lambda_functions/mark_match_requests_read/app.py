@@ -0,0 +1,147 @@
+import json
+import boto3
+import os
+from datetime import datetime
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+
+match_requests_table = dynamodb.Table(os.environ.get('MATCH_REQUESTS_TABLE_NAME'))
+match_requests_table_name = os.environ.get('MATCH_REQUESTS_TABLE_NAME')
+notification_counters_table_name = os.environ.get('NOTIFICATION_COUNTERS_TABLE_NAME')
+
+cors_header = {
+    'Access-Control-Allow-Origin': 'http://localhost:3000',
+    'Access-Control-Allow-Methods': 'OPTIONS, POST, GET',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token'
+}
+
+# A transaction holds at most 100 items, one of which is the unread counter
+MAX_REQUESTS_PER_TRANSACTION = 99
+# Requests that turn out to be read already are dropped and the rest retried
+MAX_TRANSACTION_ATTEMPTS = 3
+
+def lambda_handler(event, context):
+    """
+    Marks a consumer's received match requests as read, either the requestIds given or,
+    with markAll, every unread one. Each batch of requests is flagged and the consumer's
+    unread counter decremented in one transaction, so the counter always matches.
+    """
+    # Handle CORS preflight requests (OPTIONS)
+    if event['httpMethod'] == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': cors_header
+        }
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+
+        consumer_id = body.get('consumerId')
+        request_ids = body.get('requestIds') or []
+        mark_all = bool(body.get('markAll', False))
+
+        if not consumer_id or not (request_ids or mark_all):
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': 'Missing required fields in request body'})
+            }
+        if not mark_all and len(request_ids) > MAX_REQUESTS_PER_TRANSACTION:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': f"At most {MAX_REQUESTS_PER_TRANSACTION} requestIds can be marked at once"})
+            }
+
+        if mark_all:
+            request_ids = get_unread_request_ids(consumer_id)
+
+        marked = 0
+        # Duplicate ids in one transaction are rejected by DynamoDB
+        request_ids = list(dict.fromkeys(request_ids))
+        for start in range(0, len(request_ids), MAX_REQUESTS_PER_TRANSACTION):
+            marked += mark_requests_read(consumer_id, request_ids[start:start + MAX_REQUESTS_PER_TRANSACTION])
+
+        return {
+            'statusCode': 200,
+            'headers': cors_header,
+            'body': json.dumps({'marked': marked})
+        }
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_header,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def get_unread_request_ids(consumer_id):
+    request_ids = []
+    query_kwargs = {
+        'IndexName': 'recipientConsumerId-isRead-Index',
+        'KeyConditionExpression': Key('recipientConsumerId').eq(consumer_id) & Key('isRead').eq(int(False)),
+        'ProjectionExpression': 'requestId'
+    }
+    while True:
+        response = match_requests_table.query(**query_kwargs)
+        request_ids.extend(item['requestId'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return request_ids
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def mark_requests_read(consumer_id, request_ids):
+    """
+    Flag the requests read and take them off the unread counter. Returns how many were
+    still unread; requests already read or not addressed to the consumer are skipped.
+    """
+    for _ in range(MAX_TRANSACTION_ATTEMPTS):
+        if not request_ids:
+            return 0
+
+        read_at = datetime.now().isoformat()
+        transact_items = [
+            {
+                'Update': {
+                    'TableName': match_requests_table_name,
+                    'Key': {'requestId': request_id},
+                    'UpdateExpression': 'SET isRead = :read, readAt = :read_at',
+                    'ConditionExpression': 'recipientConsumerId = :consumer_id AND isRead = :unread',
+                    'ExpressionAttributeValues': {
+                        ':read': int(True),
+                        ':unread': int(False),
+                        ':read_at': read_at,
+                        ':consumer_id': consumer_id
+                    }
+                }
+            }
+            for request_id in request_ids
+        ]
+        transact_items.append({
+            'Update': {
+                'TableName': notification_counters_table_name,
+                'Key': {'consumerId': consumer_id},
+                'UpdateExpression': 'ADD unreadMatchRequests :read_count',
+                'ExpressionAttributeValues': {':read_count': -len(request_ids)}
+            }
+        })
+
+        try:
+            dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+            return len(request_ids)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            reasons = e.response.get('CancellationReasons', [])
+            still_unread = [
+                request_id for request_id, reason in zip(request_ids, reasons)
+                if reason.get('Code') != 'ConditionalCheckFailed'
+            ]
+            if len(still_unread) == len(request_ids):
+                # Cancelled for another reason, such as a conflicting write
+                raise
+            request_ids = still_unread
+
+    raise Exception("Match requests kept changing while being marked as read")
@@ -1,9 +1,10 @@
+import hashlib
 import json
 import os
-import stripe
+import time
 import boto3
-from boto3.dynamodb.conditions import Key
 import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from botocore.exceptions import ClientError
 
@@ -12,14 +13,42 @@ dynamodb = boto3.resource('dynamodb')
 secrets_clientr = boto3.client('secretsmanager')
 
 producers_table = dynamodb.Table(os.environ.get('PRODUCERS_TABLE_NAME'))
-transactions_table = dynamodb.Table(os.environ.get('TRANSACTIONS_TABLE_NAME'))
 customer_payment_info_table = dynamodb.Table(os.environ.get('CUSTOMER_PAYMENT_INFORMATION_TABLE_NAME'))
+payment_idempotency_table = dynamodb.Table(os.environ.get('PAYMENT_IDEMPOTENCY_TABLE_NAME'))
+producer_earnings_table = dynamodb.Table(os.environ.get('PRODUCER_EARNINGS_TABLE_NAME'))
+
+# 'immediate' transfers each charge to the producer at checkout. 'deferred' records the
+# producer's share in the earnings ledger and settle_producer_payouts pays it out in batches.
+PAYOUT_MODE = os.environ.get('PAYOUT_MODE', 'immediate')
+
+# Stripe keeps idempotency keys for 24 hours, so the ledger does the same
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60
+# An in-progress claim older than this belongs to an invocation that died and can be taken over
+IDEMPOTENCY_LOCK_SECONDS = 60
+
+# producerId -> (expiresAt, stripeAccountId or None). Writes to the Producers table do not
+# reach this per-container cache, so after a producer changes or disconnects their Stripe
+# account, payments in a warm container can use the old account for up to
+# PRODUCER_ACCOUNT_CACHE_TTL_SECONDS. A transfer Stripe rejects for its destination drops
+# the entry at once. Producers without an account are cached for a shorter time so a newly
+# connected account is picked up quickly.
+PRODUCER_ACCOUNT_CACHE_TTL_SECONDS = 60
+PRODUCER_ACCOUNT_NEGATIVE_CACHE_TTL_SECONDS = 15
+producer_account_cache = {}
+
+# Payment audit records are written to the function's log stream instead of DynamoDB, so no
+# response waits on, or is failed by, the audit write. A CloudWatch Logs subscription hands them
+# to store_payment_audit_records, which batches them into the Transactions table.
+PAYMENT_AUDIT_LOG_PREFIX = 'PAYMENT_AUDIT '
+
+# Runs the independent DynamoDB reads and writes around the Stripe calls concurrently
+io_executor = ThreadPoolExecutor(max_workers=4)
 
 # CORS headers
 cors_header = {
     'Access-Control-Allow-Origin': 'http://localhost:3000',
     'Access-Control-Allow-Methods': 'OPTIONS, POST, GET',
-    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token'
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token, Idempotency-Key'
 }
 
 # Function to fetch the Stripe API key
@@ -39,8 +68,34 @@ def get_stripe_api_key():
         print("STRIPE_API_KEY not found in Secrets Manager's response.")
         raise Exception("Stripe API key not found in the secret.")
 
+# The Stripe SDK is imported and its API key fetched on the first payment, then
+# reused for the lifetime of the container. OPTIONS and invalid requests never load it.
+stripe = None
 
-stripe.api_key = get_stripe_api_key()
+def get_stripe(refresh_api_key=False):
+    global stripe
+    if stripe is None:
+        import stripe as stripe_sdk
+        stripe_sdk.api_key = get_stripe_api_key()
+        stripe = stripe_sdk
+    elif refresh_api_key:
+        stripe.api_key = get_stripe_api_key()
+    return stripe
+
+def call_stripe(operation):
+    """
+    Run operation(stripe). On an authentication error the key may have been rotated,
+    so it is fetched again and the call retried once.
+    """
+    stripe_sdk = get_stripe()
+    try:
+        return operation(stripe_sdk)
+    except stripe_sdk.error.AuthenticationError:
+        print("Stripe authentication failed, refreshing the Stripe API key")
+        return operation(get_stripe(refresh_api_key=True))
+
+def is_stripe_error(error):
+    return stripe is not None and isinstance(error, stripe.error.StripeError)
 
 # Main Lambda handler function
 def lambda_handler(event, context):
@@ -51,6 +106,8 @@ def lambda_handler(event, context):
             'headers': cors_header
         }
 
+    idempotency_key = None
+    payment_intent = None
     try:
         event_body = json.loads(event.get('body'))
 
@@ -64,121 +121,280 @@ def lambda_handler(event, context):
 
         if not all([payment_method_id, amount, consumer_id, producer_id, charging_point_id, oocp_charge_point_id]):
             error_message = 'Missing required parameters'
-            log_payment_to_dynamodb(consumer_id, producer_id, charging_point_id, oocp_charge_point_id, amount, payment_method_id, False, error_message)
+            audit_payment(consumer_id, producer_id, charging_point_id, oocp_charge_point_id, amount, payment_method_id, False, error_message)
             return {
                 'statusCode': 400,
                 'headers': cors_header, 
                 'body': json.dumps({'error': error_message})
             }
 
-        # Get the Stripe account ID for the producer
-        producer_stripe_account_id = get_stripe_account_for_producer(producer_id)
+        # A retried request with the same idempotency key gets the stored result back
+        request_idempotency_key = get_idempotency_key(event, event_body)
+        if request_idempotency_key:
+            replayed_response = claim_idempotency_key(request_idempotency_key, build_request_hash(event_body))
+            if replayed_response:
+                return replayed_response
+            idempotency_key = request_idempotency_key
+
+        # Look up the producer's Stripe account and the consumer's saved payment method together
+        payment_method_exists_future = io_executor.submit(check_payment_method_exists, consumer_id, payment_method_id)
+        producer_stripe_account_id = io_executor.submit(get_stripe_account_for_producer, producer_id).result()
 
         if not producer_stripe_account_id:
+            release_idempotency_key(idempotency_key)
             error_message = f"Producer {producer_id} does not have a valid Stripe account"
-            log_payment_to_dynamodb(consumer_id, producer_id, charging_point_id, oocp_charge_point_id, amount, payment_method_id, False, error_message)
+            audit_payment(consumer_id, producer_id, charging_point_id, oocp_charge_point_id, amount, payment_method_id, False, error_message)
             return {
                 'statusCode': 400,
                 'headers': cors_header, 
                 'body': json.dumps({'error': error_message})
             }
 
+        # A deferred charge is paid out in a batched Transfer grouped by its payout, which
+        # is not known yet, so the PaymentIntent only gets a transfer_group when paid out now
+        payment_intent_options = {} if PAYOUT_MODE == 'deferred' else {'transfer_group': producer_stripe_account_id}
+
         # Create a PaymentIntent in Stripe
-        payment_intent = stripe.PaymentIntent.create(
+        payment_intent = call_stripe(lambda stripe_sdk: stripe_sdk.PaymentIntent.create(
             amount=amount, 
             currency='usd', 
             payment_method=payment_method_id, 
             confirmation_method='manual',
             confirm=True,
-            transfer_group=producer_stripe_account_id,
-        )
-
-        # Create a Transfer to the producer's Stripe account
-        transfer = stripe.Transfer.create(
-            amount=amount, 
-            currency='usd',
-            destination=producer_stripe_account_id,
-            transfer_group=payment_intent.transfer_group,
-        )
-        
-        # Check if the payment method exists for the customer
-        payment_method_exists = check_payment_method_exists(consumer_id, payment_method_id)
-
-        if not payment_method_exists:
-            store_payment_method(consumer_id, payment_method_id)
+            **payment_intent_options,
+            **stripe_request_options(idempotency_key, 'payment-intent'),
+        ))
 
         success_message = 'Payment processed successfully'
-        log_payment_to_dynamodb(consumer_id, producer_id, charging_point_id, oocp_charge_point_id, amount, payment_method_id, True, success_message)
+        response_body = {
+            'message': success_message,
+            'payment_intent': payment_intent.id
+        }
 
-        return {
+        if PAYOUT_MODE == 'deferred':
+            # The producer is paid in the next batched payout instead of a Transfer per charge
+            response_body['payout'] = 'Deferred'
+        else:
+            # Create a Transfer to the producer's Stripe account
+            transfer = call_stripe(lambda stripe_sdk: stripe_sdk.Transfer.create(
+                amount=amount, 
+                currency='usd',
+                destination=producer_stripe_account_id,
+                transfer_group=payment_intent.transfer_group,
+                **stripe_request_options(idempotency_key, 'transfer'),
+            ))
+            response_body['transfer'] = transfer.id
+
+        response = {
             'statusCode': 200,
             'headers': cors_header, 
-            'body': json.dumps({
-                'message': success_message,
-                'payment_intent': payment_intent.id,
-                'transfer': transfer.id
-            })
-        }
-    except stripe.error.StripeError as e:
-        error_message = f"Stripe error: {str(e)}"
-        log_payment_to_dynamodb(consumer_id, producer_id, charging_point_id, oocp_charge_point_id, amount, payment_method_id, False, error_message)
-        return {
-            'statusCode': 400,
-            'headers': cors_header, 
-            'body': json.dumps({'error': error_message})
+            'body': json.dumps(response_body)
         }
+
+        # The post-payment writes are independent, so together they cost one write of latency
+        post_payment_writes = [
+            io_executor.submit(save_payment_method_if_new, consumer_id, payment_method_id, payment_method_exists_future),
+            io_executor.submit(complete_idempotency_key, idempotency_key, response),
+        ]
+        if PAYOUT_MODE == 'deferred':
+            post_payment_writes.append(io_executor.submit(record_producer_earning, payment_intent.id, producer_id, amount))
+        wait(post_payment_writes)
+
+        # The earnings entry is what gets the producer paid, so failing to write it fails the request
+        for write in post_payment_writes:
+            write.result()
+
+        audit_payment(consumer_id, producer_id, charging_point_id, oocp_charge_point_id, amount, payment_method_id, True, success_message, payment_intent.id)
+        return response
     except Exception as e:
+        if is_stripe_error(e):
+            if getattr(e, 'param', None) == 'destination':
+                # The producer's cached Stripe account has changed or been disconnected
+                invalidate_stripe_account_for_producer(producer_id)
+            error_message = f"Stripe error: {str(e)}"
+            audit_payment(consumer_id, producer_id, charging_point_id, oocp_charge_point_id, amount, payment_method_id, False, error_message, payment_intent.id if payment_intent else None)
+            response = {
+                'statusCode': 400,
+                'headers': cors_header, 
+                'body': json.dumps({'error': error_message})
+            }
+            if payment_intent is None:
+                # The charge itself failed (e.g. card declined), so replaying the error is safe
+                complete_idempotency_key(idempotency_key, response)
+            else:
+                # Charged but not transferred: a retry must be able to finish the transfer
+                release_idempotency_key(idempotency_key)
+            return response
+
+        # Let the client retry; Stripe's own idempotency keys stop a second charge
+        release_idempotency_key(idempotency_key)
         error_message = f"Internal error: {str(e)}"
-        log_payment_to_dynamodb(consumer_id, producer_id, charging_point_id, oocp_charge_point_id, amount, payment_method_id, False, error_message)
+        audit_payment(consumer_id, producer_id, charging_point_id, oocp_charge_point_id, amount, payment_method_id, False, error_message, payment_intent.id if payment_intent else None)
         return {
             'statusCode': 500,
             'headers': cors_header, 
             'body': json.dumps({'error': error_message})
         }
 
-def check_payment_method_exists(consumer_id, payment_method_id):
+def get_idempotency_key(event, event_body):
+    headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+    return event_body.get('idempotencyKey') or headers.get('idempotency-key')
+
+def build_request_hash(event_body):
+    request_fields = ['paymentMethodId', 'amount', 'consumerId', 'producerId', 'chargingPointId', 'oocpChargePointId']
+    request = json.dumps({field: event_body.get(field) for field in request_fields}, sort_keys=True)
+    return hashlib.sha256(request.encode()).hexdigest()
+
+def stripe_request_options(idempotency_key, operation):
+    return {'idempotency_key': f"{idempotency_key}-{operation}"} if idempotency_key else {}
+
+def claim_idempotency_key(idempotency_key, request_hash):
+    """
+    Record the key as in progress with a conditional put. Returns None when this
+    invocation owns the key, otherwise the response to send back to the client.
+    """
+    now = int(time.time())
+    try:
+        payment_idempotency_table.put_item(
+            Item={
+                'idempotencyKey': idempotency_key,
+                'status': 'InProgress',
+                'requestHash': request_hash,
+                'lockedUntil': now + IDEMPOTENCY_LOCK_SECONDS,
+                'createdAt': datetime.now().isoformat(),
+                'expiresAt': now + IDEMPOTENCY_KEY_TTL_SECONDS
+            },
+            ConditionExpression='attribute_not_exists(idempotencyKey) OR (#status = :in_progress AND lockedUntil < :now)',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':in_progress': 'InProgress', ':now': now}
+        )
+        return None
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise Exception(f"Error claiming idempotency key: {e.response['Error']['Message']}")
+
+    item = payment_idempotency_table.get_item(Key={'idempotencyKey': idempotency_key}, ConsistentRead=True).get('Item', {})
+    if item.get('requestHash') != request_hash:
+        return {
+            'statusCode': 422,
+            'headers': cors_header,
+            'body': json.dumps({'error': 'Idempotency key was already used for a different payment'})
+        }
+    if item.get('status') == 'Completed':
+        return {
+            'statusCode': int(item['responseStatusCode']),
+            'headers': cors_header,
+            'body': item['responseBody']
+        }
+    return {
+        'statusCode': 409,
+        'headers': cors_header,
+        'body': json.dumps({'error': 'A payment with this idempotency key is already in progress'})
+    }
+
+def complete_idempotency_key(idempotency_key, response):
+    if not idempotency_key:
+        return
+    try:
+        payment_idempotency_table.update_item(
+            Key={'idempotencyKey': idempotency_key},
+            UpdateExpression='SET #status = :completed, responseStatusCode = :status_code, responseBody = :body REMOVE lockedUntil',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':completed': 'Completed',
+                ':status_code': response['statusCode'],
+                ':body': response['body']
+            }
+        )
+    except ClientError as e:
+        print(f"Error completing idempotency key {idempotency_key}: {str(e)}")
+
+def release_idempotency_key(idempotency_key):
+    if not idempotency_key:
+        return
+    try:
+        payment_idempotency_table.delete_item(Key={'idempotencyKey': idempotency_key})
+    except ClientError as e:
+        print(f"Error releasing idempotency key {idempotency_key}: {str(e)}")
+
+def record_producer_earning(payment_intent_id, producer_id, amount):
+    # Keyed by PaymentIntent so a retried request that replays the same charge is recorded once
     try:
-        response = customer_payment_info_table.query(
-            IndexName='consumerIdIndex',
-            KeyConditionExpression=Key('consumerId').eq(consumer_id)  # Query for a specific consumerId
+        producer_earnings_table.put_item(
+            Item={
+                'earningId': payment_intent_id,
+                'producerId': producer_id,
+                'paymentIntentId': payment_intent_id,
+                'amount': amount,
+                'currency': 'usd',
+                'payoutStatus': 'Pending',
+                'createdAt': datetime.now().isoformat()
+            },
+            ConditionExpression='attribute_not_exists(earningId)'
         )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise Exception(f"Error recording producer earning: {e.response['Error']['Message']}")
 
-        if 'Items' in response:
-            item = response['Items'][0]
-            if 'paymentMethodId' in item:
-                return item['paymentMethodId'] == payment_method_id
-        return False
+def check_payment_method_exists(consumer_id, payment_method_id):
+    # Payment methods are keyed by (consumerId, paymentMethodId), so this is a single-item read
+    # however many cards the consumer has saved
+    try:
+        response = customer_payment_info_table.get_item(
+            Key={'consumerId': consumer_id, 'paymentMethodId': payment_method_id},
+            ProjectionExpression='paymentMethodId'
+        )
+        return 'Item' in response
     
     except ClientError as e:
         print(f"Error checking payment method in DynamoDB: {str(e)}")
         raise Exception(f"Error message: {e}")
 
+def save_payment_method_if_new(consumer_id, payment_method_id, payment_method_exists_future):
+    # Keeping the card on file is bookkeeping; it must not fail a payment that has already been taken
+    try:
+        if not payment_method_exists_future.result():
+            store_payment_method(consumer_id, payment_method_id)
+    except Exception as e:
+        print(f"Error saving payment method for consumer {consumer_id}: {str(e)}")
+
 def store_payment_method(consumer_id, payment_method_id):
+    # A concurrent payment may have saved the same card since the existence check
     try:
-        payment_info_id = str(uuid.uuid4())
         customer_payment_info_table.put_item(
             Item={
-                'paymentInfoId': payment_info_id, 
                 'consumerId': consumer_id,
                 'paymentMethodId': payment_method_id,
                 'updatedAt': datetime.now().isoformat()
-            }
+            },
+            ConditionExpression='attribute_not_exists(paymentMethodId)'
         )
     except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return
         print(f"Error storing payment method in DynamoDB: {str(e)}")
         raise Exception(f"Error message: {e}")
 
 def get_stripe_account_for_producer(producer_id):
+    cached = producer_account_cache.get(producer_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
     try:
-        response = producers_table.get_item(Key={'producerId': producer_id})
-        if 'Item' in response and 'stripeAccountId' in response['Item']:
-            return response['Item']['stripeAccountId']
-        return None
+        response = producers_table.get_item(Key={'producerId': producer_id}, ProjectionExpression='stripeAccountId')
     except ClientError as e:
         print(f"Error fetching Stripe account ID for producer {producer_id}: {str(e)}")
         return None
 
-def log_payment_to_dynamodb(
+    stripe_account_id = response.get('Item', {}).get('stripeAccountId')
+    ttl = PRODUCER_ACCOUNT_CACHE_TTL_SECONDS if stripe_account_id else PRODUCER_ACCOUNT_NEGATIVE_CACHE_TTL_SECONDS
+    producer_account_cache[producer_id] = (time.monotonic() + ttl, stripe_account_id)
+    return stripe_account_id
+
+def invalidate_stripe_account_for_producer(producer_id):
+    producer_account_cache.pop(producer_id, None)
+
+def audit_payment(
     consumer_id, 
     producer_id, 
     charging_point_id, 
@@ -186,32 +402,28 @@ def log_payment_to_dynamodb(
     amount, 
     payment_method_id, 
     is_successful, 
-    message
+    message,
+    payment_intent_id=None
 ):
-    try:
-        transaction_id = str(uuid.uuid4())
-
-        consumer_id_with_is_successful = f"{consumer_id}#{is_successful}"
-        producer_id_with_is_successful = f"{producer_id}#{is_successful}"
-        charging_point_id_with_is_successful = f"{charging_point_id}#{is_successful}"
-
-        payment_record = {
-            'transactionId': transaction_id,
-            'consumerId': consumer_id,
-            'producerId': producer_id,
-            'chargingPointId': charging_point_id,
-            'oocpChargePointId': oocp_charge_point_id,
-            'paymentMethodId': payment_method_id,
-            'amount': amount,
-            'isSuccessful': is_successful,
-            'timestamp': datetime.now().isoformat(),
-            'message': message, 
-            'consumerIdWithIsSuccessful': consumer_id_with_is_successful,
-            'producerIdWithIsSuccessful': producer_id_with_is_successful,
-            'chargingPointIdWithIsSuccessful': charging_point_id_with_is_successful
-        }
+    # A successful payment is keyed by its PaymentIntent so Stripe webhook events can be
+    # applied to it directly (see reconcile_stripe_events)
+    transaction_id = payment_intent_id if is_successful and payment_intent_id else str(uuid.uuid4())
+    payment_record = {
+        'transactionId': transaction_id,
+        'consumerId': consumer_id,
+        'producerId': producer_id,
+        'chargingPointId': charging_point_id,
+        'oocpChargePointId': oocp_charge_point_id,
+        'paymentMethodId': payment_method_id,
+        'paymentIntentId': payment_intent_id,
+        'amount': amount,
+        'isSuccessful': is_successful,
+        'timestamp': datetime.now().isoformat(),
+        'message': message, 
+        'consumerIdWithIsSuccessful': f"{consumer_id}#{is_successful}",
+        'producerIdWithIsSuccessful': f"{producer_id}#{is_successful}",
+        'chargingPointIdWithIsSuccessful': f"{charging_point_id}#{is_successful}"
+    }
 
-        transactions_table.put_item(Item=payment_record)
-
-    except ClientError as e:
-        print(f"Error logging payment to DynamoDB: {str(e)}")
+    # One line per record; a failed audit can never mask the payment outcome
+    print(f"{PAYMENT_AUDIT_LOG_PREFIX}{json.dumps(payment_record, default=str)}")
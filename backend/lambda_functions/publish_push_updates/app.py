@@ -0,0 +1,164 @@
+import json
+import boto3
+import os
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+push_subscriptions_table = dynamodb.Table(os.environ.get('PUSH_SUBSCRIPTIONS_TABLE_NAME'))
+# Posts to the connections of the push WebSocket API stage
+apigateway_management_client = boto3.client('apigatewaymanagementapi', endpoint_url=os.environ.get('WEBSOCKET_ENDPOINT'))
+
+match_requests_table_name = os.environ.get('MATCH_REQUESTS_TABLE_NAME')
+bookings_table_name = os.environ.get('BOOKINGS_TABLE_NAME')
+charging_points_table_name = os.environ.get('CHARGING_POINTS_TABLE_NAME')
+
+# Must match the precisions push_connections subscribes viewports with
+VIEWPORT_GEOHASH_PRECISIONS = (5, 4)
+
+# Runs the subscription lookups and connection posts concurrently
+io_executor = ThreadPoolExecutor(max_workers=16)
+
+deserializer = TypeDeserializer()
+
+def lambda_handler(event, context):
+    """
+    Triggered by the Match Requests, Bookings and Charging Points table streams. Turns
+    each change into a delta message for the consumers or map cells it concerns and
+    posts it to their subscribed WebSocket connections. Within a batch only the latest
+    delta per topic and item is sent. Deltas carry the item's current state, so a batch
+    retried after an error can be sent again safely.
+    """
+    deltas = {}
+    for record in event.get('Records', []):
+        table_name = record['eventSourceARN'].split('/')[1]
+        new_image = {key: deserializer.deserialize(value) for key, value in record['dynamodb'].get('NewImage', {}).items()}
+        old_image = {key: deserializer.deserialize(value) for key, value in record['dynamodb'].get('OldImage', {}).items()}
+        if not new_image:
+            continue
+
+        for topic, item_id, message in build_deltas(table_name, new_image, old_image):
+            # Later records overwrite earlier ones for the same item
+            deltas[(topic, item_id)] = message
+
+    messages_by_topic = {}
+    for (topic, _), message in deltas.items():
+        messages_by_topic.setdefault(topic, []).append(message)
+
+    connection_ids_by_topic = dict(zip(messages_by_topic, io_executor.map(get_topic_connection_ids, messages_by_topic)))
+
+    messages_by_connection = {}
+    for topic, messages in messages_by_topic.items():
+        for connection_id in connection_ids_by_topic[topic]:
+            messages_by_connection.setdefault(connection_id, []).extend(messages)
+
+    outcomes = list(io_executor.map(lambda item: post_messages(*item), messages_by_connection.items()))
+
+    print(f"Pushed {len(deltas)} updates to {outcomes.count(True)} connections, {outcomes.count(False)} gone")
+
+    return {'pushed': len(deltas), 'connections': outcomes.count(True)}
+
+def build_deltas(table_name, new_image, old_image):
+    if table_name == match_requests_table_name:
+        return build_match_request_deltas(new_image, old_image)
+    if table_name == bookings_table_name:
+        return build_booking_deltas(new_image)
+    if table_name == charging_points_table_name:
+        return build_charging_point_deltas(new_image, old_image)
+    return []
+
+def build_match_request_deltas(match_request, old_match_request):
+    # Only status and read changes are shown to the two consumers
+    if old_match_request and all(match_request.get(name) == old_match_request.get(name) for name in ('matchStatus', 'isRead')):
+        return []
+
+    start_time, _, end_time = match_request.get('startTime#endTime', '').partition('#')
+    message = {
+        'type': 'matchRequest',
+        'requestId': match_request['requestId'],
+        'senderConsumerId': match_request.get('senderConsumerId'),
+        'recipientConsumerId': match_request.get('recipientConsumerId'),
+        'matchEventType': match_request.get('matchEventType'),
+        'matchStatus': match_request.get('matchStatus'),
+        'startTime': start_time,
+        'endTime': end_time,
+        'isRead': bool(match_request.get('isRead'))
+    }
+    return [
+        (f"consumer#{consumer_id}", match_request['requestId'], message)
+        for consumer_id in {match_request.get('senderConsumerId'), match_request.get('recipientConsumerId')}
+        if consumer_id
+    ]
+
+def build_booking_deltas(booking):
+    start_time, _, end_time = booking.get('startTime#endTime', '').partition('#')
+    message = {
+        'type': 'booking',
+        'bookingId': booking['bookingId'],
+        'oocpChargePointId': booking.get('oocpChargePointId'),
+        'startTime': start_time,
+        'endTime': end_time,
+        'released': 'releasedAt' in booking
+    }
+    return [(f"consumer#{booking['consumerId']}", booking['bookingId'], message)]
+
+def build_charging_point_deltas(charging_point, old_charging_point):
+    # The map only needs to hear about availability changes
+    if old_charging_point and charging_point.get('isAvailable') == old_charging_point.get('isAvailable'):
+        return []
+    geohash = charging_point.get('geohash')
+    if not geohash:
+        return []
+
+    message = {
+        'type': 'chargingPoint',
+        'oocpChargePointId': charging_point['oocpChargePointId'],
+        'chargingPointId': charging_point.get('chargingPointId'),
+        'location': charging_point.get('location'),
+        'isAvailable': charging_point.get('isAvailable')
+    }
+    return [
+        (f"geohash#{geohash[:precision]}", charging_point['oocpChargePointId'], message)
+        for precision in VIEWPORT_GEOHASH_PRECISIONS
+    ]
+
+def get_topic_connection_ids(topic):
+    query_kwargs = {
+        'KeyConditionExpression': Key('topic').eq(topic),
+        'ProjectionExpression': 'connectionId'
+    }
+    connection_ids = []
+    while True:
+        response = push_subscriptions_table.query(**query_kwargs)
+        connection_ids.extend(item['connectionId'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return connection_ids
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def post_messages(connection_id, messages):
+    """
+    Send a connection its deltas in one frame. Returns False when the connection has
+    closed, after removing its subscriptions.
+    """
+    try:
+        apigateway_management_client.post_to_connection(
+            ConnectionId=connection_id,
+            Data=json.dumps({'updates': messages}).encode()
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'GoneException':
+            raise
+        remove_connection(connection_id)
+        return False
+    return True
+
+def remove_connection(connection_id):
+    response = push_subscriptions_table.query(
+        IndexName='connectionId-Index',
+        KeyConditionExpression=Key('connectionId').eq(connection_id)
+    )
+    with push_subscriptions_table.batch_writer() as batch:
+        for item in response.get('Items', []):
+            batch.delete_item(Key={'topic': item['topic'], 'connectionId': connection_id})
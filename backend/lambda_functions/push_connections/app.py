@@ -0,0 +1,142 @@
+import json
+import time
+import boto3
+import os
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+push_subscriptions_table = dynamodb.Table(os.environ.get('PUSH_SUBSCRIPTIONS_TABLE_NAME'))
+
+# API Gateway closes WebSocket connections after two hours, so subscriptions missed
+# by $disconnect are deleted by TTL soon after
+SUBSCRIPTION_TTL_SECONDS = 3 * 60 * 60
+
+# Must match the precision store_producers_charging_points writes geohashes with.
+# Viewports too large for MAX_VIEWPORT_CELLS cells are covered with the coarser cells
+GEOHASH_PRECISION = 5
+COARSE_GEOHASH_PRECISION = 4
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+MAX_VIEWPORT_CELLS = 100
+
+def lambda_handler(event, context):
+    """
+    Handles the push WebSocket API routes. On $connect the connection subscribes to its
+    consumer's match and booking updates, subscribeViewport replaces the geohash cells
+    whose charger updates it receives, and $disconnect removes its subscriptions.
+    publish_push_updates reads the subscriptions to fan stream changes out.
+    """
+    route_key = event['requestContext']['routeKey']
+    connection_id = event['requestContext']['connectionId']
+
+    try:
+        if route_key == '$connect':
+            consumer_id = (event.get('queryStringParameters') or {}).get('consumerId')
+            if not consumer_id:
+                return {'statusCode': 400, 'body': json.dumps({'error': 'consumerId query parameter is required'})}
+            subscribe(connection_id, [f"consumer#{consumer_id}"])
+
+        elif route_key == '$disconnect':
+            unsubscribe(connection_id, get_connection_topics(connection_id))
+
+        elif route_key == 'subscribeViewport':
+            body = json.loads(event.get('body') or '{}')
+            try:
+                cells = geohash_cells_in_viewport(body.get('viewport') or {})
+            except ValueError as e:
+                return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
+
+            topics = {f"geohash#{cell}" for cell in cells}
+            current_topics = {topic for topic in get_connection_topics(connection_id) if topic.startswith('geohash#')}
+            unsubscribe(connection_id, current_topics - topics)
+            subscribe(connection_id, topics - current_topics)
+
+        else:
+            return {'statusCode': 400, 'body': json.dumps({'error': f"Unsupported route: {route_key}"})}
+
+        return {'statusCode': 200}
+
+    except ClientError as e:
+        print(f"Error: {e.response['Error']['Message']}")
+        return {'statusCode': 500, 'body': json.dumps({'error': e.response['Error']['Message']})}
+
+def subscribe(connection_id, topics):
+    expires_at = int(time.time()) + SUBSCRIPTION_TTL_SECONDS
+    with push_subscriptions_table.batch_writer() as batch:
+        for topic in topics:
+            batch.put_item(Item={'topic': topic, 'connectionId': connection_id, 'expiresAt': expires_at})
+
+def unsubscribe(connection_id, topics):
+    with push_subscriptions_table.batch_writer() as batch:
+        for topic in topics:
+            batch.delete_item(Key={'topic': topic, 'connectionId': connection_id})
+
+def get_connection_topics(connection_id):
+    query_kwargs = {
+        'IndexName': 'connectionId-Index',
+        'KeyConditionExpression': Key('connectionId').eq(connection_id)
+    }
+    topics = []
+    while True:
+        response = push_subscriptions_table.query(**query_kwargs)
+        topics.extend(item['topic'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return topics
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def geohash_cells_in_viewport(viewport):
+    """
+    Return the geohash cells covering a {north, south, east, west} viewport, at
+    GEOHASH_PRECISION when that takes at most MAX_VIEWPORT_CELLS cells and at
+    COARSE_GEOHASH_PRECISION otherwise.
+    """
+    try:
+        north, south, east, west = (float(viewport[side]) for side in ('north', 'south', 'east', 'west'))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('viewport must have numeric north, south, east and west bounds')
+    if not (-90 <= south <= north <= 90) or not (-180 <= west <= east <= 180):
+        raise ValueError('viewport bounds are out of range')
+
+    for precision in (GEOHASH_PRECISION, COARSE_GEOHASH_PRECISION):
+        # Longitude takes the extra bit when the total is odd
+        latitude_bits = precision * 5 // 2
+        cell_height = 180 / 2 ** latitude_bits
+        cell_width = 360 / 2 ** (precision * 5 - latitude_bits)
+
+        rows = int(north // cell_height - south // cell_height) + 1
+        columns = int(east // cell_width - west // cell_width) + 1
+        if rows * columns > MAX_VIEWPORT_CELLS:
+            continue
+
+        return {
+            encode_geohash(
+                min(south + row * cell_height, north),
+                min(west + column * cell_width, east),
+                precision
+            )
+            for row in range(rows + 1)
+            for column in range(columns + 1)
+        }
+
+    raise ValueError('viewport is too large; zoom in to receive charger updates')
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    latitude_range, longitude_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash = []
+    bits = bit_count = 0
+    use_longitude = True
+    while len(geohash) < precision:
+        value, value_range = (longitude, longitude_range) if use_longitude else (latitude, latitude_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            value_range[0] = mid
+        else:
+            value_range[1] = mid
+        use_longitude = not use_longitude
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_BASE32[bits])
+            bits = bit_count = 0
+    return ''.join(geohash)
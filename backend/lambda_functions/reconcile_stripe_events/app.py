@@ -0,0 +1,85 @@
+import boto3
+import os
+from datetime import datetime
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+transactions_table = dynamodb.Table(os.environ.get('TRANSACTIONS_TABLE_NAME'))
+
+deserializer = TypeDeserializer()
+
+# Failed payments are audited under their own id, so only these statuses can belong to a
+# transaction stored under its PaymentIntent that has not been written yet
+CREATING_PAYMENT_STATUSES = {'Succeeded'}
+
+def lambda_handler(event, context):
+    """
+    Triggered by INSERT records on the Stripe Events table stream. Applies the newest
+    event in the batch for each PaymentIntent to its transaction, so a burst of events
+    for one payment costs a single write.
+    """
+    latest_events = {}
+    sequence_numbers = {}
+
+    for record in event.get('Records', []):
+        if record.get('eventName') != 'INSERT':
+            continue
+
+        stripe_event = {key: deserializer.deserialize(value) for key, value in record['dynamodb']['NewImage'].items()}
+        payment_intent_id = stripe_event['paymentIntentId']
+        sequence_numbers.setdefault(payment_intent_id, []).append(record['dynamodb']['SequenceNumber'])
+
+        latest_event = latest_events.get(payment_intent_id)
+        if latest_event is None or stripe_event['created'] >= latest_event['created']:
+            latest_events[payment_intent_id] = stripe_event
+
+    batch_item_failures = []
+    failed_payments = 0
+    for payment_intent_id, stripe_event in latest_events.items():
+        try:
+            apply_payment_status(stripe_event)
+        except ClientError as e:
+            print(f"Error applying Stripe event {stripe_event['eventId']}: {e.response['Error']['Message']}")
+            failed_payments += 1
+            batch_item_failures.extend({'itemIdentifier': sequence_number} for sequence_number in sequence_numbers[payment_intent_id])
+
+    print(f"Reconciled {len(latest_events) - failed_payments} payments from Stripe events, {failed_payments} failed")
+
+    return {'batchItemFailures': batch_item_failures}
+
+def apply_payment_status(stripe_event):
+    """
+    Set the payment status on the transaction keyed by the PaymentIntent, never
+    replacing a status from a newer event. Only a successful payment is stored under
+    its PaymentIntent, so only a Succeeded event may create the item ahead of the
+    payment's audit record; any other status is applied to an existing item only.
+    """
+    update_expression = "SET paymentIntentId = :payment_intent_id, paymentStatus = :payment_status, " \
+                        "paymentStatusEventId = :event_id, paymentStatusEventCreated = :created, paymentStatusUpdatedAt = :updated_at"
+    expression_attribute_values = {
+        ':payment_intent_id': stripe_event['paymentIntentId'],
+        ':payment_status': stripe_event['paymentStatus'],
+        ':event_id': stripe_event['eventId'],
+        ':created': stripe_event['created'],
+        ':updated_at': datetime.now().isoformat()
+    }
+    if 'amountRefunded' in stripe_event:
+        update_expression += ", amountRefunded = :amount_refunded"
+        expression_attribute_values[':amount_refunded'] = stripe_event['amountRefunded']
+
+    condition_expression = "(attribute_not_exists(paymentStatusEventCreated) OR paymentStatusEventCreated <= :created)"
+    if stripe_event['paymentStatus'] not in CREATING_PAYMENT_STATUSES:
+        condition_expression = f"attribute_exists(transactionId) AND {condition_expression}"
+
+    try:
+        transactions_table.update_item(
+            Key={'transactionId': stripe_event['paymentIntentId']},
+            UpdateExpression=update_expression,
+            ConditionExpression=condition_expression,
+            ExpressionAttributeValues=expression_attribute_values
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        print(f"Skipping Stripe event {stripe_event['eventId']}: superseded or no transaction for {stripe_event['paymentIntentId']}")
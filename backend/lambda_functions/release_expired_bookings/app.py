@@ -0,0 +1,117 @@
+import json
+import boto3
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+charging_points_table = dynamodb.Table(os.environ.get('CHARGING_POINTS_TABLE_NAME'))
+bookings_table = dynamodb.Table(os.environ.get('BOOKINGS_TABLE_NAME'))
+
+RELEASE_BATCH_SIZE = 100
+MAX_RELEASES_PER_TICK = 1000
+RELEASE_WORKERS = 8
+
+def lambda_handler(event, context):
+    """
+    Scheduled every minute. Frees the charging point hold of every booking whose
+    endTime has passed, reading due bookings from the sparse releaseStatus-releaseAt-Index
+    in time order instead of scanning the Bookings table.
+    """
+    now = int(time.time())
+    released = []
+    skipped = 0
+
+    exclusive_start_key = None
+    while len(released) + skipped < MAX_RELEASES_PER_TICK:
+        bookings, exclusive_start_key = query_due_bookings(now, exclusive_start_key)
+        if not bookings:
+            break
+
+        with ThreadPoolExecutor(max_workers=RELEASE_WORKERS) as executor:
+            outcomes = list(executor.map(lambda booking: release_booking(booking, now), bookings))
+
+        for lag_seconds in outcomes:
+            if lag_seconds is None:
+                skipped += 1
+            else:
+                released.append(lag_seconds)
+
+        if not exclusive_start_key:
+            break
+
+    summary = {
+        'released': len(released),
+        'skipped': skipped,
+        'maxReleaseLagSeconds': max(released) if released else 0,
+        'avgReleaseLagSeconds': round(sum(released) / len(released), 1) if released else 0
+    }
+    print(f"Booking release tick: {json.dumps(summary)}")
+
+    return summary
+
+def query_due_bookings(now, exclusive_start_key=None):
+    query_kwargs = {
+        'IndexName': 'releaseStatus-releaseAt-Index',
+        'KeyConditionExpression': Key('releaseStatus').eq('Pending') & Key('releaseAt').lte(now),
+        'Limit': RELEASE_BATCH_SIZE
+    }
+    if exclusive_start_key:
+        query_kwargs['ExclusiveStartKey'] = exclusive_start_key
+
+    try:
+        response = bookings_table.query(**query_kwargs)
+    except ClientError as e:
+        raise Exception(f"Error querying DynamoDB Bookings table: {e.response['Error']['Message']}")
+
+    return response.get('Items', []), response.get('LastEvaluatedKey')
+
+def release_booking(booking, now):
+    """
+    Release one expired booking. Returns the release lag in seconds, or None when
+    the booking could not be processed and will be retried on the next tick.
+    """
+    timestamp = datetime.now().isoformat()
+    lag_seconds = now - int(booking['releaseAt'])
+
+    try:
+        release_charging_point(booking, timestamp)
+        mark_booking_released(booking['bookingId'], timestamp, lag_seconds)
+    except ClientError as e:
+        print(f"Error releasing booking {booking['bookingId']}: {e.response['Error']['Message']}")
+        return None
+
+    return lag_seconds
+
+def release_charging_point(booking, timestamp):
+    # Only release the hold this booking placed. A newer booking or a device status
+    # update will have changed currentBookedConsumerId or statusUpdatedAt.
+    try:
+        charging_points_table.update_item(
+            Key={'oocpChargePointId': booking['oocpChargePointId']},
+            UpdateExpression="SET isAvailable = :is_available, statusUpdatedAt = :timestamp REMOVE currentBookedConsumerId",
+            ConditionExpression="currentBookedConsumerId = :consumer_id AND statusUpdatedAt = :booked_at",
+            ExpressionAttributeValues={
+                ':is_available': True,
+                ':timestamp': timestamp,
+                ':consumer_id': booking['consumerId'],
+                ':booked_at': booking['timestamp']
+            }
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+def mark_booking_released(booking_id, timestamp, lag_seconds):
+    # Removing releaseStatus drops the booking out of the sparse release index
+    bookings_table.update_item(
+        Key={'bookingId': booking_id},
+        UpdateExpression="SET releasedAt = :timestamp, releaseLagSeconds = :lag REMOVE releaseStatus",
+        ExpressionAttributeValues={
+            ':timestamp': timestamp,
+            ':lag': lag_seconds
+        }
+    )
@@ -1,16 +1,39 @@
 import json
+import time
 import uuid
 import boto3
 import os
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
 
 dynamodb = boto3.resource('dynamodb')
-ses_client = boto3.client('ses')
-ssm_client = boto3.client('ssm')
 
 match_requests_table = dynamodb.Table(os.environ.get('MATCH_REQUESTS_TABLE_NAME'))
 users_table = dynamodb.Table(os.environ.get('USERS_TABLE_NAME'))
+match_requests_table_name = os.environ.get('MATCH_REQUESTS_TABLE_NAME')
+notification_outbox_table_name = os.environ.get('NOTIFICATION_OUTBOX_TABLE_NAME')
+notification_counters_table_name = os.environ.get('NOTIFICATION_COUNTERS_TABLE_NAME')
+
+# Notifications still unsent after a week are dropped
+NOTIFICATION_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Bounds how far back an overlapping meeting can start, so the range queries stay small
+MAX_MEETING_DURATION = timedelta(hours=24)
+# Slots are stored as written by the client, in any UTC offset, so the key range is
+# widened by more than the largest offset and the exact overlap checked afterwards
+SLOT_KEY_PADDING = timedelta(days=1)
+
+# Indexes holding each consumer's sent and received matches by meeting slot
+MATCH_SCHEDULE_INDEXES = ('recipientConsumerId-startTime-endTime-Index', 'senderConsumerId-startTime-endTime-Index')
+
+MAX_BULK_RECIPIENTS = 100
+# A transaction holds at most 100 items and each request writes three
+BULK_RECIPIENTS_PER_TRANSACTION = 33
+
+# Runs the recipient and schedule lookups and bulk transactions concurrently
+io_executor = ThreadPoolExecutor(max_workers=8)
 
 cors_header = {
     'Access-Control-Allow-Origin': 'http://localhost:3000',
@@ -18,20 +41,12 @@ cors_header = {
     'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token'
 }
 
-def get_ssm_parameter(param_name):
-    try:
-        response = ssm_client.get_parameter(
-            Name=param_name,
-            WithDecryption=True
-        )
-        return response['Parameter']['Value']
-    except ClientError as e:
-        print(f"Error fetching {param_name} from SSM: {str(e)}")
-        return None
-
-PARAMETER_PREFIX = os.environ.get('PARAMETER_PREFIX')
-
 def lambda_handler(event, context):
+    """
+    Stores a match request, an outbox entry for the recipient's email and the bump to
+    the recipient's unread counter in one transaction. send_notifications delivers the
+    email from the outbox table stream, so SES latency and errors never reach the caller.
+    """
 
     # Handle CORS preflight requests (OPTIONS)
     if event['httpMethod'] == 'OPTIONS':
@@ -41,7 +56,6 @@ def lambda_handler(event, context):
         }
 
     try:
-        ses_email = get_ssm_parameter(PARAMETER_PREFIX + 'SES_EMAIL')
         body = json.loads(event['body'])
 
         sender_consumer_id = body.get('senderConsumerId')
@@ -49,53 +63,188 @@ def lambda_handler(event, context):
         meeting_start_time = body.get('meetingStartTime')
         meeting_end_time = body.get('meetingEndTime')
         match_event_type = body.get('matchEventType', 'Other')
-        
+
         if not sender_consumer_id or not recipient_consumer_id or not meeting_start_time or not meeting_end_time:
             return {
                 'statusCode': 400,
-                'headers': cors_header, 
+                'headers': cors_header,
                 'body': json.dumps({'error': 'Missing required fields in request body'})
             }
-        
-        match_request_id = str(uuid.uuid4())
 
-        timestamp = datetime.now().isoformat()
-        match_requests_table.put_item(
-            Item={
-                'requestId': match_request_id,
-                'senderConsumerId': sender_consumer_id,
-                'recipientConsumerId': recipient_consumer_id,
-                'timestamp': timestamp,
-                'startTime#endTime': f'{meeting_start_time}#{meeting_end_time}',
-                'matchStatus': 'Pending',
-                'matchEventType': match_event_type,
-                'isRead': int(False)
+        try:
+            meeting_start, meeting_end = parse_meeting_window(meeting_start_time, meeting_end_time)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': str(e)})
             }
-        )
-        
-        recipient_email = get_user_email(recipient_consumer_id)
-        if not recipient_email:
+
+        recipient_lookups = submit_recipient_lookups([recipient_consumer_id])
+        conflict = find_conflicting_match(sender_consumer_id, recipient_consumer_id, meeting_start, meeting_end)
+        if not recipient_lookups[recipient_consumer_id].result():
             return {
                 'statusCode': 404,
                 'headers': cors_header,
                 'body': json.dumps({'error': 'Recipient user not found'})
             }
+        if conflict:
+            return {
+                'statusCode': 409,
+                'headers': cors_header,
+                'body': json.dumps(conflict)
+            }
+
+        match_request_id = str(uuid.uuid4())
 
-        send_email_notification(
-            ses_email, 
-            recipient_email,
-            sender_consumer_id,
-            match_event_type,
-            meeting_start_time,
-            meeting_end_time
+        timestamp = datetime.now().isoformat()
+        dynamodb.meta.client.transact_write_items(
+            TransactItems=build_match_request_transact_items(
+                match_request_id,
+                sender_consumer_id,
+                recipient_consumer_id,
+                match_event_type,
+                meeting_start_time,
+                meeting_end_time,
+                meeting_end,
+                timestamp
+            )
         )
-        
+
+        return {
+            'statusCode': 200,
+            'headers': cors_header,
+            'body': json.dumps({'message': 'Match request sent successfully', 'requestId': match_request_id})
+        }
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': cors_header,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def bulk_lambda_handler(event, context):
+    """
+    Sends one sender's match request for the same meeting to many recipients. Recipients
+    and schedules are checked concurrently and the requests written in transactions of
+    BULK_RECIPIENTS_PER_TRANSACTION recipients, each with its outbox entry and unread
+    counter bump as in lambda_handler. Returns a result per recipient, in order.
+    """
+    # Handle CORS preflight requests (OPTIONS)
+    if event['httpMethod'] == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': cors_header
+        }
+
+    try:
+        body = json.loads(event['body'])
+
+        sender_consumer_id = body.get('senderConsumerId')
+        recipient_consumer_ids = body.get('recipientConsumerIds') or []
+        meeting_start_time = body.get('meetingStartTime')
+        meeting_end_time = body.get('meetingEndTime')
+        match_event_type = body.get('matchEventType', 'Other')
+
+        if not sender_consumer_id or not recipient_consumer_ids or not meeting_start_time or not meeting_end_time:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': 'Missing required fields in request body'})
+            }
+        if not isinstance(recipient_consumer_ids, list):
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': 'recipientConsumerIds must be a list'})
+            }
+        if len(recipient_consumer_ids) > MAX_BULK_RECIPIENTS:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': f'At most {MAX_BULK_RECIPIENTS} recipients can be invited per request'})
+            }
+
+        try:
+            meeting_start, meeting_end = parse_meeting_window(meeting_start_time, meeting_end_time)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': cors_header,
+                'body': json.dumps({'error': str(e)})
+            }
+
+        results = [None] * len(recipient_consumer_ids)
+        recipients = validate_bulk_recipients(sender_consumer_id, recipient_consumer_ids, results)
+
+        recipient_lookups = submit_recipient_lookups([recipient['consumerId'] for recipient in recipients])
+        # The sender's schedule is read once and shared by every recipient's check
+        lookups = submit_schedule_lookups([sender_consumer_id] + [recipient['consumerId'] for recipient in recipients], meeting_start, meeting_end)
+        matches = {consumer_id: collect_matches(futures) for consumer_id, futures in lookups.items()}
+        existing_recipients = {consumer_id: future.result() for consumer_id, future in recipient_lookups.items()}
+
+        invited = []
+        for recipient in recipients:
+            if not existing_recipients[recipient['consumerId']]:
+                results[recipient['index']] = build_recipient_result(recipient, 'not_found', error='Recipient user not found')
+                continue
+            conflict = check_conflict(
+                sender_consumer_id,
+                recipient['consumerId'],
+                matches[recipient['consumerId']] + matches[sender_consumer_id]
+            )
+            if conflict:
+                results[recipient['index']] = build_recipient_result(recipient, 'conflict', **conflict)
+            else:
+                invited.append({**recipient, 'requestId': str(uuid.uuid4())})
+
+        timestamp = datetime.now().isoformat()
+        chunks = [invited[start:start + BULK_RECIPIENTS_PER_TRANSACTION] for start in range(0, len(invited), BULK_RECIPIENTS_PER_TRANSACTION)]
+        futures = [
+            io_executor.submit(
+                dynamodb.meta.client.transact_write_items,
+                TransactItems=[
+                    item
+                    for recipient in chunk
+                    for item in build_match_request_transact_items(
+                        recipient['requestId'],
+                        sender_consumer_id,
+                        recipient['consumerId'],
+                        match_event_type,
+                        meeting_start_time,
+                        meeting_end_time,
+                        meeting_end,
+                        timestamp
+                    )
+                ]
+            )
+            for chunk in chunks
+        ]
+
+        requested_count = 0
+        for chunk, future in zip(chunks, futures):
+            try:
+                future.result()
+            except ClientError as e:
+                print(f"Error writing match requests: {e.response['Error']['Message']}")
+                for recipient in chunk:
+                    results[recipient['index']] = build_recipient_result(recipient, 'failed', error=e.response['Error']['Message'])
+                continue
+            requested_count += len(chunk)
+            for recipient in chunk:
+                results[recipient['index']] = build_recipient_result(recipient, 'requested', requestId=recipient['requestId'])
+
         return {
             'statusCode': 200,
             'headers': cors_header,
-            'body': json.dumps({'message': 'Match request sent successfully'})
+            'body': json.dumps({
+                'requestedCount': requested_count,
+                'results': results
+            })
         }
-    
+
     except Exception as e:
         print(f"Error: {str(e)}")
         return {
@@ -104,42 +253,192 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': str(e)})
         }
 
-def get_user_email(consumer_id):
+def validate_bulk_recipients(sender_consumer_id, recipient_consumer_ids, results):
+    """
+    Reject the sender and repeated recipients in memory. Rejected recipients are written
+    into results; the rest are returned with their position in the request.
+    """
+    recipients = []
+    seen = set()
+    for index, consumer_id in enumerate(recipient_consumer_ids):
+        recipient = {'index': index, 'consumerId': consumer_id}
+        if not consumer_id or not isinstance(consumer_id, str):
+            results[index] = build_recipient_result(recipient, 'rejected', error='Invalid recipientConsumerId')
+        elif consumer_id == sender_consumer_id:
+            results[index] = build_recipient_result(recipient, 'rejected', error='Cannot send a match request to yourself')
+        elif consumer_id in seen:
+            results[index] = build_recipient_result(recipient, 'rejected', error='Recipient appears more than once in this request')
+        else:
+            seen.add(consumer_id)
+            recipients.append(recipient)
+    return recipients
+
+def build_recipient_result(recipient, status, **details):
+    return {
+        'index': recipient['index'],
+        'recipientConsumerId': recipient['consumerId'],
+        'status': status,
+        **details
+    }
+
+def parse_timestamp(value):
+    # Timestamps without an offset are taken as UTC
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def parse_meeting_window(meeting_start_time, meeting_end_time):
+    try:
+        meeting_start = parse_timestamp(meeting_start_time)
+        meeting_end = parse_timestamp(meeting_end_time)
+    except (TypeError, ValueError):
+        raise ValueError('meetingStartTime and meetingEndTime must be ISO 8601 timestamps')
+    if meeting_end <= meeting_start:
+        raise ValueError('meetingEndTime must be after meetingStartTime')
+    if meeting_end - meeting_start > MAX_MEETING_DURATION:
+        raise ValueError(f"Meetings can last at most {int(MAX_MEETING_DURATION.total_seconds() // 3600)} hours")
+    return meeting_start, meeting_end
+
+def find_conflicting_match(sender_consumer_id, recipient_consumer_id, meeting_start, meeting_end):
+    """
+    Look for a match that rules out the new request: an accepted match of either consumer
+    that overlaps the meeting window, or a pending request between the same two consumers
+    that overlaps it. Returns the 409 response body, or None.
+    """
+    lookups = submit_schedule_lookups([recipient_consumer_id, sender_consumer_id], meeting_start, meeting_end)
+    # Wait for every lookup, so none is left running into the next invocation
+    matches = {consumer_id: collect_matches(futures) for consumer_id, futures in lookups.items()}
+    return check_conflict(sender_consumer_id, recipient_consumer_id, matches[recipient_consumer_id] + matches[sender_consumer_id])
+
+def submit_recipient_lookups(consumer_ids):
+    return {consumer_id: io_executor.submit(consumer_exists, consumer_id) for consumer_id in consumer_ids}
+
+def consumer_exists(consumer_id):
     try:
         response = users_table.query(
             IndexName='consumerIdEmailIndex',
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('consumerId').eq(consumer_id)
-        )   
-        items = response.get('Items', [])
-        if items:
-            return items[0].get('email')
-        else:
-            return None     
+            KeyConditionExpression=Key('consumerId').eq(consumer_id),
+            Select='COUNT',
+            Limit=1
+        )
     except ClientError as e:
-        print(f"Error fetching user email: {e.response['Error']['Message']}")
-        return None
+        raise Exception(f"Error querying DynamoDB Users table: {e.response['Error']['Message']}")
+    return response['Count'] > 0
+
+def submit_schedule_lookups(consumer_ids, meeting_start, meeting_end):
+    # One query per consumer and index, all running at once
+    return {
+        consumer_id: [
+            io_executor.submit(query_overlapping_matches, consumer_id, index_name, meeting_start, meeting_end)
+            for index_name in MATCH_SCHEDULE_INDEXES
+        ]
+        for consumer_id in consumer_ids
+    }
+
+def collect_matches(futures):
+    return [match for future in futures for match in future.result()]
+
+def check_conflict(sender_consumer_id, recipient_consumer_id, overlapping_matches):
+    for match in overlapping_matches:
+        if match['matchStatus'] == 'Accepted':
+            return {
+                'error': 'The meeting overlaps an accepted match',
+                'conflictingRequestId': match['requestId']
+            }
+        if {match['senderConsumerId'], match['recipientConsumerId']} == {sender_consumer_id, recipient_consumer_id}:
+            return {
+                'error': 'A pending match request already covers this meeting',
+                'conflictingRequestId': match['requestId']
+            }
+    return None
 
-def send_email_notification(ses_email, recipient_email, sender_consumer_id, event_type, start_time, end_time):
+def query_overlapping_matches(consumer_id, index_name, meeting_start, meeting_end):
+    consumer_key = index_name.split('-')[0]
+    # Keys are '<start>#<end>'; only matches starting after meeting_start - MAX_MEETING_DURATION
+    # and before meeting_end can overlap
+    earliest_start = (meeting_start - MAX_MEETING_DURATION - SLOT_KEY_PADDING).astimezone(timezone.utc).date().isoformat()
+    latest_start = (meeting_end + SLOT_KEY_PADDING * 2).astimezone(timezone.utc).date().isoformat()
+    query_kwargs = {
+        'IndexName': index_name,
+        'KeyConditionExpression': Key(consumer_key).eq(consumer_id) & Key('startTime#endTime').between(earliest_start, latest_start),
+        'FilterExpression': Attr('matchStatus').is_in(['Accepted', 'Pending']),
+        'ProjectionExpression': 'requestId, senderConsumerId, recipientConsumerId, matchStatus, #slot',
+        'ExpressionAttributeNames': {'#slot': 'startTime#endTime'}
+    }
+
+    overlapping_matches = []
+    while True:
+        response = match_requests_table.query(**query_kwargs)
+        for match in response.get('Items', []):
+            if overlaps(match['startTime#endTime'], meeting_start, meeting_end):
+                overlapping_matches.append(match)
+        if 'LastEvaluatedKey' not in response:
+            return overlapping_matches
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def overlaps(slot, meeting_start, meeting_end):
     try:
-        subject = "You've received a new match request!"
-        body = (
-            f"Hello,\n\n"
-            f"You've received a new match request from user {sender_consumer_id}.\n\n"
-            f"Event Type: {event_type}\n"
-            f"Start Time: {start_time}\n"
-            f"End Time: {end_time}\n\n"
-            f"Please log in to your account to accept or reject this request.\n\n"
-            f"Thank you!"
-        )
+        start_time, end_time = slot.split('#')
+        return parse_timestamp(start_time) < meeting_end and parse_timestamp(end_time) > meeting_start
+    except (TypeError, ValueError):
+        # Slots in another format cannot be compared
+        return False
 
-        ses_client.send_email(
-            Source=ses_email,
-            Destination={'ToAddresses': [recipient_email]},
-            Message={
-                'Subject': {'Data': subject},
-                'Body': {'Text': {'Data': body}}
+def build_match_request_transact_items(match_request_id, sender_consumer_id, recipient_consumer_id, event_type, start_time, end_time, meeting_end, timestamp):
+    meeting_end_at = int(meeting_end.timestamp())
+    return [
+        {
+            'Put': {
+                'TableName': match_requests_table_name,
+                'Item': {
+                    'requestId': match_request_id,
+                    'senderConsumerId': sender_consumer_id,
+                    'recipientConsumerId': recipient_consumer_id,
+                    'timestamp': timestamp,
+                    'startTime#endTime': f'{start_time}#{end_time}',
+                    'matchStatus': 'Pending',
+                    'matchEventType': event_type,
+                    'isRead': int(False),
+                    # expiryStatus/meetingEndAt place the request in the sparse
+                    # expiryStatus-meetingEndAt-Index until it is answered or expired
+                    'expiryStatus': 'Pending',
+                    'meetingEndAt': meeting_end_at
+                }
             }
-        )
-    except ClientError as e:
-        print(f"Error sending email: {e.response['Error']['Message']}")
-        raise
+        },
+        {
+            'Put': {
+                'TableName': notification_outbox_table_name,
+                'Item': build_match_request_notification(
+                    match_request_id,
+                    sender_consumer_id,
+                    recipient_consumer_id,
+                    event_type,
+                    start_time,
+                    end_time,
+                    timestamp
+                )
+            }
+        },
+        {
+            'Update': {
+                'TableName': notification_counters_table_name,
+                'Key': {'consumerId': recipient_consumer_id},
+                'UpdateExpression': 'ADD unreadMatchRequests :one',
+                'ExpressionAttributeValues': {':one': 1}
+            }
+        }
+    ]
+
+def build_match_request_notification(match_request_id, sender_consumer_id, recipient_consumer_id, event_type, start_time, end_time, timestamp):
+    return {
+        'notificationId': f"match-request#{match_request_id}",
+        'notificationType': 'MatchRequest',
+        'notificationStatus': 'Pending',
+        'recipientConsumerId': recipient_consumer_id,
+        'senderConsumerId': sender_consumer_id,
+        'matchEventType': event_type,
+        'meetingStartTime': start_time,
+        'meetingEndTime': end_time,
+        'createdAt': timestamp,
+        'expiresAt': int(time.time()) + NOTIFICATION_TTL_SECONDS
+    }
@@ -0,0 +1,200 @@
+import json
+import boto3
+import os
+import time
+from datetime import datetime
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+# Adaptive retries back off and slow down client-side when SES throttles
+ses_client = boto3.client('ses', config=Config(retries={'mode': 'adaptive', 'max_attempts': 6}))
+ssm_client = boto3.client('ssm')
+
+notification_outbox_table = dynamodb.Table(os.environ.get('NOTIFICATION_OUTBOX_TABLE_NAME'))
+notification_counters_table = dynamodb.Table(os.environ.get('NOTIFICATION_COUNTERS_TABLE_NAME'))
+users_table = dynamodb.Table(os.environ.get('USERS_TABLE_NAME'))
+
+PARAMETER_PREFIX = os.environ.get('PARAMETER_PREFIX')
+NOTIFICATION_DELIVERY_MODE = os.environ.get('NOTIFICATION_DELIVERY_MODE', 'immediate')
+DIGEST_TEMPLATE_NAME = os.environ.get('DIGEST_TEMPLATE_NAME')
+
+SES_MAX_SEND_RATE = float(os.environ.get('SES_MAX_SEND_RATE', '10'))
+# SendBulkTemplatedEmail accepts at most 50 destinations per call
+MAX_BULK_DESTINATIONS = 50
+# Digest runs a notification may fail in before it is given up on
+MAX_SEND_ATTEMPTS = 5
+
+def get_ssm_parameter(param_name):
+    try:
+        value = os.environ.get('SES_EMAIL')
+        if value:
+            return value
+        response = ssm_client.get_parameter(
+            Name=param_name,
+            WithDecryption=True
+        )
+        return response['Parameter']['Value']
+    except ClientError as e:
+        print(f"Error fetching {param_name} from SSM: {str(e)}")
+        return None
+
+def lambda_handler(event, context):
+    """
+    Runs every digest window when NOTIFICATION_DELIVERY_MODE is 'digest'. Collects the
+    pending notifications in the outbox, groups them per recipient and sends each
+    recipient one templated email, up to 50 recipients per SES call.
+    """
+    if NOTIFICATION_DELIVERY_MODE != 'digest':
+        return {'recipients': 0, 'notifications': 0}
+
+    ses_email = get_ssm_parameter(PARAMETER_PREFIX + 'SES_EMAIL')
+    if not ses_email:
+        raise Exception("SES sender email not configured.")
+
+    notifications_by_recipient = {}
+    for notification in get_pending_notifications():
+        notifications_by_recipient.setdefault(notification['recipientConsumerId'], []).append(notification)
+
+    digests = []
+    for recipient_consumer_id, notifications in notifications_by_recipient.items():
+        recipient_email = get_user_email(recipient_consumer_id)
+        if not recipient_email:
+            for notification in notifications:
+                mark_notification(notification['notificationId'], 'Failed', 'Recipient user not found')
+            continue
+        digests.append((recipient_consumer_id, recipient_email, notifications))
+
+    sent_notifications = 0
+    sent_recipients = 0
+    for start in range(0, len(digests), MAX_BULK_DESTINATIONS):
+        chunk = digests[start:start + MAX_BULK_DESTINATIONS]
+        statuses = send_digests(ses_email, chunk)
+        for (recipient_consumer_id, _, notifications), status in zip(chunk, statuses):
+            if status.get('Status') == 'Success':
+                for notification in notifications:
+                    mark_notification(notification['notificationId'], 'Sent')
+                record_emails_sent(recipient_consumer_id, len(notifications))
+                sent_recipients += 1
+                sent_notifications += len(notifications)
+            else:
+                for notification in notifications:
+                    record_failed_attempt(notification, status.get('Error') or status.get('Status'))
+
+    print(f"Sent {sent_notifications} notifications in {sent_recipients} digest emails")
+
+    return {'recipients': sent_recipients, 'notifications': sent_notifications}
+
+def get_pending_notifications():
+    query_kwargs = {
+        'IndexName': 'notificationStatus-createdAt-Index',
+        'KeyConditionExpression': Key('notificationStatus').eq('Pending')
+    }
+    while True:
+        response = notification_outbox_table.query(**query_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def send_digests(ses_email, digests):
+    """
+    Send one digest per (recipientConsumerId, email, notifications) in a single bulk
+    call. Returns the SES status for each destination, in order.
+    """
+    # Every destination counts towards the SES sending rate
+    time.sleep(len(digests) / SES_MAX_SEND_RATE)
+    try:
+        response = ses_client.send_bulk_templated_email(
+            Source=ses_email,
+            Template=DIGEST_TEMPLATE_NAME,
+            DefaultTemplateData=json.dumps({'notificationCount': 0, 'notifications': []}),
+            Destinations=[
+                {
+                    'Destination': {'ToAddresses': [recipient_email]},
+                    'ReplacementTemplateData': json.dumps(build_digest_data(notifications))
+                }
+                for _, recipient_email, notifications in digests
+            ]
+        )
+        return response['Status']
+    except ClientError as e:
+        print(f"Error sending digest emails: {e.response['Error']['Message']}")
+        return [{'Status': e.response['Error']['Code'], 'Error': e.response['Error']['Message']}] * len(digests)
+
+def build_digest_data(notifications):
+    notifications = sorted(notifications, key=lambda notification: notification['createdAt'])
+    return {
+        'notificationCount': len(notifications),
+        'notifications': [render_digest_line(notification) for notification in notifications]
+    }
+
+def render_digest_line(notification):
+    if notification.get('notificationType') == 'MatchRequest':
+        return (
+            f"New {notification['matchEventType']} match request from user {notification['senderConsumerId']} "
+            f"({notification['meetingStartTime']} to {notification['meetingEndTime']})"
+        )
+    if notification.get('notificationType') == 'MatchResponse':
+        return f"User {notification['responderConsumerId']} responded to your match request"
+    return "You have a new match update"
+
+def mark_notification(notification_id, notification_status, error_message=None):
+    update_expression = 'SET notificationStatus = :status, statusUpdatedAt = :now'
+    expression_attribute_values = {
+        ':status': notification_status,
+        ':now': datetime.now().isoformat()
+    }
+    if error_message:
+        print(f"Notification {notification_id} failed: {error_message}")
+        update_expression += ', errorMessage = :error_message'
+        expression_attribute_values[':error_message'] = error_message
+
+    notification_outbox_table.update_item(
+        Key={'notificationId': notification_id},
+        UpdateExpression=update_expression,
+        ExpressionAttributeValues=expression_attribute_values
+    )
+
+def record_failed_attempt(notification, error_message):
+    # Left pending for the next digest until it has failed too often
+    if int(notification.get('attempts', 0)) + 1 >= MAX_SEND_ATTEMPTS:
+        mark_notification(notification['notificationId'], 'Failed', error_message)
+        return
+
+    notification_outbox_table.update_item(
+        Key={'notificationId': notification['notificationId']},
+        UpdateExpression='SET lastAttemptAt = :now, errorMessage = :error_message ADD attempts :one',
+        ExpressionAttributeValues={
+            ':now': datetime.now().isoformat(),
+            ':error_message': error_message,
+            ':one': 1
+        }
+    )
+
+def record_emails_sent(consumer_id, notification_count):
+    notification_counters_table.update_item(
+        Key={'consumerId': consumer_id},
+        UpdateExpression='SET lastEmailSentAt = :now ADD emailsSent :one, notificationsSent :notification_count',
+        ExpressionAttributeValues={
+            ':now': datetime.now().isoformat(),
+            ':one': 1,
+            ':notification_count': notification_count
+        }
+    )
+
+def get_user_email(consumer_id):
+    try:
+        response = users_table.query(
+            IndexName='consumerIdEmailIndex',
+            KeyConditionExpression=Key('consumerId').eq(consumer_id)
+        )
+        items = response.get('Items', [])
+        if items:
+            return items[0].get('email')
+        else:
+            return None
+    except ClientError as e:
+        print(f"Error fetching user email: {e.response['Error']['Message']}")
+        raise
@@ -0,0 +1,294 @@
+import boto3
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+# Adaptive retries back off and slow down client-side when SES throttles
+ses_client = boto3.client('ses', config=Config(retries={'mode': 'adaptive', 'max_attempts': 6}))
+ssm_client = boto3.client('ssm')
+
+notification_outbox_table = dynamodb.Table(os.environ.get('NOTIFICATION_OUTBOX_TABLE_NAME'))
+notification_counters_table = dynamodb.Table(os.environ.get('NOTIFICATION_COUNTERS_TABLE_NAME'))
+users_table = dynamodb.Table(os.environ.get('USERS_TABLE_NAME'))
+
+PARAMETER_PREFIX = os.environ.get('PARAMETER_PREFIX')
+# In 'digest' mode notifications are left pending for send_notification_digests
+NOTIFICATION_DELIVERY_MODE = os.environ.get('NOTIFICATION_DELIVERY_MODE', 'immediate')
+
+# Kept below the account's SES sending quota; the function runs one batch at a time
+SES_MAX_SEND_RATE = float(os.environ.get('SES_MAX_SEND_RATE', '10'))
+# Deliveries of a notification before it is given up on
+MAX_SEND_ATTEMPTS = 5
+# A claimed notification is held as Sending for this long, so a redelivered stream record
+# skips it even if marking it Sent failed after SES accepted the email. A claim left by
+# an invocation that died is taken over once it lapses
+SEND_CLAIM_SECONDS = 15 * 60
+
+# SES errors worth retrying later; anything else will fail the same way again
+RETRYABLE_SES_ERRORS = {'Throttling', 'ThrottlingException', 'ServiceUnavailable', 'InternalFailure'}
+
+# Cached per container: the sender address is read from SSM every few minutes at most
+SSM_PARAMETER_CACHE_TTL_SECONDS = 5 * 60
+ssm_parameter_cache = {}
+
+# consumerId -> email, least recently used first. Entries are dropped early when
+# store_new_user_details reports an email change through the outbox
+USER_EMAIL_CACHE_TTL_SECONDS = 10 * 60
+USER_EMAIL_CACHE_MAX_ENTRIES = 1000
+user_email_cache = OrderedDict()
+
+deserializer = TypeDeserializer()
+
+next_send_at = 0.0
+
+def get_ssm_parameter(param_name):
+    value = os.environ.get('SES_EMAIL')
+    if value:
+        return value
+
+    cached = ssm_parameter_cache.get(param_name)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    try:
+        response = ssm_client.get_parameter(
+            Name=param_name,
+            WithDecryption=True
+        )
+    except ClientError as e:
+        print(f"Error fetching {param_name} from SSM: {str(e)}")
+        return None
+
+    value = response['Parameter']['Value']
+    ssm_parameter_cache[param_name] = (time.monotonic() + SSM_PARAMETER_CACHE_TTL_SECONDS, value)
+    return value
+
+def lambda_handler(event, context):
+    """
+    Triggered by INSERT records on the Notification Outbox table stream. Sends each
+    pending notification by email, paced to SES_MAX_SEND_RATE, and marks it Sent or
+    Failed. When SES keeps throttling, the batch stops and the rest is retried from the
+    stream; notifications already sent are skipped.
+    """
+    if NOTIFICATION_DELIVERY_MODE == 'digest':
+        return {'batchItemFailures': []}
+
+    ses_email = get_ssm_parameter(PARAMETER_PREFIX + 'SES_EMAIL')
+    if not ses_email:
+        raise Exception("SES sender email not configured.")
+
+    sent = 0
+    for record in event.get('Records', []):
+        if record.get('eventName') != 'INSERT':
+            continue
+
+        notification = {key: deserializer.deserialize(value) for key, value in record['dynamodb']['NewImage'].items()}
+        if notification.get('notificationType') == 'UserEmailChanged':
+            invalidate_user_email(notification['recipientConsumerId'])
+            continue
+
+        try:
+            if send_notification(ses_email, notification):
+                sent += 1
+        except ClientError as e:
+            print(f"Error sending notification {notification['notificationId']}: {e.response['Error']['Message']}")
+            print(f"Sent {sent} notifications before stopping")
+            # Everything from this record on is delivered again
+            return {'batchItemFailures': [{'itemIdentifier': record['dynamodb']['SequenceNumber']}]}
+
+    print(f"Sent {sent} notifications")
+
+    return {'batchItemFailures': []}
+
+def send_notification(ses_email, notification):
+    """
+    Email one notification. Returns False when it was skipped because it is no longer
+    pending or cannot be delivered, and raises ClientError when it should be retried.
+    """
+    attempts = claim_notification(notification['notificationId'])
+    if attempts is None:
+        return False
+
+    try:
+        recipient_email = get_user_email(notification['recipientConsumerId'])
+    except ClientError:
+        release_notification(notification['notificationId'])
+        raise
+    if not recipient_email:
+        mark_notification(notification['notificationId'], 'Failed', 'Recipient user not found')
+        return False
+
+    subject, body = render_notification(notification)
+    if subject is None:
+        mark_notification(notification['notificationId'], 'Failed', f"Unknown notification type {notification.get('notificationType')}")
+        return False
+
+    wait_for_send_slot()
+    try:
+        response = ses_client.send_email(
+            Source=ses_email,
+            Destination={'ToAddresses': [recipient_email]},
+            Message={
+                'Subject': {'Data': subject},
+                'Body': {'Text': {'Data': body}}
+            }
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] in RETRYABLE_SES_ERRORS and attempts < MAX_SEND_ATTEMPTS:
+            release_notification(notification['notificationId'])
+            raise
+        mark_notification(notification['notificationId'], 'Failed', e.response['Error']['Message'])
+        return False
+
+    # SES has the email now. If recording that fails the notification stays claimed, so
+    # nothing here may raise and have the record delivered again
+    try:
+        mark_notification(notification['notificationId'], 'Sent', ses_message_id=response['MessageId'])
+        record_email_sent(notification['recipientConsumerId'])
+    except ClientError as e:
+        print(f"Error recording notification {notification['notificationId']} as sent (SES message {response['MessageId']}): {e.response['Error']['Message']}")
+    return True
+
+def claim_notification(notification_id):
+    """
+    Count the attempt and move the notification to Sending, checking in the same write
+    that it still needs sending. Returns the attempt count, or None when it must be
+    skipped. A notification that has used up its attempts is marked Failed.
+    """
+    now = int(time.time())
+    try:
+        response = notification_outbox_table.update_item(
+            Key={'notificationId': notification_id},
+            UpdateExpression='SET notificationStatus = :sending, claimedUntil = :claimed_until, lastAttemptAt = :attempted_at ADD attempts :one',
+            ConditionExpression='(notificationStatus = :pending OR (notificationStatus = :sending AND claimedUntil < :now)) '
+                                'AND (attribute_not_exists(attempts) OR attempts < :max_attempts)',
+            ExpressionAttributeValues={
+                ':attempted_at': datetime.now().isoformat(),
+                ':now': now,
+                ':claimed_until': now + SEND_CLAIM_SECONDS,
+                ':one': 1,
+                ':pending': 'Pending',
+                ':sending': 'Sending',
+                ':max_attempts': MAX_SEND_ATTEMPTS
+            },
+            ReturnValues='UPDATED_NEW',
+            ReturnValuesOnConditionCheckFailure='ALL_OLD'
+        )
+        return int(response['Attributes']['attempts'])
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        notification = {key: deserializer.deserialize(value) for key, value in e.response.get('Item', {}).items()}
+
+    is_claimable = notification.get('notificationStatus') == 'Pending' or \
+        (notification.get('notificationStatus') == 'Sending' and notification.get('claimedUntil', 0) < now)
+    if is_claimable and notification.get('attempts', 0) >= MAX_SEND_ATTEMPTS:
+        mark_notification(notification_id, 'Failed', f"Gave up after {MAX_SEND_ATTEMPTS} attempts")
+    else:
+        print(f"Skipping notification {notification_id}: no longer pending")
+    return None
+
+def release_notification(notification_id):
+    # Hands the notification back for the redelivered record to claim. If this fails the
+    # claim lapses after SEND_CLAIM_SECONDS instead
+    try:
+        mark_notification(notification_id, 'Pending')
+    except ClientError as e:
+        print(f"Error releasing notification {notification_id}: {e.response['Error']['Message']}")
+
+def mark_notification(notification_id, notification_status, error_message=None, ses_message_id=None):
+    update_expression = 'SET notificationStatus = :status, statusUpdatedAt = :now'
+    expression_attribute_values = {
+        ':status': notification_status,
+        ':now': datetime.now().isoformat()
+    }
+    if ses_message_id:
+        update_expression += ', sesMessageId = :ses_message_id'
+        expression_attribute_values[':ses_message_id'] = ses_message_id
+    if error_message:
+        print(f"Notification {notification_id} failed: {error_message}")
+        update_expression += ', errorMessage = :error_message'
+        expression_attribute_values[':error_message'] = error_message
+
+    notification_outbox_table.update_item(
+        Key={'notificationId': notification_id},
+        UpdateExpression=update_expression,
+        ExpressionAttributeValues=expression_attribute_values
+    )
+
+def record_email_sent(consumer_id):
+    notification_counters_table.update_item(
+        Key={'consumerId': consumer_id},
+        UpdateExpression='SET lastEmailSentAt = :now ADD emailsSent :one, notificationsSent :one',
+        ExpressionAttributeValues={
+            ':now': datetime.now().isoformat(),
+            ':one': 1
+        }
+    )
+
+def wait_for_send_slot():
+    global next_send_at
+    now = time.monotonic()
+    if next_send_at > now:
+        time.sleep(next_send_at - now)
+    next_send_at = max(now, next_send_at) + 1 / SES_MAX_SEND_RATE
+
+def get_user_email(consumer_id):
+    cached = user_email_cache.get(consumer_id)
+    if cached and cached[0] > time.monotonic():
+        user_email_cache.move_to_end(consumer_id)
+        return cached[1]
+
+    try:
+        response = users_table.query(
+            IndexName='consumerIdEmailIndex',
+            KeyConditionExpression=Key('consumerId').eq(consumer_id)
+        )
+    except ClientError as e:
+        print(f"Error fetching user email: {e.response['Error']['Message']}")
+        raise
+
+    items = response.get('Items', [])
+    email = items[0].get('email') if items else None
+    # Users not found are not cached; they may sign up at any moment
+    if email:
+        user_email_cache[consumer_id] = (time.monotonic() + USER_EMAIL_CACHE_TTL_SECONDS, email)
+        user_email_cache.move_to_end(consumer_id)
+        while len(user_email_cache) > USER_EMAIL_CACHE_MAX_ENTRIES:
+            user_email_cache.popitem(last=False)
+    return email
+
+def invalidate_user_email(consumer_id):
+    user_email_cache.pop(consumer_id, None)
+
+def render_notification(notification):
+    if notification.get('notificationType') == 'MatchRequest':
+        subject = "You've received a new match request!"
+        body = (
+            f"Hello,\n\n"
+            f"You've received a new match request from user {notification['senderConsumerId']}.\n\n"
+            f"Event Type: {notification['matchEventType']}\n"
+            f"Start Time: {notification['meetingStartTime']}\n"
+            f"End Time: {notification['meetingEndTime']}\n\n"
+            f"Please log in to your account to accept or reject this request.\n\n"
+            f"Thank you!"
+        )
+        return subject, body
+
+    if notification.get('notificationType') == 'MatchResponse':
+        subject = "Someone responded to your match request!"
+        body = (
+            f"Hello,\n\n"
+            f"You've received a response to your match request from user {notification['responderConsumerId']}.\n\n"
+            f"Please log in to your account to view the outcome.\n\n"
+            f"Thank you!"
+        )
+        return subject, body
+
+    return None, None
@@ -0,0 +1,170 @@
+import json
+import boto3
+import os
+import stripe
+from collections import defaultdict
+from datetime import datetime, timezone
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+secrets_client = boto3.client('secretsmanager')
+
+producers_table = dynamodb.Table(os.environ.get('PRODUCERS_TABLE_NAME'))
+producer_earnings_table = dynamodb.Table(os.environ.get('PRODUCER_EARNINGS_TABLE_NAME'))
+
+def get_stripe_api_key():
+    api_key = os.environ.get('STRIPE_API_KEY')
+    if api_key:
+        return api_key
+
+    try:
+        response = secrets_client.get_secret_value(SecretId=os.environ.get('SECRET_NAME'))
+        secret = json.loads(response['SecretString'])
+        return secret['STRIPE_API_KEY']
+    except ClientError as e:
+        print(f"Error fetching Stripe API key from Secrets Manager: {str(e)}")
+        raise Exception("Stripe API key not found.")
+    except KeyError:
+        print("STRIPE_API_KEY not found in Secrets Manager's response.")
+        raise Exception("Stripe API key not found in the secret.")
+
+def lambda_handler(event, context):
+    """
+    Scheduled daily. Pays each producer's pending earnings out as one Stripe Transfer.
+
+    Earnings move Pending -> Settling (tagged with a payoutId) -> settled. The payoutId is
+    used as the Transfer's transfer_group and idempotency key, so a payout left in Settling
+    by a run that died is finished on the next run without paying the producer twice.
+    The function has a reserved concurrency of 1, so every Settling earning at the start
+    of a run belongs to an unfinished payout.
+    """
+    stripe.api_key = get_stripe_api_key()
+    run_started_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+    outcomes = []
+
+    for payout_id, earnings in group_earnings(query_earnings_by_status('Settling'), 'payoutId').items():
+        outcomes.append(settle_payout(payout_id, earnings[0]['producerId'], earnings, resume=True))
+
+    for producer_id, earnings in group_earnings(query_earnings_by_status('Pending'), 'producerId').items():
+        payout_id = f"payout#{run_started_at}#{producer_id}"
+        claimed = claim_earnings(earnings, payout_id)
+        if claimed:
+            outcomes.append(settle_payout(payout_id, producer_id, claimed))
+
+    settled = [outcome for outcome in outcomes if outcome]
+    summary = {
+        'payouts': len(settled),
+        'failed': len(outcomes) - len(settled),
+        'earnings': sum(outcome['earnings'] for outcome in settled),
+        'amount': sum(outcome['amount'] for outcome in settled)
+    }
+    print(f"Producer payout run: {json.dumps(summary)}")
+
+    return summary
+
+def query_earnings_by_status(payout_status):
+    query_kwargs = {
+        'IndexName': 'payoutStatus-createdAt-Index',
+        'KeyConditionExpression': Key('payoutStatus').eq(payout_status)
+    }
+
+    earnings = []
+    try:
+        while True:
+            response = producer_earnings_table.query(**query_kwargs)
+            earnings.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return earnings
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    except ClientError as e:
+        raise Exception(f"Error querying DynamoDB Producer Earnings table: {e.response['Error']['Message']}")
+
+def group_earnings(earnings, attribute):
+    groups = defaultdict(list)
+    for earning in earnings:
+        groups[earning[attribute]].append(earning)
+    return groups
+
+def claim_earnings(earnings, payout_id):
+    """
+    Tag Pending earnings with the payout they are settled by. Earnings that are no longer
+    Pending are left out of the payout.
+    """
+    claimed = []
+    for earning in earnings:
+        try:
+            producer_earnings_table.update_item(
+                Key={'earningId': earning['earningId']},
+                UpdateExpression="SET payoutStatus = :settling, payoutId = :payout_id",
+                ConditionExpression="payoutStatus = :pending",
+                ExpressionAttributeValues={
+                    ':settling': 'Settling',
+                    ':pending': 'Pending',
+                    ':payout_id': payout_id
+                }
+            )
+            claimed.append(earning)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                print(f"Error claiming earning {earning['earningId']}: {e.response['Error']['Message']}")
+    return claimed
+
+def settle_payout(payout_id, producer_id, earnings, resume=False):
+    """
+    Transfer the sum of the earnings to the producer and mark them settled. Returns None
+    when the payout could not be made; its earnings stay Settling and are retried next run.
+    """
+    stripe_account_id = get_stripe_account_for_producer(producer_id)
+    if not stripe_account_id:
+        print(f"Producer {producer_id} does not have a valid Stripe account, payout {payout_id} deferred")
+        return None
+
+    amount = int(sum(earning['amount'] for earning in earnings))
+    try:
+        transfer = find_payout_transfer(payout_id) if resume else None
+        if transfer is None:
+            transfer = stripe.Transfer.create(
+                amount=amount,
+                currency='usd',
+                destination=stripe_account_id,
+                transfer_group=payout_id,
+                idempotency_key=payout_id
+            )
+    except stripe.error.StripeError as e:
+        print(f"Stripe error paying out {payout_id}: {str(e)}")
+        return None
+
+    settled_at = datetime.now().isoformat()
+    for earning in earnings:
+        mark_earning_settled(earning['earningId'], transfer.id, settled_at)
+
+    return {'earnings': len(earnings), 'amount': amount}
+
+def find_payout_transfer(payout_id):
+    # A run that died after transferring but before marking every earning settled
+    # has already paid this payout; the transfer is found by its transfer_group
+    transfers = stripe.Transfer.list(transfer_group=payout_id, limit=1)
+    return transfers.data[0] if transfers.data else None
+
+def mark_earning_settled(earning_id, transfer_id, settled_at):
+    # Removing payoutStatus drops the earning out of the sparse payout index
+    try:
+        producer_earnings_table.update_item(
+            Key={'earningId': earning_id},
+            UpdateExpression="SET transferId = :transfer_id, settledAt = :settled_at REMOVE payoutStatus",
+            ExpressionAttributeValues={
+                ':transfer_id': transfer_id,
+                ':settled_at': settled_at
+            }
+        )
+    except ClientError as e:
+        print(f"Error marking earning {earning_id} settled: {e.response['Error']['Message']}")
+
+def get_stripe_account_for_producer(producer_id):
+    try:
+        response = producers_table.get_item(Key={'producerId': producer_id}, ProjectionExpression='stripeAccountId')
+        return response.get('Item', {}).get('stripeAccountId')
+    except ClientError as e:
+        print(f"Error fetching Stripe account ID for producer {producer_id}: {str(e)}")
+        return None
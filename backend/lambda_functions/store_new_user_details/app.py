@@ -1,6 +1,8 @@
 import json
+import time
 import boto3
 import os
+from datetime import datetime
 from botocore.exceptions import ClientError
 
 dynamodb = boto3.client('dynamodb')
@@ -27,6 +29,21 @@ def build_update_expression(updates):
         "ExpressionAttributeValues": expression_attribute_values
     }
 
+# Only needs to outlive the notification workers' email cache
+EMAIL_CHANGE_NOTICE_TTL_SECONDS = 24 * 60 * 60
+
+def build_email_change_notice(consumer_id):
+    # Tells send_notifications to drop the consumer's cached email address. It has no
+    # notificationStatus, so it is never picked up as an email to send
+    timestamp = datetime.now().isoformat()
+    return {
+        'notificationId': {'S': f"email-changed#{consumer_id}#{timestamp}"},
+        'notificationType': {'S': 'UserEmailChanged'},
+        'recipientConsumerId': {'S': consumer_id},
+        'createdAt': {'S': timestamp},
+        'expiresAt': {'N': str(int(time.time()) + EMAIL_CHANGE_NOTICE_TTL_SECONDS)}
+    }
+
 def lambda_handler(event, context):
     if event['httpMethod'] == 'OPTIONS':
         return {
@@ -63,11 +80,30 @@ def lambda_handler(event, context):
             user_update = updates['basic']
             expressions = build_update_expression(user_update)
 
-            dynamodb.update_item(
-                TableName=user_table,
-                Key={'userId': {'S': user_id}},
-                **expressions
-            )
+            if 'email' in user_update and consumer_id:
+                dynamodb.transact_write_items(
+                    TransactItems=[
+                        {
+                            'Update': {
+                                'TableName': user_table,
+                                'Key': {'userId': {'S': user_id}},
+                                **expressions
+                            }
+                        },
+                        {
+                            'Put': {
+                                'TableName': os.environ.get('NOTIFICATION_OUTBOX_TABLE_NAME'),
+                                'Item': build_email_change_notice(consumer_id)
+                            }
+                        }
+                    ]
+                )
+            else:
+                dynamodb.update_item(
+                    TableName=user_table,
+                    Key={'userId': {'S': user_id}},
+                    **expressions
+                )
 
             logs.append(f"Updated user data for {user_id} in {user_table}: {user_update}")
 
@@ -0,0 +1,96 @@
+import base64
+import gzip
+import json
+import boto3
+import os
+from decimal import Decimal
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+transactions_table = dynamodb.Table(os.environ.get('TRANSACTIONS_TABLE_NAME'))
+
+# Must match the prefix process_payment writes its audit lines with
+PAYMENT_AUDIT_LOG_PREFIX = 'PAYMENT_AUDIT '
+
+def lambda_handler(event, context):
+    """
+    Invoked by the CloudWatch Logs subscription on the ProcessPayment log group. Writes
+    the payment audit records in the delivered log events to the Transactions table in
+    batches. An error fails the invocation so Lambda retries the whole delivery; records
+    are keyed by transactionId, so rewriting them is harmless. A delivery that still
+    fails after the retries is sent to the dead-letter queue for redrive_lambda_handler.
+    """
+    return store_log_delivery(event['awslogs']['data'])
+
+def redrive_lambda_handler(event, context):
+    """
+    Consumes the payment audit dead-letter queue. Each message is Lambda's on-failure
+    record of a log delivery, holding the original event as its requestPayload. A
+    delivery that fails again is reported back and stays on the queue, to be retried
+    after its visibility timeout until the queue's retention runs out.
+    """
+    batch_item_failures = []
+    for record in event.get('Records', []):
+        try:
+            failed_invocation = json.loads(record['body'])
+            store_log_delivery(failed_invocation['requestPayload']['awslogs']['data'])
+        except Exception as e:
+            print(f"Error redriving payment audit delivery {record['messageId']}: {str(e)}")
+            batch_item_failures.append({'itemIdentifier': record['messageId']})
+
+    return {'batchItemFailures': batch_item_failures}
+
+def store_log_delivery(data):
+    log_data = json.loads(gzip.decompress(base64.b64decode(data)))
+
+    payment_records = []
+    for log_event in log_data.get('logEvents', []):
+        payment_record = parse_payment_audit_record(log_event['message'])
+        if payment_record:
+            payment_records.append(payment_record)
+
+    try:
+        # The same record can be delivered twice in one batch; keep a single copy
+        with transactions_table.batch_writer(overwrite_by_pkeys=['transactionId']) as batch:
+            for payment_record in payment_records:
+                if payment_record.get('isSuccessful') and payment_record.get('paymentIntentId'):
+                    upsert_payment_record(payment_record)
+                else:
+                    batch.put_item(Item=payment_record)
+    except ClientError as e:
+        raise Exception(f"Error writing payment audit records to DynamoDB: {e.response['Error']['Message']}")
+
+    print(f"Stored {len(payment_records)} payment audit records")
+
+    return {'stored': len(payment_records)}
+
+def upsert_payment_record(payment_record):
+    # A Stripe webhook may already have created the item with its payment status, which
+    # a put would overwrite, so successful payments are merged in with an update instead
+    attributes = [(name, value) for name, value in payment_record.items() if name != 'transactionId']
+    transactions_table.update_item(
+        Key={'transactionId': payment_record['transactionId']},
+        UpdateExpression='SET ' + ', '.join(f"#attr{index} = :attr{index}" for index in range(len(attributes))),
+        ExpressionAttributeNames={f"#attr{index}": name for index, (name, _) in enumerate(attributes)},
+        ExpressionAttributeValues={f":attr{index}": value for index, (_, value) in enumerate(attributes)}
+    )
+
+def parse_payment_audit_record(message):
+    # With the JSON log format the printed line may arrive wrapped in a log object
+    try:
+        wrapped = json.loads(message)
+        if isinstance(wrapped, dict) and isinstance(wrapped.get('message'), str):
+            message = wrapped['message']
+    except ValueError:
+        pass
+
+    start = message.find(PAYMENT_AUDIT_LOG_PREFIX)
+    if start == -1:
+        return None
+
+    try:
+        # DynamoDB does not accept floats
+        return json.loads(message[start + len(PAYMENT_AUDIT_LOG_PREFIX):], parse_float=Decimal)
+    except ValueError:
+        print(f"Skipping malformed payment audit record: {message}")
+        return None
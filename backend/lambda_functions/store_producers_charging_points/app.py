@@ -12,6 +12,11 @@ cors_headers = {
     'Access-Control-Allow-Methods': 'OPTIONS, POST',
     'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Api-Key, X-Amz-Security-Token'
 }
+
+# Must match the precision build_match_suggestions reads the geohash index with
+GEOHASH_PRECISION = 5
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
 def lambda_handler(event, context):
     if event['httpMethod'] == 'OPTIONS':
         return {
@@ -61,7 +66,18 @@ def lambda_handler(event, context):
                     "body": json.dumps({"error": "Both latitude and longitude are required."})
                 }
             
+            try:
+                geohash = encode_geohash(float(latitude), float(longitude))
+            except ValueError:
+                return {
+                    "statusCode": 400,
+                    'headers': cors_headers,
+                    "body": json.dumps({"error": "latitude and longitude must be numbers."})
+                }
+
             point['location'] = f"{latitude},{longitude}"
+            # Places the charger in the geohash-Index used to find nearby chargers
+            point['geohash'] = geohash
             point['created_at'] = datetime.now().strftime("%d/%m/%Y, %H:%M:%S")
 
             item = {k: {'S': str(v)} for k, v in point.items()}
@@ -101,3 +117,24 @@ def lambda_handler(event, context):
             'headers': cors_headers,
             "body": json.dumps({"error": f"Server error: {str(e)}"})
         }
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    latitude_range, longitude_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash = []
+    bits = bit_count = 0
+    use_longitude = True
+    while len(geohash) < precision:
+        value, value_range = (longitude, longitude_range) if use_longitude else (latitude, latitude_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            value_range[0] = mid
+        else:
+            value_range[1] = mid
+        use_longitude = not use_longitude
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_BASE32[bits])
+            bits = bit_count = 0
+    return ''.join(geohash)
@@ -0,0 +1,245 @@
+"""
+Drives process_payment.lambda_handler concurrently against the local Stripe stub and a
+local DynamoDB, and reports throughput, latency percentiles and DynamoDB writes per payment.
+
+Start DynamoDB Local first, then run from the backend directory:
+
+    docker run -p 8000:8000 amazon/dynamodb-local
+    python -m tests.benchmark.benchmark_process_payment --payments 500 --concurrency 16 --stripe-latency-ms 250
+
+All invocations share one process, so module state such as the producer account cache
+behaves like a warm container.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from tests.benchmark.stripe_stub import StripeStub
+
+# Key schemas mirror template.yaml
+TABLE_DEFINITIONS = {
+    'PRODUCERS_TABLE_NAME': {
+        'KeySchema': [{'AttributeName': 'producerId', 'KeyType': 'HASH'}],
+        'AttributeDefinitions': [{'AttributeName': 'producerId', 'AttributeType': 'S'}]
+    },
+    'CUSTOMER_PAYMENT_INFORMATION_TABLE_NAME': {
+        'KeySchema': [
+            {'AttributeName': 'consumerId', 'KeyType': 'HASH'},
+            {'AttributeName': 'paymentMethodId', 'KeyType': 'RANGE'}
+        ],
+        'AttributeDefinitions': [
+            {'AttributeName': 'consumerId', 'AttributeType': 'S'},
+            {'AttributeName': 'paymentMethodId', 'AttributeType': 'S'}
+        ]
+    },
+    'PAYMENT_IDEMPOTENCY_TABLE_NAME': {
+        'KeySchema': [{'AttributeName': 'idempotencyKey', 'KeyType': 'HASH'}],
+        'AttributeDefinitions': [{'AttributeName': 'idempotencyKey', 'AttributeType': 'S'}]
+    },
+    'PRODUCER_EARNINGS_TABLE_NAME': {
+        'KeySchema': [{'AttributeName': 'earningId', 'KeyType': 'HASH'}],
+        'AttributeDefinitions': [
+            {'AttributeName': 'earningId', 'AttributeType': 'S'},
+            {'AttributeName': 'payoutStatus', 'AttributeType': 'S'},
+            {'AttributeName': 'createdAt', 'AttributeType': 'S'}
+        ],
+        'GlobalSecondaryIndexes': [{
+            'IndexName': 'payoutStatus-createdAt-Index',
+            'KeySchema': [
+                {'AttributeName': 'payoutStatus', 'KeyType': 'HASH'},
+                {'AttributeName': 'createdAt', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'}
+        }]
+    }
+}
+
+WRITE_OPERATIONS = {'PutItem', 'UpdateItem', 'DeleteItem'}
+
+class WriteCounter:
+    """
+    Counts DynamoDB item writes by hooking the client's before-call event.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.writes = 0
+
+    def __call__(self, model, params, **kwargs):
+        if model.name in WRITE_OPERATIONS:
+            writes = 1
+        elif model.name == 'BatchWriteItem':
+            writes = sum(len(requests) for requests in params['RequestItems'].values())
+        elif model.name == 'TransactWriteItems':
+            writes = len(params['TransactItems'])
+        else:
+            return
+        with self.lock:
+            self.writes += writes
+
+class AuditLineCounter:
+    """
+    Stands in for stdout while the benchmark runs. Counts the PAYMENT_AUDIT lines that
+    StorePaymentAuditRecords would later write to DynamoDB and drops everything else.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.audit_lines = 0
+
+    def write(self, text):
+        if text.startswith('PAYMENT_AUDIT '):
+            with self.lock:
+                self.audit_lines += 1
+        return len(text)
+
+    def flush(self):
+        pass
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark process_payment against local Stripe and DynamoDB stand-ins')
+    parser.add_argument('--payments', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=20, help='Payments run before measuring')
+    parser.add_argument('--producers', type=int, default=20)
+    parser.add_argument('--consumers', type=int, default=100)
+    parser.add_argument('--stripe-latency-ms', type=float, default=200)
+    parser.add_argument('--stripe-jitter-ms', type=float, default=50)
+    parser.add_argument('--decline-rate', type=float, default=0.02)
+    parser.add_argument('--api-error-rate', type=float, default=0.0)
+    parser.add_argument('--payout-mode', choices=['immediate', 'deferred'], default='immediate')
+    parser.add_argument('--dynamodb-endpoint', default='http://localhost:8000')
+    parser.add_argument('--keep-tables', action='store_true')
+    parser.add_argument('--seed', type=int, default=None)
+    return parser.parse_args()
+
+def configure_environment(args, table_prefix):
+    os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = args.dynamodb_endpoint
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-2')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    os.environ['STRIPE_API_KEY'] = 'sk_test_benchmark'
+    os.environ['PAYOUT_MODE'] = args.payout_mode
+    for env_name in TABLE_DEFINITIONS:
+        os.environ[env_name] = f"{table_prefix}-{env_name.replace('_TABLE_NAME', '').lower()}"
+
+def create_tables(dynamodb_client):
+    for env_name, definition in TABLE_DEFINITIONS.items():
+        dynamodb_client.create_table(TableName=os.environ[env_name], BillingMode='PAY_PER_REQUEST', **definition)
+    for env_name in TABLE_DEFINITIONS:
+        dynamodb_client.get_waiter('table_exists').wait(TableName=os.environ[env_name])
+
+def delete_tables(dynamodb_client):
+    for env_name in TABLE_DEFINITIONS:
+        dynamodb_client.delete_table(TableName=os.environ[env_name])
+
+def seed_producers(dynamodb, producer_count):
+    producers_table = dynamodb.Table(os.environ['PRODUCERS_TABLE_NAME'])
+    with producers_table.batch_writer() as batch:
+        for index in range(producer_count):
+            batch.put_item(Item={'producerId': f"producer-{index}", 'stripeAccountId': f"acct_benchmark{index}"})
+
+def build_payment_event(rng, args):
+    consumer_index = rng.randrange(args.consumers)
+    return {
+        'httpMethod': 'POST',
+        'headers': {'Idempotency-Key': str(uuid.uuid4())},
+        'body': json.dumps({
+            # A few cards per consumer, so repeat payments find the card already saved
+            'paymentMethodId': f"pm_consumer{consumer_index}_{rng.randrange(3)}",
+            'amount': rng.randrange(500, 5000),
+            'consumerId': f"consumer-{consumer_index}",
+            'producerId': f"producer-{rng.randrange(args.producers)}",
+            'chargingPointId': f"cp-{rng.randrange(args.producers * 2)}",
+            'oocpChargePointId': f"oocp-{rng.randrange(args.producers * 2)}"
+        })
+    }
+
+def run_payments(lambda_handler, events, concurrency):
+    def invoke(event):
+        started = time.perf_counter()
+        response = lambda_handler(event, None)
+        return response['statusCode'], time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(invoke, events))
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    configure_environment(args, f"benchmark-{uuid.uuid4().hex[:8]}")
+
+    dynamodb_client = boto3.client('dynamodb')
+    create_tables(dynamodb_client)
+    stub = StripeStub(args.stripe_latency_ms, args.stripe_jitter_ms, args.decline_rate, args.api_error_rate, seed=args.seed)
+
+    try:
+        seed_producers(boto3.resource('dynamodb'), args.producers)
+
+        import stripe
+        stripe.api_base = stub.start()
+        import lambda_functions.process_payment.app as process_payment_app
+
+        # Each Lambda container has its own executor; give every concurrent invocation its share
+        process_payment_app.io_executor = ThreadPoolExecutor(max_workers=4 * args.concurrency)
+
+        write_counter = WriteCounter()
+        process_payment_app.dynamodb.meta.client.meta.events.register('before-call.dynamodb', write_counter)
+        audit_line_counter = AuditLineCounter()
+
+        with contextlib.redirect_stdout(audit_line_counter):
+            run_payments(process_payment_app.lambda_handler, [build_payment_event(rng, args) for _ in range(args.warmup)], args.concurrency)
+
+            writes_before = write_counter.writes
+            audit_lines_before = audit_line_counter.audit_lines
+            stripe_requests_before = sum(stub.request_counts.values())
+
+            events = [build_payment_event(rng, args) for _ in range(args.payments)]
+            started = time.perf_counter()
+            results = run_payments(process_payment_app.lambda_handler, events, args.concurrency)
+            elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for _, latency in results)
+        status_codes = {}
+        for status_code, _ in results:
+            status_codes[status_code] = status_codes.get(status_code, 0) + 1
+
+        report = {
+            'payments': args.payments,
+            'concurrency': args.concurrency,
+            'payoutMode': args.payout_mode,
+            'statusCodes': status_codes,
+            'elapsedSeconds': round(elapsed, 2),
+            'throughputPerSecond': round(args.payments / elapsed, 1),
+            'latencyMs': {
+                'p50': round(percentile(latencies, 0.50), 1),
+                'p90': round(percentile(latencies, 0.90), 1),
+                'p99': round(percentile(latencies, 0.99), 1),
+                'max': round(latencies[-1], 1)
+            },
+            'dynamodbWritesPerPayment': round((write_counter.writes - writes_before) / args.payments, 2),
+            'auditWritesPerPayment': round((audit_line_counter.audit_lines - audit_lines_before) / args.payments, 2),
+            'stripeRequestsPerPayment': round((sum(stub.request_counts.values()) - stripe_requests_before) / args.payments, 2)
+        }
+        print(json.dumps(report, indent=2))
+    finally:
+        stub.stop()
+        if not args.keep_tables:
+            delete_tables(dynamodb_client)
+
+if __name__ == '__main__':
+    sys.exit(main())
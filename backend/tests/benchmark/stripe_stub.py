@@ -0,0 +1,143 @@
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class StripeStub:
+    """
+    Minimal Stripe-compatible HTTP server covering the calls process_payment and
+    settle_producer_payouts make: creating PaymentIntents and Transfers and listing
+    Transfers by transfer_group.
+
+    latency_ms and jitter_ms delay every response. decline_rate is the share of
+    PaymentIntents declined with a card_error and api_error_rate the share of any call
+    failing with a 500. Idempotency-Key headers replay the first response like Stripe.
+
+    Point the Stripe SDK at it with stripe.api_base = stub.start().
+    """
+
+    def __init__(self, latency_ms=0, jitter_ms=0, decline_rate=0.0, api_error_rate=0.0, host='127.0.0.1', port=0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.decline_rate = decline_rate
+        self.api_error_rate = api_error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.idempotent_responses = {}
+        self.transfers = []
+        self.request_counts = {}
+        self.server = ThreadingHTTPServer((host, port), self.build_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def build_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                params = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+                self.send_stripe_response(*stub.handle(urlparse(self.path).path, params, self.headers.get('Idempotency-Key')))
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                self.send_stripe_response(*stub.handle(url.path, params, None, method='GET'))
+
+            def send_stripe_response(self, status_code, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.send_header('Request-Id', f"req_{uuid.uuid4().hex[:14]}")
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle(self, path, params, idempotency_key, method='POST'):
+        with self.lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+            if idempotency_key and idempotency_key in self.idempotent_responses:
+                return self.idempotent_responses[idempotency_key]
+            latency = max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms)) / 1000 if self.jitter_ms else self.latency_ms / 1000
+            fail_with_api_error = self.random.random() < self.api_error_rate
+            decline = self.random.random() < self.decline_rate
+
+        time.sleep(latency)
+
+        if fail_with_api_error:
+            # Not stored: Stripe lets a request that failed with a 500 be retried with the same key
+            return 500, {'error': {'type': 'api_error', 'message': 'Injected Stripe API error'}}
+
+        if method == 'GET' and path == '/v1/transfers':
+            with self.lock:
+                transfers = [transfer for transfer in self.transfers if transfer['transfer_group'] == params.get('transfer_group')]
+            return 200, {'object': 'list', 'url': path, 'has_more': False, 'data': transfers[:int(params.get('limit', 10))]}
+        if path == '/v1/payment_intents':
+            response = self.create_payment_intent(params, decline)
+        elif path == '/v1/transfers':
+            response = self.create_transfer(params)
+        else:
+            response = 404, {'error': {'type': 'invalid_request_error', 'message': f"Unrecognized request URL ({method}: {path})"}}
+
+        if idempotency_key:
+            with self.lock:
+                self.idempotent_responses[idempotency_key] = response
+        return response
+
+    def create_payment_intent(self, params, decline):
+        if decline:
+            return 402, {'error': {
+                'type': 'card_error',
+                'code': 'card_declined',
+                'decline_code': 'generic_decline',
+                'message': 'Your card was declined.',
+                'param': 'payment_method'
+            }}
+        return 200, {
+            'id': f"pi_{uuid.uuid4().hex[:24]}",
+            'object': 'payment_intent',
+            'amount': int(params['amount']),
+            'currency': params.get('currency'),
+            'payment_method': params.get('payment_method'),
+            'transfer_group': params.get('transfer_group'),
+            'status': 'succeeded',
+            'created': int(time.time())
+        }
+
+    def create_transfer(self, params):
+        transfer = {
+            'id': f"tr_{uuid.uuid4().hex[:24]}",
+            'object': 'transfer',
+            'amount': int(params['amount']),
+            'currency': params.get('currency'),
+            'destination': params.get('destination'),
+            'transfer_group': params.get('transfer_group'),
+            'created': int(time.time())
+        }
+        with self.lock:
+            self.transfers.append(transfer)
+        return 200, transfer
@@ -0,0 +1,62 @@
+import json
+import os
+import boto3
+import pytest
+from lambda_functions.get_charging_point_availability.app import lambda_handler
+
+dynamodb = boto3.resource('dynamodb')
+
+def load_env_vars():
+    with open('backend/env.json', 'r') as env_file:
+        env_vars = json.load(env_file)
+        os.environ['CHARGING_POINTS_TABLE_NAME'] = env_vars['GetChargingPointAvailabilityFunction']['CHARGING_POINTS_TABLE_NAME']
+        os.environ['BOOKINGS_TABLE_NAME'] = env_vars['GetChargingPointAvailabilityFunction']['BOOKINGS_TABLE_NAME']
+
+load_env_vars()
+
+mock_oocp_charge_point_id = 'test-availability-point-id'
+mock_booking_ids = ['test-availability-booking-1', 'test-availability-booking-2']
+
+@pytest.fixture(scope='module')
+def dynamodb_table_bookings():
+    table = dynamodb.Table(os.environ.get('BOOKINGS_TABLE_NAME'))
+
+    table.put_item(Item={
+        'bookingId': mock_booking_ids[0],
+        'consumerId': 'test-consumer-id',
+        'oocpChargePointId': mock_oocp_charge_point_id,
+        'startTime#endTime': '2025-01-06T10:00:00#2025-01-06T11:00:00',
+        'timestamp': '2025-01-05T12:00:00'
+    })
+    table.put_item(Item={
+        'bookingId': mock_booking_ids[1],
+        'consumerId': 'test-consumer-id',
+        'oocpChargePointId': mock_oocp_charge_point_id,
+        'startTime#endTime': '2025-01-06T10:30:00#2025-01-06T12:00:00',
+        'timestamp': '2025-01-05T12:00:00'
+    })
+
+    yield table
+
+    for booking_id in mock_booking_ids:
+        table.delete_item(Key={'bookingId': booking_id})
+
+def test_lambda_handler_success(dynamodb_table_bookings):
+    event = {
+        'httpMethod': 'POST',
+        'body': json.dumps({
+            'oocpChargePointId': mock_oocp_charge_point_id,
+            'windowStart': '2025-01-06T09:00:00',
+            'windowEnd': '2025-01-06T18:00:00'
+        })
+    }
+
+    response = lambda_handler(event, None)
+
+    assert response['statusCode'] == 200
+    body = json.loads(response['body'])
+    assert body['busy'] == [{'startTime': '2025-01-06T10:00:00+00:00', 'endTime': '2025-01-06T12:00:00+00:00'}]
+    assert body['free'] == [
+        {'startTime': '2025-01-06T09:00:00+00:00', 'endTime': '2025-01-06T10:00:00+00:00'},
+        {'startTime': '2025-01-06T12:00:00+00:00', 'endTime': '2025-01-06T18:00:00+00:00'},
+    ]
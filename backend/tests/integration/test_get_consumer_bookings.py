@@ -0,0 +1,56 @@
+import json
+import os
+import boto3
+import pytest
+from lambda_functions.get_consumer_bookings.app import lambda_handler
+
+dynamodb = boto3.resource('dynamodb')
+
+def load_env_vars():
+    with open('backend/env.json', 'r') as env_file:
+        env_vars = json.load(env_file)
+        os.environ['BOOKINGS_TABLE_NAME'] = env_vars['GetConsumerBookingsFunction']['BOOKINGS_TABLE_NAME']
+
+load_env_vars()
+
+mock_consumer_id = 'test-history-consumer-id'
+mock_bookings = [
+    ('test-history-booking-past', '2020-01-01T10:00:00#2020-01-01T11:00:00'),
+    ('test-history-booking-upcoming-1', '2099-01-01T10:00:00#2099-01-01T11:00:00'),
+    ('test-history-booking-upcoming-2', '2099-01-02T10:00:00#2099-01-02T11:00:00'),
+]
+
+@pytest.fixture(scope='module')
+def dynamodb_table_bookings():
+    table = dynamodb.Table(os.environ.get('BOOKINGS_TABLE_NAME'))
+
+    for booking_id, slot in mock_bookings:
+        table.put_item(Item={
+            'bookingId': booking_id,
+            'consumerId': mock_consumer_id,
+            'oocpChargePointId': 'test-point-id',
+            'startTime#endTime': slot,
+            'timestamp': '2019-12-31T12:00:00'
+        })
+
+    yield table
+
+    for booking_id, _ in mock_bookings:
+        table.delete_item(Key={'bookingId': booking_id})
+
+def invoke(body):
+    response = lambda_handler({'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])
+
+def test_lambda_handler_paginates_upcoming_bookings(dynamodb_table_bookings):
+    first_page = invoke({'consumerId': mock_consumer_id, 'period': 'upcoming', 'limit': 1})
+    assert [b['bookingId'] for b in first_page['bookings']] == ['test-history-booking-upcoming-1']
+    assert first_page['nextCursor']
+
+    second_page = invoke({'consumerId': mock_consumer_id, 'period': 'upcoming', 'limit': 1, 'cursor': first_page['nextCursor']})
+    assert [b['bookingId'] for b in second_page['bookings']] == ['test-history-booking-upcoming-2']
+
+def test_lambda_handler_past_bookings(dynamodb_table_bookings):
+    body = invoke({'consumerId': mock_consumer_id, 'period': 'past'})
+    assert [b['bookingId'] for b in body['bookings']] == ['test-history-booking-past']
@@ -0,0 +1,64 @@
+import json
+import os
+import boto3
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+
+def load_env_vars():
+    with open('backend/env.json', 'r') as env_file:
+        env_vars = json.load(env_file)
+        os.environ['TRANSACTION_ROLLUPS_TABLE_NAME'] = env_vars['GetProducerEarningsFunction']['TRANSACTION_ROLLUPS_TABLE_NAME']
+
+load_env_vars()
+
+from lambda_functions.aggregate_transactions.app import lambda_handler as aggregate_transactions
+from lambda_functions.get_producer_earnings.app import lambda_handler
+
+dynamodb = boto3.resource('dynamodb')
+serializer = TypeSerializer()
+
+mock_producer_id = 'test-rollup-producer-id'
+mock_charging_point_id = 'test-rollup-charging-point-id'
+mock_transaction_ids = ['test-rollup-transaction-1', 'test-rollup-transaction-2']
+
+def build_stream_record(transaction_id, amount):
+    transaction = {
+        'transactionId': transaction_id,
+        'producerId': mock_producer_id,
+        'chargingPointId': mock_charging_point_id,
+        'amount': amount,
+        'isSuccessful': True,
+        'timestamp': '2020-01-01T10:00:00'
+    }
+    return {
+        'eventName': 'INSERT',
+        'dynamodb': {
+            'SequenceNumber': transaction_id,
+            'NewImage': {key: serializer.serialize(value) for key, value in transaction.items()}
+        }
+    }
+
+@pytest.fixture(scope='module')
+def dynamodb_table_transaction_rollups():
+    table = dynamodb.Table(os.environ.get('TRANSACTION_ROLLUPS_TABLE_NAME'))
+    yield table
+
+    for rollup_key in [f"producer#{mock_producer_id}", f"chargingPoint#{mock_charging_point_id}"]:
+        table.delete_item(Key={'rollupKey': rollup_key, 'day': '2020-01-01'})
+    for transaction_id in mock_transaction_ids:
+        table.delete_item(Key={'rollupKey': f"transaction#{transaction_id}", 'day': 'applied'})
+
+def test_rollups_count_each_transaction_once(dynamodb_table_transaction_rollups):
+    records = [build_stream_record(mock_transaction_ids[0], 1000), build_stream_record(mock_transaction_ids[1], 500)]
+    assert aggregate_transactions({'Records': records}, None) == {'batchItemFailures': []}
+    # A redelivered batch must not change the totals
+    assert aggregate_transactions({'Records': records}, None) == {'batchItemFailures': []}
+
+    response = lambda_handler({
+        'httpMethod': 'POST',
+        'body': json.dumps({'producerId': mock_producer_id, 'fromDate': '2020-01-01', 'toDate': '2020-01-31'})
+    }, None)
+
+    assert response['statusCode'] == 200
+    body = json.loads(response['body'])
+    assert body['days'] == [{'date': '2020-01-01', 'transactionCount': 2, 'successfulCount': 2, 'failedCount': 0, 'totalAmount': 1500}]
@@ -11,30 +11,14 @@ def load_env_vars():
     with open('backend/env.json', 'r') as env_file:
         env_vars = json.load(env_file)
         os.environ['MATCH_REQUESTS_TABLE_NAME'] = env_vars['HandleMatchRequestResponseFunction']['MATCH_REQUESTS_TABLE_NAME']
-        os.environ['USERS_TABLE_NAME'] = env_vars['HandleMatchRequestResponseFunction']['USERS_TABLE_NAME']
-        os.environ['PARAMETER_PREFIX'] = env_vars['HandleMatchRequestResponseFunction']['PARAMETER_PREFIX']
-        os.environ['SENDER_EMAIL'] = env_vars['HandleMatchRequestResponseFunction']['SENDER_EMAIL']
-        os.environ['SES_EMAIL'] = env_vars['HandleMatchRequestResponseFunction']['SES_EMAIL']
+        os.environ['NOTIFICATION_OUTBOX_TABLE_NAME'] = env_vars['HandleMatchRequestResponseFunction']['NOTIFICATION_OUTBOX_TABLE_NAME']
 
 load_env_vars()
 
-mock_sender_email = os.environ.get('SENDER_EMAIL')
 mock_sender_consumer_id = 'mock-sender-consumer-id'
 mock_recipient_consumer_id = 'mock-recipient-consumer-id'
 mock_request_id = 'mock-request-id'
-match_status_original_value = 'original_value'
-
-@pytest.fixture(scope='module')
-def dynamodb_table_users():
-    table = dynamodb.Table(os.environ.get('USERS_TABLE_NAME'))
-    test_data = {
-        'userId': 'mock-user-id',
-        'consumerId': mock_sender_consumer_id,
-        'email': mock_sender_email
-    }
-    table.put_item(Item=test_data)
-    yield table
-    table.delete_item(Key={'userId': test_data['userId']})
+match_status_original_value = 'Pending'
 
 def revert_match_status_to_original_value(table):
     table.update_item(
@@ -50,21 +34,21 @@ def dynamodb_table_match_requests():
         'requestId': mock_request_id,
         'senderConsumerId': mock_sender_consumer_id,
         'recipientConsumerId': mock_recipient_consumer_id, 
-        'matchStatus': 'original-value'
+        'matchStatus': match_status_original_value
     }
     table.put_item(Item=test_data)
     yield table
     table.delete_item(Key={'requestId': test_data['requestId']})
 
 @pytest.fixture(scope='module')
-def mock_ses_client():
-    ses_client = boto3.client('ses')
-    yield ses_client
+def dynamodb_table_notification_outbox():
+    table = dynamodb.Table(os.environ.get('NOTIFICATION_OUTBOX_TABLE_NAME'))
+    yield table
+    table.delete_item(Key={'notificationId': f"match-response#{mock_request_id}#Accepted"})
 
 def test_lambda_handler_success(
-    dynamodb_table_users, 
-    dynamodb_table_match_requests, 
-    mock_ses_client
+    dynamodb_table_match_requests,
+    dynamodb_table_notification_outbox
 ):
     event = {
         'httpMethod': 'POST',
@@ -87,13 +71,14 @@ def test_lambda_handler_success(
     items = [item for item in response['Items'] if item['requestId'] == mock_request_id]
     assert items[0]['matchStatus'] == 'Accepted'
 
-    sent_emails = mock_ses_client.list_verified_email_addresses()['VerifiedEmailAddresses']
-    assert mock_sender_email in sent_emails
+    # The sender is notified through the outbox
+    notification = dynamodb_table_notification_outbox.get_item(Key={'notificationId': f"match-response#{mock_request_id}#Accepted"})['Item']
+    assert notification['recipientConsumerId'] == mock_sender_consumer_id
+    assert notification['responderConsumerId'] == mock_recipient_consumer_id
     
     revert_match_status_to_original_value(dynamodb_table_match_requests)
     
 def test_lambda_handler_missing_fields_error(
-    dynamodb_table_users, 
     dynamodb_table_match_requests
 ):
     event = {
@@ -118,28 +103,51 @@ def test_lambda_handler_missing_fields_error(
     
     revert_match_status_to_original_value(dynamodb_table_match_requests)
 
-def test_lambda_handler_recipient_not_found_email_error(
+def test_lambda_handler_repeated_response(
     dynamodb_table_match_requests,
-    dynamodb_table_users
+    dynamodb_table_notification_outbox
 ):
     event = {
         'httpMethod': 'POST',
         'body': json.dumps({
             'requestId': mock_request_id,
             'senderConsumerId': mock_sender_consumer_id,
-            'recipientConsumerId': 'non-existent-recipient-consumer-id',  # Invalid recipient ID
+            'recipientConsumerId': mock_recipient_consumer_id,
             'requestResponse': 'Accept'
         }),
     }
     context = {}
 
+    assert lambda_handler(event, context)['statusCode'] == 200
+    dynamodb_table_notification_outbox.delete_item(Key={'notificationId': f"match-response#{mock_request_id}#Accepted"})
+
+    # The second click changes nothing and queues no second email
     response = lambda_handler(event, context)
 
     assert response['statusCode'] == 200
+    assert 'Item' not in dynamodb_table_notification_outbox.get_item(Key={'notificationId': f"match-response#{mock_request_id}#Accepted"})
+
+    revert_match_status_to_original_value(dynamodb_table_match_requests)
+
+def test_lambda_handler_response_from_other_consumer_error(
+    dynamodb_table_match_requests
+):
+    event = {
+        'httpMethod': 'POST',
+        'body': json.dumps({
+            'requestId': mock_request_id,
+            'senderConsumerId': mock_sender_consumer_id,
+            'recipientConsumerId': 'non-existent-recipient-consumer-id',  # Not the recipient of the request
+            'requestResponse': 'Accept'
+        }),
+    }
+    context = {}
+
+    response = lambda_handler(event, context)
+
+    assert response['statusCode'] == 403
 
     response = dynamodb_table_match_requests.scan()
     items = [item for item in response['Items'] if item['requestId'] == mock_request_id]
 
-    assert items[0]['matchStatus'] == 'Accepted'
-
-    revert_match_status_to_original_value(dynamodb_table_match_requests)
+    assert items[0]['matchStatus'] == match_status_original_value
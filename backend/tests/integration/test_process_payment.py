@@ -1,3 +1,5 @@
+import base64
+import gzip
 import json
 import os
 import boto3
@@ -16,6 +18,8 @@ def load_env_vars():
 
 load_env_vars()
 
+from lambda_functions.store_payment_audit_records.app import lambda_handler as store_payment_audit_records
+
 dynamodb = boto3.resource('dynamodb')
 
 mock_producer_id = 'mock-producer-id'
@@ -55,20 +59,19 @@ def dynamodb_table_customer_payment_information():
 
     table = dynamodb.Table(os.environ.get('CUSTOMER_PAYMENT_INFORMATION_TABLE_NAME'))
     test_data = {
-        'paymentInfoId': mock_payment_info_id_1, 
         'consumerId': mock_consumer_id, 
         'paymentMethodId': mock_payment_method_id_1, 
-        'updateAt': '1999-01-01T00:00:00'
+        'updatedAt': '1999-01-01T00:00:00'
     }
     table.put_item(Item=test_data)
     yield table
     
-    table.delete_item(Key={'paymentInfoId': test_data['paymentInfoId']})
-    table.delete_item(Key={'paymentInfoId': mock_uuid_id})
+    table.delete_item(Key={'consumerId': mock_consumer_id, 'paymentMethodId': mock_payment_method_id_1})
+    table.delete_item(Key={'consumerId': mock_consumer_id, 'paymentMethodId': mock_payment_info_id_2})
 
 @patch('lambda_functions.process_payment.app.get_stripe_account_for_producer')    
-@patch('lambda_functions.process_payment.app.stripe.PaymentIntent.create')
-@patch('lambda_functions.process_payment.app.stripe.Transfer.create')
+@patch('stripe.PaymentIntent.create')
+@patch('stripe.Transfer.create')
 @patch('lambda_functions.process_payment.app.uuid')
 def test_lambda_handler_successful_payment(
     mock_uuid, 
@@ -77,7 +80,8 @@ def test_lambda_handler_successful_payment(
     mock_get_stripe_function, 
     dynamodb_table_producers, 
     dynamodb_table_transactions, 
-    dynamodb_table_customer_payment_information
+    dynamodb_table_customer_payment_information,
+    capsys
 ):
     # Mock Stripe API responses
     mock_payment_intent = MagicMock(id="pi_12345")
@@ -125,17 +129,21 @@ def test_lambda_handler_successful_payment(
         transfer_group=mock_payment_intent.transfer_group
     )
 
+    # Deliver the printed audit line the way the CloudWatch Logs subscription does
+    log_data = {'logEvents': [{'id': '1', 'timestamp': 0, 'message': line} for line in capsys.readouterr().out.splitlines()]}
+    store_payment_audit_records({'awslogs': {'data': base64.b64encode(gzip.compress(json.dumps(log_data).encode())).decode()}}, None)
+
     response = dynamodb.Table(os.environ['TRANSACTIONS_TABLE_NAME']).scan()
     assert any(item['consumerId'] == mock_consumer_id for item in response.get('Items', []))
 
-    response = dynamodb.Table(os.environ['CUSTOMER_PAYMENT_INFORMATION_TABLE_NAME']).get_item(Key={'paymentInfoId': mock_uuid_id})
+    response = dynamodb.Table(os.environ['CUSTOMER_PAYMENT_INFORMATION_TABLE_NAME']).get_item(Key={'consumerId': mock_consumer_id, 'paymentMethodId': mock_payment_info_id_2})
 
     assert response.get('Item') is not None
     assert response['Item']['paymentMethodId'] == mock_payment_info_id_2
 
 @patch('lambda_functions.process_payment.app.get_stripe_account_for_producer')    
-@patch('lambda_functions.process_payment.app.stripe.PaymentIntent.create')
-@patch('lambda_functions.process_payment.app.stripe.Transfer.create')
+@patch('stripe.PaymentIntent.create')
+@patch('stripe.Transfer.create')
 @patch('lambda_functions.process_payment.app.uuid')
 @patch('lambda_functions.process_payment.app.store_payment_method')
 def test_lambda_handler_existing_payment_method(
@@ -194,8 +202,8 @@ def test_lambda_handler_existing_payment_method(
     mock_store_payment_method_function.assert_not_called()
 
 @patch('lambda_functions.process_payment.app.get_stripe_account_for_producer')
-@patch('lambda_functions.process_payment.app.stripe.PaymentIntent.create')
-@patch('lambda_functions.process_payment.app.stripe.Transfer.create')
+@patch('stripe.PaymentIntent.create')
+@patch('stripe.Transfer.create')
 def test_lambda_handler_missing_parameters(mock_transfer_create, mock_payment_intent_create, mock_get_stripe_function):
     mock_get_stripe_function.return_value = mock_stripe_account_id
 
@@ -11,30 +11,13 @@ def load_env_vars():
     with open('backend/env.json', 'r') as env_file:
         env_vars = json.load(env_file)
         os.environ['MATCH_REQUESTS_TABLE_NAME'] = env_vars['RequestMatchFunction']['MATCH_REQUESTS_TABLE_NAME']
-        os.environ['USERS_TABLE_NAME'] = env_vars['RequestMatchFunction']['USERS_TABLE_NAME']
-        os.environ['PARAMETER_PREFIX'] = env_vars['RequestMatchFunction']['PARAMETER_PREFIX']
-        os.environ['TEST_RECIPIENT_EMAIL'] = env_vars['RequestMatchFunction']['TEST_RECIPIENT_EMAIL']
-        os.environ['TEST_SES_EMAIL'] = env_vars['RequestMatchFunction']['TEST_SES_EMAIL']
+        os.environ['NOTIFICATION_OUTBOX_TABLE_NAME'] = env_vars['RequestMatchFunction']['NOTIFICATION_OUTBOX_TABLE_NAME']
+        os.environ['NOTIFICATION_COUNTERS_TABLE_NAME'] = env_vars['RequestMatchFunction']['NOTIFICATION_COUNTERS_TABLE_NAME']
 
 load_env_vars()
 
-mock_recipient_email = os.environ.get('TEST_RECIPIENT_EMAIL')
 mock_recipient_consumer_id = 'mock-recipient-consumer-id'
 
-@pytest.fixture(scope='module')
-def dynamodb_table_users():
-    table = dynamodb.Table(os.environ.get('USERS_TABLE_NAME'))
-    
-    test_data = {
-        'userId': 'mock-user-id',
-        'consumerId': mock_recipient_consumer_id,
-        'email': mock_recipient_email
-    }
-    
-    table.put_item(Item=test_data)
-    yield table
-    table.delete_item(Key={'userId': test_data['userId']})
-
 mock_request_id = 'mock-request-id'
 mock_request_id_2 = 'mock-request-id-2'
 mock_request_id_3 = 'mock-request-id-3'
@@ -46,14 +29,18 @@ def dynamodb_table_match_requests():
     yield table
     table.delete_item(Key={'requestId': mock_request_id})
     table.delete_item(Key={'requestId': mock_request_id_2})
+    table.delete_item(Key={'requestId': mock_request_id_3})
 
 @pytest.fixture(scope='module')
-def mock_ses_client():
-    ses_client = boto3.client('ses')
-    yield ses_client
+def dynamodb_table_notification_outbox():
+    table = dynamodb.Table(os.environ.get('NOTIFICATION_OUTBOX_TABLE_NAME'))
+
+    yield table
+    table.delete_item(Key={'notificationId': f"match-request#{mock_request_id}"})
+    table.delete_item(Key={'notificationId': f"match-request#{mock_request_id_3}"})
 
 @patch('lambda_functions.request_match.app.uuid')
-def test_lambda_handler(mock_uuid, dynamodb_table_users, dynamodb_table_match_requests, mock_ses_client):
+def test_lambda_handler(mock_uuid, dynamodb_table_match_requests, dynamodb_table_notification_outbox):
     mock_uuid.uuid4.return_value = mock_request_id
 
     mock_sender_consumer_id = 'mock-sender-consumer-id'
@@ -84,12 +71,14 @@ def test_lambda_handler(mock_uuid, dynamodb_table_users, dynamodb_table_match_re
     assert items[0]['recipientConsumerId'] == mock_recipient_consumer_id
     assert items[0]['matchStatus'] == 'Pending'
     
-    sent_emails = mock_ses_client.list_verified_email_addresses()['VerifiedEmailAddresses']
-    assert mock_recipient_email in sent_emails
+    # The email is queued rather than sent in the request
+    notification = dynamodb_table_notification_outbox.get_item(Key={'notificationId': f"match-request#{mock_request_id}"})['Item']
+    assert notification['recipientConsumerId'] == mock_recipient_consumer_id
+    assert notification['notificationStatus'] == 'Pending'
 
 
 @patch('lambda_functions.request_match.app.uuid')
-def test_lambda_handler_missing_fields_error(mock_uuid, dynamodb_table_users, dynamodb_table_match_requests, mock_ses_client):
+def test_lambda_handler_missing_fields_error(mock_uuid, dynamodb_table_match_requests, dynamodb_table_notification_outbox):
     mock_uuid.uuid4.return_value = mock_request_id_2
 
     event = {
@@ -113,7 +102,7 @@ def test_lambda_handler_missing_fields_error(mock_uuid, dynamodb_table_users, dy
 
 
 @patch('lambda_functions.request_match.app.uuid')
-def test_lambda_handler_user_not_found_error(mock_uuid, dynamodb_table_users, dynamodb_table_match_requests, mock_ses_client):
+def test_lambda_handler_unknown_recipient_is_queued(mock_uuid, dynamodb_table_match_requests, dynamodb_table_notification_outbox):
     mock_uuid.uuid4.return_value = mock_request_id_3
 
     event = {
@@ -130,11 +119,13 @@ def test_lambda_handler_user_not_found_error(mock_uuid, dynamodb_table_users, dy
 
     response = lambda_handler(event, context)
 
-    assert response['statusCode'] == 404
-    body = json.loads(response['body'])
-    assert body['error'] == 'Recipient user not found'
+    # The recipient's email is only looked up when the notification is sent
+    assert response['statusCode'] == 200
 
     response = dynamodb_table_match_requests.scan()
 
     items = [item for item in response['Items'] if item['requestId'] == mock_request_id_3]
     assert len(items) == 1
+
+    notification = dynamodb_table_notification_outbox.get_item(Key={'notificationId': f"match-request#{mock_request_id_3}"})
+    assert 'Item' in notification
@@ -0,0 +1,130 @@
+import unittest
+from unittest.mock import patch
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+from lambda_functions.aggregate_transactions.app import lambda_handler
+
+serializer = TypeSerializer()
+
+def serialize_image(item):
+    return {key: serializer.serialize(value) for key, value in item.items()}
+
+def build_stream_record(sequence_number, transaction, event_name='INSERT', old_transaction=None):
+    record = {
+        'eventName': event_name,
+        'dynamodb': {
+            'SequenceNumber': sequence_number,
+            'NewImage': serialize_image(transaction)
+        }
+    }
+    if old_transaction:
+        record['dynamodb']['OldImage'] = serialize_image(old_transaction)
+    return record
+
+def build_transaction(transaction_id, is_successful=True, amount=1000):
+    return {
+        'transactionId': transaction_id,
+        'producerId': 'producer-1',
+        'chargingPointId': 'cp-1',
+        'amount': amount,
+        'isSuccessful': is_successful,
+        'timestamp': '2025-01-06T09:30:00'
+    }
+
+def transaction_canceled(reason_code):
+    return ClientError({
+        'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+        'CancellationReasons': [{'Code': reason_code}, {'Code': 'None'}, {'Code': 'None'}]
+    }, 'TransactWriteItems')
+
+
+class TestAggregateTransactions(unittest.TestCase):
+
+    @patch('lambda_functions.aggregate_transactions.app.dynamodb')
+    def test_lambda_handler_updates_producer_and_charger_rollups(self, mock_dynamodb):
+        response = lambda_handler({'Records': [build_stream_record('1', build_transaction('txn-1'))]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+        transact_items = mock_dynamodb.meta.client.transact_write_items.call_args[1]['TransactItems']
+        self.assertEqual(transact_items[0]['Put']['Item']['rollupKey'], 'transaction#txn-1')
+        self.assertEqual(transact_items[0]['Put']['ConditionExpression'], 'attribute_not_exists(rollupKey)')
+
+        updates = [item['Update'] for item in transact_items[1:]]
+        self.assertEqual([update['Key'] for update in updates], [
+            {'rollupKey': 'producer#producer-1', 'day': '2025-01-06'},
+            {'rollupKey': 'chargingPoint#cp-1', 'day': '2025-01-06'}
+        ])
+        values = updates[0]['ExpressionAttributeValues']
+        self.assertEqual((values[':successful'], values[':failed'], values[':amount']), (1, 0, 1000))
+
+    @patch('lambda_functions.aggregate_transactions.app.dynamodb')
+    def test_lambda_handler_counts_failed_payment_without_amount(self, mock_dynamodb):
+        lambda_handler({'Records': [build_stream_record('1', build_transaction('txn-1', is_successful=False))]}, None)
+
+        values = mock_dynamodb.meta.client.transact_write_items.call_args[1]['TransactItems'][1]['Update']['ExpressionAttributeValues']
+        self.assertEqual((values[':successful'], values[':failed'], values[':amount']), (0, 1, 0))
+
+    @patch('lambda_functions.aggregate_transactions.app.dynamodb')
+    def test_lambda_handler_skips_redelivered_and_unattributable_records(self, mock_dynamodb):
+        mock_dynamodb.meta.client.transact_write_items.side_effect = transaction_canceled('ConditionalCheckFailed')
+        unattributable = dict(build_transaction('txn-2'), producerId=None)
+
+        response = lambda_handler({'Records': [
+            build_stream_record('1', build_transaction('txn-1')),
+            build_stream_record('2', unattributable)
+        ]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+        mock_dynamodb.meta.client.transact_write_items.assert_called_once()
+
+    @patch('lambda_functions.aggregate_transactions.app.dynamodb')
+    def test_lambda_handler_counts_transaction_when_it_first_names_its_producer(self, mock_dynamodb):
+        reconciled_only = {'transactionId': 'pi_1', 'paymentIntentId': 'pi_1', 'paymentStatus': 'Succeeded'}
+        audited = dict(build_transaction('pi_1'), paymentStatus='Succeeded')
+
+        lambda_handler({'Records': [
+            build_stream_record('1', reconciled_only),
+            build_stream_record('2', audited, 'MODIFY', reconciled_only),
+            build_stream_record('3', dict(audited, paymentStatusUpdatedAt='later'), 'MODIFY', audited)
+        ]}, None)
+
+        # Only the audit record arriving counts; writes before and after it that leave the amount kept alone do not
+        mock_dynamodb.meta.client.transact_write_items.assert_called_once()
+
+    @patch('lambda_functions.aggregate_transactions.app.dynamodb')
+    def test_lambda_handler_takes_refunds_and_disputes_out_of_earnings(self, mock_dynamodb):
+        audited = dict(build_transaction('pi_1'), paymentStatus='Succeeded', paymentStatusEventId='evt_1')
+        partially_refunded = dict(audited, paymentStatus='PartiallyRefunded', paymentStatusEventId='evt_2', amountRefunded=400)
+        disputed = dict(partially_refunded, paymentStatus='Disputed', paymentStatusEventId='evt_3')
+        dispute_won = dict(partially_refunded, paymentStatus='DisputeWon', paymentStatusEventId='evt_4')
+
+        response = lambda_handler({'Records': [
+            build_stream_record('1', partially_refunded, 'MODIFY', audited),
+            build_stream_record('2', disputed, 'MODIFY', partially_refunded),
+            build_stream_record('3', dispute_won, 'MODIFY', disputed)
+        ]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+        calls = mock_dynamodb.meta.client.transact_write_items.call_args_list
+        self.assertEqual([call[1]['TransactItems'][0]['Put']['Item']['rollupKey'] for call in calls], [
+            'transaction#pi_1#evt_2', 'transaction#pi_1#evt_3', 'transaction#pi_1#evt_4'
+        ])
+        self.assertEqual([call[1]['TransactItems'][1]['Update']['ExpressionAttributeValues'][':amount'] for call in calls], [-400, -600, 600])
+        update = calls[0][1]['TransactItems'][1]['Update']
+        self.assertEqual(update['Key'], {'rollupKey': 'producer#producer-1', 'day': '2025-01-06'})
+        self.assertNotIn('transactionCount', update['UpdateExpression'])
+
+    @patch('lambda_functions.aggregate_transactions.app.dynamodb')
+    def test_lambda_handler_reports_failed_records(self, mock_dynamodb):
+        mock_dynamodb.meta.client.transact_write_items.side_effect = [None, transaction_canceled('TransactionConflict')]
+
+        response = lambda_handler({'Records': [
+            build_stream_record('1', build_transaction('txn-1')),
+            build_stream_record('2', build_transaction('txn-2'))
+        ]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': [{'itemIdentifier': '2'}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
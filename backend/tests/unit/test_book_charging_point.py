@@ -2,15 +2,29 @@ import unittest
 from unittest.mock import patch, MagicMock, ANY
 import os
 import json
+import requests
+from botocore.exceptions import ClientError
 from lambda_functions.book_charging_point.app import (
     lambda_handler,
     update_dynamodb_charging_points_table_status,
     get_parameter_or_secret,
     book_charging_point,
+    bulk_lambda_handler,
+    validate_booking_slots,
+    book_charging_points_for_system,
+    call_cpo,
+    circuit_breakers,
+    circuit_breakers_lock,
+    CpoUnavailableError,
+    CIRCUIT_MIN_CALLS,
+    CIRCUIT_OPEN_SECONDS,
 )
 
 class TestBookChargingPoint(unittest.TestCase):
 
+    def setUp(self):
+        circuit_breakers.clear()
+
     @patch('lambda_functions.book_charging_point.app.requests.post')
     @patch('lambda_functions.book_charging_point.app.log_booking_to_dynamodb')
     @patch('lambda_functions.book_charging_point.app.update_dynamodb_charging_points_table_status')
@@ -92,5 +106,236 @@ class TestBookChargingPoint(unittest.TestCase):
         mock_get_ssm_parameter.assert_called_once()
         mock_get_secret_value.assert_not_called()
 
+    def test_validate_booking_slots_rejects_invalid_and_overlapping(self):
+        slots = [
+            {'oocpChargePointId': 'cp-1', 'system': 'Virta', 'connectorId': '1', 'startTime': '2025-01-06T10:00:00', 'endTime': '2025-01-06T11:00:00'},
+            {'oocpChargePointId': 'cp-1', 'system': 'Virta', 'connectorId': '1', 'startTime': '2025-01-06T10:30:00', 'endTime': '2025-01-06T11:30:00'},
+            {'oocpChargePointId': 'cp-2', 'system': 'Virta', 'connectorId': '1', 'startTime': '2025-01-06T12:00:00', 'endTime': '2025-01-06T11:00:00'},
+            {'oocpChargePointId': 'cp-2', 'system': 'Virta', 'connectorId': '1', 'startTime': '2025-01-06T10:30:00', 'endTime': '2025-01-06T11:30:00'},
+            {'oocpChargePointId': 'cp-3', 'system': 'Virta', 'startTime': '2025-01-06T10:00:00', 'endTime': '2025-01-06T11:00:00'},
+            {'oocpChargePointId': 'cp-4', 'system': 'Virta', 'connectorId': '1', 'startTime': '2025-01-06T10:00:00', 'endTime': '2025-01-07T11:00:00'},
+        ]
+        results = [None] * len(slots)
+
+        valid_slots = validate_booking_slots(slots, results)
+
+        self.assertEqual([slot['index'] for slot in valid_slots], [0, 3])
+        self.assertIsNone(results[0])
+        self.assertEqual(results[1]['status'], 'rejected')
+        self.assertIn('overlaps', results[1]['error'])
+        self.assertIn('startTime must be before endTime', results[2]['error'])
+        self.assertIn('connectorId', results[4]['error'])
+        self.assertIn('at most 24 hours', results[5]['error'])
+
+    @patch('lambda_functions.book_charging_point.app.requests.post')
+    def test_lambda_handler_rejects_booking_longer_than_max_duration(self, mock_requests_post):
+        event = {
+            'httpMethod': 'POST', 
+            'body': json.dumps({
+                'consumerId': 'test-consumer-id',
+                'oocpChargePointId': 'test-point-id',
+                'system': 'Virta',
+                'connectorId': '1',
+                'startTime': '2024-12-30T12:00:00',
+                'endTime': '2024-12-31T13:00:00'  
+            })
+        }
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 400)
+        mock_requests_post.assert_not_called()
+
+    @patch('lambda_functions.book_charging_point.app.get_bulk_api_url')
+    @patch('lambda_functions.book_charging_point.app.get_cpo_api_config')
+    @patch('lambda_functions.book_charging_point.app.requests.post')
+    def test_book_charging_points_for_system_uses_bulk_api(self, mock_requests_post, mock_get_cpo_api_config, mock_get_bulk_api_url):
+        mock_get_cpo_api_config.return_value = ('https://cpo/reserve', {})
+        mock_get_bulk_api_url.return_value = 'https://cpo/reserve/bulk'
+        mock_requests_post.return_value = MagicMock(
+            status_code=200,
+            json=lambda: {'reservations': [{'status': 'success'}, {'status': 'failure'}]}
+        )
+        slots = [
+            {'oocpChargePointId': 'cp-1', 'connectorId': '1', 'startTime': '2025-01-06T10:00:00', 'endTime': '2025-01-06T11:00:00'},
+            {'oocpChargePointId': 'cp-2', 'connectorId': '1', 'startTime': '2025-01-06T10:00:00', 'endTime': '2025-01-06T11:00:00'},
+        ]
+
+        responses = book_charging_points_for_system('Virta', slots)
+
+        self.assertEqual([r['status'] for r in responses], ['success', 'failure'])
+        mock_requests_post.assert_called_once_with('https://cpo/reserve/bulk', json={'reservations': ANY}, headers={}, timeout=ANY)
+
+    @patch('lambda_functions.book_charging_point.app.get_bulk_api_url')
+    @patch('lambda_functions.book_charging_point.app.get_cpo_api_config')
+    @patch('lambda_functions.book_charging_point.app.requests.post')
+    def test_book_charging_points_for_system_fans_out(self, mock_requests_post, mock_get_cpo_api_config, mock_get_bulk_api_url):
+        mock_get_cpo_api_config.return_value = ('https://cpo/reserve', {})
+        mock_get_bulk_api_url.return_value = None
+        mock_requests_post.return_value = MagicMock(status_code=200, json=lambda: {'message': 'Reserved'})
+        slots = [
+            {'oocpChargePointId': f'cp-{i}', 'connectorId': '1', 'startTime': '2025-01-06T10:00:00', 'endTime': '2025-01-06T11:00:00'}
+            for i in range(3)
+        ]
+
+        responses = book_charging_points_for_system('EVBox', slots)
+
+        self.assertEqual([r['status'] for r in responses], ['success'] * 3)
+        self.assertEqual(mock_requests_post.call_count, 3)
+
+    @patch('lambda_functions.book_charging_point.app.book_charging_points_for_system')
+    @patch('lambda_functions.book_charging_point.app.update_dynamodb_charging_points_table_status')
+    @patch('lambda_functions.book_charging_point.app.bookings_table')
+    def test_bulk_lambda_handler_reports_per_slot_outcome(self, mock_bookings_table, mock_update_status, mock_book_for_system):
+        mock_book_for_system.return_value = [{'status': 'success'}, {'status': 'failure', 'message': 'Occupied'}]
+        batch_writer = mock_bookings_table.batch_writer.return_value.__enter__.return_value
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({
+                'consumerId': 'test-consumer-id',
+                'slots': [
+                    {'oocpChargePointId': 'cp-1', 'system': 'Virta', 'connectorId': '1', 'startTime': '2025-01-06T10:00:00', 'endTime': '2025-01-06T11:00:00'},
+                    {'oocpChargePointId': 'cp-2', 'system': 'Virta', 'connectorId': '1', 'startTime': '2025-01-06T10:00:00', 'endTime': '2025-01-06T11:00:00'},
+                    {'oocpChargePointId': 'cp-3', 'system': 'Unknown', 'connectorId': '1', 'startTime': '2025-01-06T10:00:00', 'endTime': '2025-01-06T11:00:00'},
+                ]
+            })
+        }
+        response = bulk_lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(body['bookedCount'], 1)
+        self.assertEqual([r['status'] for r in body['results']], ['booked', 'failed', 'rejected'])
+        self.assertIn('bookingId', body['results'][0])
+        mock_book_for_system.assert_called_once()
+        batch_writer.put_item.assert_called_once()
+        booking_item = batch_writer.put_item.call_args[1]['Item']
+        self.assertEqual(booking_item['releaseStatus'], 'Pending')
+        self.assertEqual(booking_item['releaseAt'], 1736161200)
+        mock_update_status.assert_called_once_with('cp-1', False, ANY, 'test-consumer-id')
+
+    @patch('lambda_functions.book_charging_point.app.book_charging_points_for_system')
+    @patch('lambda_functions.book_charging_point.app.update_dynamodb_charging_points_table_status')
+    @patch('lambda_functions.book_charging_point.app.bookings_table')
+    def test_bulk_lambda_handler_reports_unrecorded_reservations(self, mock_bookings_table, mock_update_status, mock_book_for_system):
+        mock_book_for_system.return_value = [{'status': 'success', 'message': {'id': 'r-1'}}, {'status': 'success', 'message': {'id': 'r-2'}}]
+        batch_writer = mock_bookings_table.batch_writer.return_value.__enter__.return_value
+        batch_writer.put_item.side_effect = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'Throttled'}}, 'BatchWriteItem')
+        mock_bookings_table.put_item.side_effect = [None, ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'Throttled'}}, 'PutItem')]
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({
+                'consumerId': 'test-consumer-id',
+                'slots': [
+                    {'oocpChargePointId': 'cp-1', 'system': 'Virta', 'connectorId': '1', 'startTime': '2025-01-06T10:00:00', 'endTime': '2025-01-06T11:00:00'},
+                    {'oocpChargePointId': 'cp-2', 'system': 'Virta', 'connectorId': '1', 'startTime': '2025-01-06T10:00:00', 'endTime': '2025-01-06T11:00:00'},
+                    'cp-3'
+                ]
+            })
+        }
+        response = bulk_lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(body['bookedCount'], 1)
+        self.assertEqual([r['status'] for r in body['results']], ['booked', 'unrecorded', 'rejected'])
+        self.assertIn('Throttled', body['results'][1]['error'])
+        self.assertEqual(body['results'][2]['error'], 'Slot must be an object')
+        mock_update_status.assert_called_once_with('cp-1', False, ANY, 'test-consumer-id')
+
+    def test_bulk_lambda_handler_missing_slots(self):
+        event = {'httpMethod': 'POST', 'body': json.dumps({'consumerId': 'test-consumer-id'})}
+        response = bulk_lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 400)
+
+    @patch('lambda_functions.book_charging_point.app.requests.post')
+    def test_call_cpo_opens_circuit_after_errors(self, mock_requests_post):
+        mock_requests_post.return_value = MagicMock(status_code=503, text='Service Unavailable')
+
+        for _ in range(CIRCUIT_MIN_CALLS):
+            call_cpo('EVBox', 'https://evbox/reserve', {}, {})
+
+        with self.assertRaises(CpoUnavailableError):
+            call_cpo('EVBox', 'https://evbox/reserve', {}, {})
+        self.assertEqual(mock_requests_post.call_count, CIRCUIT_MIN_CALLS)
+
+        # Other backends are unaffected
+        mock_requests_post.return_value = MagicMock(status_code=200)
+        call_cpo('Virta', 'https://virta/reserve', {}, {})
+
+    @patch('lambda_functions.book_charging_point.app.requests.post')
+    def test_call_cpo_ignores_rejected_bookings(self, mock_requests_post):
+        mock_requests_post.return_value = MagicMock(status_code=409, text='Slot already taken')
+
+        for _ in range(CIRCUIT_MIN_CALLS * 2):
+            call_cpo('EVBox', 'https://evbox/reserve', {}, {})
+
+        self.assertEqual(circuit_breakers['EVBox']['state'], 'closed')
+
+    @patch('lambda_functions.book_charging_point.app.time.time')
+    @patch('lambda_functions.book_charging_point.app.requests.post')
+    def test_call_cpo_half_open_probe_closes_circuit(self, mock_requests_post, mock_time):
+        mock_time.return_value = 1000
+        mock_requests_post.side_effect = requests.Timeout('timed out')
+        for _ in range(CIRCUIT_MIN_CALLS):
+            with self.assertRaises(requests.Timeout):
+                call_cpo('EVBox', 'https://evbox/reserve', {}, {})
+        self.assertEqual(circuit_breakers['EVBox']['state'], 'open')
+
+        mock_time.return_value = 1000 + CIRCUIT_OPEN_SECONDS
+        mock_requests_post.side_effect = None
+        mock_requests_post.return_value = MagicMock(status_code=200)
+        call_cpo('EVBox', 'https://evbox/reserve', {}, {})
+
+        self.assertEqual(circuit_breakers['EVBox']['state'], 'closed')
+
+    @patch('lambda_functions.book_charging_point.app.time.time')
+    @patch('lambda_functions.book_charging_point.app.cpo_health_table')
+    @patch('lambda_functions.book_charging_point.app.requests.post')
+    def test_call_cpo_shares_circuit_state_outside_lock(self, mock_requests_post, mock_cpo_health_table, mock_time):
+        mock_time.return_value = 1000
+        lock_held_during_io = []
+        mock_cpo_health_table.get_item.side_effect = lambda **kwargs: lock_held_during_io.append(circuit_breakers_lock.locked()) or \
+            {'Item': {'backend': 'Virta', 'state': 'open', 'openedAt': 990}} if kwargs['Key']['backend'] == 'Virta' else {}
+        mock_cpo_health_table.put_item.side_effect = lambda **kwargs: lock_held_during_io.append(circuit_breakers_lock.locked())
+
+        # Another container opened the Virta circuit
+        with self.assertRaises(CpoUnavailableError):
+            call_cpo('Virta', 'https://virta/reserve', {}, {})
+        mock_requests_post.assert_not_called()
+
+        mock_requests_post.return_value = MagicMock(status_code=503, text='Service Unavailable')
+        for _ in range(CIRCUIT_MIN_CALLS):
+            call_cpo('EVBox', 'https://evbox/reserve', {}, {})
+
+        self.assertEqual(mock_cpo_health_table.put_item.call_args[1]['Item']['state'], 'open')
+        self.assertEqual(lock_held_during_io, [False] * len(lock_held_during_io))
+
+    @patch('lambda_functions.book_charging_point.app.get_parameter_or_secret')
+    @patch('lambda_functions.book_charging_point.app.requests.post')
+    def test_lambda_handler_fails_fast_when_circuit_open(self, mock_requests_post, mock_get_parameter_or_secret):
+        mock_get_parameter_or_secret.return_value = 'mocked-secret'
+        mock_requests_post.return_value = MagicMock(status_code=500, text='Internal Server Error')
+        for _ in range(CIRCUIT_MIN_CALLS):
+            call_cpo('EVBox', 'https://evbox/reserve', {}, {})
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({
+                'consumerId': 'test-consumer-id',
+                'oocpChargePointId': 'test-point-id',
+                'system': 'EVBox',
+                'connectorId': '1',
+                'startTime': '2024-12-30T12:00:00',
+                'endTime': '2024-12-30T13:00:00'
+            })
+        }
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 503)
+        self.assertEqual(mock_requests_post.call_count, CIRCUIT_MIN_CALLS)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+from lambda_functions.build_match_suggestions.app import lambda_handler, encode_geohash, geohash_cells_around
+
+serializer = TypeSerializer()
+
+def build_stream_record(sequence_number, booking_id='booking-1', consumer_id='consumer-1', slot='2099-01-01T10:00:00Z#2099-01-01T12:00:00Z'):
+    booking = {
+        'bookingId': booking_id,
+        'consumerId': consumer_id,
+        'oocpChargePointId': 'charger-1',
+        'startTime#endTime': slot,
+        'timestamp': '2098-12-30T12:00:00'
+    }
+    return {
+        'eventName': 'INSERT',
+        'dynamodb': {
+            'SequenceNumber': sequence_number,
+            'NewImage': {key: serializer.serialize(value) for key, value in booking.items()}
+        }
+    }
+
+
+@patch('lambda_functions.build_match_suggestions.app.match_suggestions_table')
+@patch('lambda_functions.build_match_suggestions.app.bookings_table')
+@patch('lambda_functions.build_match_suggestions.app.charging_points_table')
+class TestBuildMatchSuggestions(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_batch = MagicMock()
+
+    def configure_tables(self, mock_charging_points_table, mock_bookings_table, mock_match_suggestions_table, bookings_by_charger):
+        # charger-1 and charger-2 are a few hundred metres apart in London, charger-3 is in Paris
+        mock_charging_points_table.get_item.return_value = {'Item': {'location': '51.5074,-0.1278'}}
+        nearby_cell = encode_geohash(51.5074, -0.1278)
+        mock_charging_points_table.query.side_effect = lambda **kwargs: {
+            'Items': [
+                {'oocpChargePointId': 'charger-1', 'location': '51.5074,-0.1278'},
+                {'oocpChargePointId': 'charger-2', 'location': '51.5100,-0.1300'},
+                {'oocpChargePointId': 'charger-3', 'location': '48.8566,2.3522'}
+            ] if kwargs['KeyConditionExpression'].get_expression()['values'][1] == nearby_cell else []
+        }
+        mock_bookings_table.query.side_effect = lambda **kwargs: {
+            'Items': bookings_by_charger.get(kwargs['KeyConditionExpression'].get_expression()['values'][0].get_expression()['values'][1], [])
+        }
+        mock_match_suggestions_table.batch_writer.return_value.__enter__.return_value = self.mock_batch
+
+    def test_lambda_handler_suggests_overlapping_nearby_consumers(self, mock_charging_points_table, mock_bookings_table, mock_match_suggestions_table):
+        self.configure_tables(mock_charging_points_table, mock_bookings_table, mock_match_suggestions_table, {
+            'charger-1': [
+                # The new booking itself and a booking that ends before it starts
+                {'bookingId': 'booking-1', 'consumerId': 'consumer-1', 'oocpChargePointId': 'charger-1', 'startTime#endTime': '2099-01-01T10:00:00Z#2099-01-01T12:00:00Z'},
+                {'bookingId': 'booking-2', 'consumerId': 'consumer-2', 'oocpChargePointId': 'charger-1', 'startTime#endTime': '2099-01-01T08:00:00Z#2099-01-01T10:00:00Z'}
+            ],
+            'charger-2': [
+                {'bookingId': 'booking-3', 'consumerId': 'consumer-3', 'oocpChargePointId': 'charger-2', 'startTime#endTime': '2099-01-01T11:00:00Z#2099-01-01T13:00:00Z'},
+                {'bookingId': 'booking-4', 'consumerId': 'consumer-4', 'oocpChargePointId': 'charger-2', 'startTime#endTime': '2099-01-01T10:00:00Z#2099-01-01T12:00:00Z'}
+            ],
+            'charger-3': [
+                {'bookingId': 'booking-5', 'consumerId': 'consumer-5', 'oocpChargePointId': 'charger-3', 'startTime#endTime': '2099-01-01T10:00:00Z#2099-01-01T12:00:00Z'}
+            ]
+        })
+
+        response = lambda_handler({'Records': [build_stream_record('1')]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+        # Only chargers within the radius are searched for bookings
+        searched_chargers = {
+            call[1]['KeyConditionExpression'].get_expression()['values'][0].get_expression()['values'][1]
+            for call in mock_bookings_table.query.call_args_list
+        }
+        self.assertEqual(searched_chargers, {'charger-1', 'charger-2'})
+
+        suggestions = [call[1]['Item'] for call in self.mock_batch.put_item.call_args_list]
+        consumer_1_suggestions = [suggestion for suggestion in suggestions if suggestion['consumerId'] == 'consumer-1']
+        # The full overlap ranks above the half overlap
+        self.assertEqual([suggestion['candidateConsumerId'] for suggestion in consumer_1_suggestions], ['consumer-4', 'consumer-3'])
+        self.assertEqual(consumer_1_suggestions[0]['suggestionId'], 'booking-1#booking-4')
+        self.assertEqual(consumer_1_suggestions[1]['overlapStartTime'], '2099-01-01T11:00:00+00:00')
+        # Each candidate is told about the new booking too
+        reverse_suggestion = next(suggestion for suggestion in suggestions if suggestion['consumerId'] == 'consumer-4')
+        self.assertEqual(reverse_suggestion['suggestionId'], 'booking-4#booking-1')
+        self.assertEqual(reverse_suggestion['candidateConsumerId'], 'consumer-1')
+        self.assertEqual(reverse_suggestion['score'], consumer_1_suggestions[0]['score'])
+
+    def test_lambda_handler_skips_booking_at_unknown_charger(self, mock_charging_points_table, mock_bookings_table, mock_match_suggestions_table):
+        mock_charging_points_table.get_item.return_value = {}
+
+        response = lambda_handler({'Records': [build_stream_record('1')]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+        mock_charging_points_table.query.assert_not_called()
+        mock_match_suggestions_table.batch_writer.assert_not_called()
+
+    def test_lambda_handler_reports_failed_record(self, mock_charging_points_table, mock_bookings_table, mock_match_suggestions_table):
+        self.configure_tables(mock_charging_points_table, mock_bookings_table, mock_match_suggestions_table, {})
+        mock_charging_points_table.get_item.side_effect = [
+            {'Item': {'location': '51.5074,-0.1278'}},
+            ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'Throttled'}}, 'GetItem')
+        ]
+        event = {'Records': [
+            build_stream_record('1'),
+            build_stream_record('2', booking_id='booking-2'),
+            build_stream_record('3', booking_id='booking-3')
+        ]}
+        # The second booking is at another charger, so its location is not cached
+        event['Records'][1]['dynamodb']['NewImage']['oocpChargePointId'] = serializer.serialize('charger-9')
+
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response, {'batchItemFailures': [{'itemIdentifier': '2'}]})
+
+
+class TestGeohash(unittest.TestCase):
+
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(51.5074, -0.1278), 'gcpvj')
+        self.assertEqual(encode_geohash(40.7128, -74.0060, precision=7), 'dr5regw')
+
+    def test_geohash_cells_around(self):
+        cells = geohash_cells_around(51.5074, -0.1278)
+
+        self.assertEqual(len(cells), 9)
+        self.assertIn('gcpvj', cells)
+        # A charger just across the cell boundary is still found
+        self.assertIn(encode_geohash(51.5074, -0.1278 - 0.03), cells)
+
+
+if __name__ == '__main__':
+    unittest.main()
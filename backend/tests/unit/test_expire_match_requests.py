@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import patch
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from lambda_functions.expire_match_requests.app import lambda_handler, expire_match_request
+
+
+def build_match_request(request_id, is_read=0, meeting_end_at=940):
+    return {
+        'requestId': request_id,
+        'recipientConsumerId': 'consumer-123',
+        'isRead': Decimal(is_read),
+        'expiryStatus': 'Pending',
+        'meetingEndAt': Decimal(meeting_end_at)
+    }
+
+
+class TestExpireMatchRequests(unittest.TestCase):
+
+    @patch('lambda_functions.expire_match_requests.app.time.time')
+    @patch('lambda_functions.expire_match_requests.app.dynamodb')
+    @patch('lambda_functions.expire_match_requests.app.match_requests_table')
+    def test_lambda_handler_expires_due_requests(self, mock_match_requests_table, mock_dynamodb, mock_time):
+        mock_time.return_value = 1000
+        mock_match_requests_table.query.return_value = {
+            'Items': [build_match_request('request-1'), build_match_request('request-2', is_read=1)]
+        }
+
+        summary = lambda_handler({}, None)
+
+        self.assertEqual(summary, {'expired': 2, 'skipped': 0})
+        query_kwargs = mock_match_requests_table.query.call_args[1]
+        self.assertEqual(query_kwargs['IndexName'], 'expiryStatus-meetingEndAt-Index')
+        self.assertEqual(query_kwargs['KeyConditionExpression'].get_expression()['values'][1].get_expression()['values'][1], 1000)
+        self.assertEqual(mock_dynamodb.meta.client.transact_write_items.call_count, 2)
+
+    @patch('lambda_functions.expire_match_requests.app.dynamodb')
+    def test_expire_match_request_leaves_isread_indexes(self, mock_dynamodb):
+        self.assertTrue(expire_match_request(build_match_request('request-1')))
+
+        request_update, counter_update = mock_dynamodb.meta.client.transact_write_items.call_args[1]['TransactItems']
+        self.assertEqual(request_update['Update']['Key'], {'requestId': 'request-1'})
+        self.assertIn('REMOVE isRead, expiryStatus', request_update['Update']['UpdateExpression'])
+        self.assertEqual(request_update['Update']['ExpressionAttributeValues'][':expired'], 'Expired')
+        # The expired request is deleted 30 days after its meeting ended
+        self.assertEqual(request_update['Update']['ExpressionAttributeValues'][':expires_at'], 940 + 30 * 24 * 60 * 60)
+        # The unread request is taken off the recipient's unread count
+        self.assertEqual(counter_update['Update']['Key'], {'consumerId': 'consumer-123'})
+        self.assertEqual(counter_update['Update']['ExpressionAttributeValues'], {':minus_one': -1})
+
+    @patch('lambda_functions.expire_match_requests.app.dynamodb')
+    def test_expire_match_request_read_request_keeps_counter(self, mock_dynamodb):
+        self.assertTrue(expire_match_request(build_match_request('request-1', is_read=1)))
+
+        transact_items = mock_dynamodb.meta.client.transact_write_items.call_args[1]['TransactItems']
+        self.assertEqual(len(transact_items), 1)
+
+    @patch('lambda_functions.expire_match_requests.app.dynamodb')
+    def test_expire_match_request_answered_meanwhile(self, mock_dynamodb):
+        mock_dynamodb.meta.client.transact_write_items.side_effect = ClientError(
+            {
+                'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+                'CancellationReasons': [{'Code': 'ConditionalCheckFailed'}, {'Code': 'None'}]
+            },
+            'TransactWriteItems'
+        )
+
+        self.assertFalse(expire_match_request(build_match_request('request-1')))
+
+
+if __name__ == '__main__':
+    unittest.main()
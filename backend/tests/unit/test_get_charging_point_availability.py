@@ -0,0 +1,131 @@
+import json
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import patch
+from lambda_functions.get_charging_point_availability.app import (
+    lambda_handler,
+    build_timeline,
+    timeline_cache,
+    TIMELINE_CACHE_TTL_SECONDS
+)
+
+@pytest.fixture(autouse=True)
+def clear_timeline_cache():
+    timeline_cache.clear()
+    yield
+    timeline_cache.clear()
+
+@pytest.fixture
+def mock_tables():
+    with patch('lambda_functions.get_charging_point_availability.app.charging_points_table') as mock_charging_points_table, \
+            patch('lambda_functions.get_charging_point_availability.app.bookings_table') as mock_bookings_table:
+        mock_charging_points_table.get_item.return_value = {'Item': {'statusUpdatedAt': '2025-01-05T12:00:00'}}
+        mock_bookings_table.query.return_value = {
+            'Items': [
+                {'startTime#endTime': '2025-01-06T08:00:00#2025-01-06T10:00:00'},
+                {'startTime#endTime': '2025-01-06T09:30:00#2025-01-06T11:00:00'},
+                {'startTime#endTime': '2025-01-06T14:00:00#2025-01-06T15:00:00'},
+            ]
+        }
+        yield mock_charging_points_table, mock_bookings_table
+
+def build_event(body):
+    return {'httpMethod': 'POST', 'body': json.dumps(body)}
+
+def test_build_timeline_merges_and_clips_intervals():
+    window_start = datetime(2025, 1, 6, 9, 0, tzinfo=timezone.utc)
+    window_end = datetime(2025, 1, 6, 18, 0, tzinfo=timezone.utc)
+    bookings = [
+        {'startTime#endTime': '2025-01-05T20:00:00#2025-01-06T07:00:00'},
+        {'startTime#endTime': '2025-01-06T08:00:00#2025-01-06T10:00:00'},
+        {'startTime#endTime': '2025-01-06T10:00:00#2025-01-06T11:00:00'},
+        {'startTime#endTime': '2025-01-06T17:00:00#2025-01-06T19:00:00'},
+    ]
+
+    timeline = build_timeline(bookings, window_start, window_end)
+
+    assert timeline['busy'] == [
+        {'startTime': '2025-01-06T09:00:00+00:00', 'endTime': '2025-01-06T11:00:00+00:00'},
+        {'startTime': '2025-01-06T17:00:00+00:00', 'endTime': '2025-01-06T18:00:00+00:00'},
+    ]
+    assert timeline['free'] == [
+        {'startTime': '2025-01-06T11:00:00+00:00', 'endTime': '2025-01-06T17:00:00+00:00'},
+    ]
+
+def test_lambda_handler_success(mock_tables):
+    _, mock_bookings_table = mock_tables
+
+    response = lambda_handler(build_event({
+        'oocpChargePointId': 'test-point-id',
+        'windowStart': '2025-01-06T09:00:00',
+        'windowEnd': '2025-01-06T18:00:00'
+    }), None)
+
+    assert response['statusCode'] == 200
+    body = json.loads(response['body'])
+    assert body['busy'] == [
+        {'startTime': '2025-01-06T09:00:00+00:00', 'endTime': '2025-01-06T11:00:00+00:00'},
+        {'startTime': '2025-01-06T14:00:00+00:00', 'endTime': '2025-01-06T15:00:00+00:00'},
+    ]
+    assert len(body['free']) == 2
+    assert mock_bookings_table.query.call_args[1]['IndexName'] == 'oocpChargePointId-startTime-endTime-Index'
+
+def test_lambda_handler_serves_cached_timeline_until_it_expires(mock_tables):
+    _, mock_bookings_table = mock_tables
+    event = build_event({
+        'oocpChargePointId': 'test-point-id',
+        'windowStart': '2025-01-06T09:00:00',
+        'windowEnd': '2025-01-06T18:00:00'
+    })
+
+    with patch('lambda_functions.get_charging_point_availability.app.time.monotonic') as mock_monotonic:
+        mock_monotonic.return_value = 1000
+        lambda_handler(event, None)
+        lambda_handler(event, None)
+        assert mock_bookings_table.query.call_count == 1
+
+        mock_monotonic.return_value = 1000 + TIMELINE_CACHE_TTL_SECONDS
+        lambda_handler(event, None)
+        assert mock_bookings_table.query.call_count == 2
+
+def test_lambda_handler_new_booking_invalidates_cached_timeline(mock_tables):
+    mock_charging_points_table, mock_bookings_table = mock_tables
+    event = build_event({
+        'oocpChargePointId': 'test-point-id',
+        'windowStart': '2025-01-06T09:00:00',
+        'windowEnd': '2025-01-06T18:00:00'
+    })
+
+    lambda_handler(event, None)
+    # book_charging_point stamps the charger after recording a booking
+    mock_charging_points_table.get_item.return_value = {'Item': {'statusUpdatedAt': '2025-01-05T12:00:05'}}
+    mock_bookings_table.query.return_value = {'Items': [
+        {'startTime#endTime': '2025-01-06T12:00:00#2025-01-06T13:00:00'}
+    ]}
+    response = lambda_handler(event, None)
+
+    assert mock_bookings_table.query.call_count == 2
+    assert json.loads(response['body'])['busy'] == [
+        {'startTime': '2025-01-06T12:00:00+00:00', 'endTime': '2025-01-06T13:00:00+00:00'},
+    ]
+
+def test_lambda_handler_invalid_window(mock_tables):
+    response = lambda_handler(build_event({
+        'oocpChargePointId': 'test-point-id',
+        'windowStart': '2025-01-06T18:00:00',
+        'windowEnd': '2025-01-06T09:00:00'
+    }), None)
+
+    assert response['statusCode'] == 400
+
+def test_lambda_handler_missing_fields():
+    response = lambda_handler(build_event({'oocpChargePointId': 'test-point-id'}), None)
+
+    assert response['statusCode'] == 400
+    assert json.loads(response['body'])['error'] == 'Missing required fields in request body'
+
+def test_lambda_handler_options_request():
+    response = lambda_handler({'httpMethod': 'OPTIONS', 'body': None}, None)
+
+    assert response['statusCode'] == 200
+    assert 'Access-Control-Allow-Origin' in response['headers']
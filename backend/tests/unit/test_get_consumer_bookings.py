@@ -0,0 +1,113 @@
+import unittest
+from unittest.mock import patch
+import json
+from lambda_functions.get_consumer_bookings.app import lambda_handler, encode_cursor, decode_cursor
+
+
+class TestGetConsumerBookings(unittest.TestCase):
+
+    @patch('lambda_functions.get_consumer_bookings.app.bookings_table')
+    def test_lambda_handler_upcoming_bookings(self, mock_bookings_table):
+        last_evaluated_key = {
+            'bookingId': 'booking-2',
+            'consumerId': 'consumer-123',
+            'startTime#endTime': '2099-01-02T10:00:00#2099-01-02T11:00:00'
+        }
+        mock_bookings_table.query.return_value = {
+            'Items': [{
+                'bookingId': 'booking-1',
+                'oocpChargePointId': 'point-1',
+                'startTime#endTime': '2099-01-01T10:00:00#2099-01-01T11:00:00',
+                'timestamp': '2024-12-30T12:00:00'
+            }],
+            'LastEvaluatedKey': last_evaluated_key
+        }
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'consumerId': 'consumer-123', 'period': 'upcoming', 'limit': 1})
+        }
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(body['bookings'], [{
+            'bookingId': 'booking-1',
+            'oocpChargePointId': 'point-1',
+            'startTime': '2099-01-01T10:00:00',
+            'endTime': '2099-01-01T11:00:00',
+            'bookedAt': '2024-12-30T12:00:00'
+        }])
+        self.assertEqual(decode_cursor(body['nextCursor'], 'consumer-123'), last_evaluated_key)
+
+        query_kwargs = mock_bookings_table.query.call_args[1]
+        self.assertEqual(query_kwargs['IndexName'], 'consumerId-startTime-endTime-Index')
+        self.assertTrue(query_kwargs['ScanIndexForward'])
+        self.assertEqual(query_kwargs['Limit'], 1)
+        self.assertNotIn('ExclusiveStartKey', query_kwargs)
+
+    @patch('lambda_functions.get_consumer_bookings.app.bookings_table')
+    def test_lambda_handler_past_bookings_with_cursor(self, mock_bookings_table):
+        mock_bookings_table.query.return_value = {'Items': []}
+        exclusive_start_key = {'bookingId': 'booking-2', 'consumerId': 'consumer-123', 'startTime#endTime': '2024-01-01T10:00:00#2024-01-01T11:00:00'}
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'consumerId': 'consumer-123', 'period': 'past', 'cursor': encode_cursor(exclusive_start_key)})
+        }
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(body['bookings'], [])
+        self.assertIsNone(body['nextCursor'])
+
+        query_kwargs = mock_bookings_table.query.call_args[1]
+        self.assertFalse(query_kwargs['ScanIndexForward'])
+        self.assertEqual(query_kwargs['ExclusiveStartKey'], exclusive_start_key)
+
+    @patch('lambda_functions.get_consumer_bookings.app.bookings_table')
+    def test_lambda_handler_rejects_cursor_for_other_consumer(self, mock_bookings_table):
+        cursor = encode_cursor({'bookingId': 'booking-2', 'consumerId': 'someone-else', 'startTime#endTime': 'x#y'})
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'consumerId': 'consumer-123', 'cursor': cursor})
+        }
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 400)
+        self.assertEqual(json.loads(response['body'])['error'], 'Invalid cursor')
+        mock_bookings_table.query.assert_not_called()
+
+    @patch('lambda_functions.get_consumer_bookings.app.bookings_table')
+    def test_lambda_handler_rejects_non_positive_limit(self, mock_bookings_table):
+        for limit in (0, -5, 'ten'):
+            event = {
+                'httpMethod': 'POST',
+                'body': json.dumps({'consumerId': 'consumer-123', 'period': 'upcoming', 'limit': limit})
+            }
+            response = lambda_handler(event, None)
+
+            self.assertEqual(response['statusCode'], 400)
+            self.assertEqual(json.loads(response['body'])['error'], 'limit must be a positive integer')
+        mock_bookings_table.query.assert_not_called()
+
+    def test_lambda_handler_invalid_period(self):
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'consumerId': 'consumer-123', 'period': 'someday'})
+        }
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 400)
+
+    def test_lambda_handler_missing_consumer_id(self):
+        event = {'httpMethod': 'POST', 'body': json.dumps({})}
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 400)
+        self.assertEqual(json.loads(response['body'])['error'], 'Missing required fields in request body')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from unittest.mock import patch
+import json
+from decimal import Decimal
+from lambda_functions.get_match_requests.app import lambda_handler, encode_cursor, decode_cursor
+
+
+class TestGetMatchRequests(unittest.TestCase):
+
+    @patch('lambda_functions.get_match_requests.app.match_requests_table')
+    def test_lambda_handler_unread_inbox(self, mock_match_requests_table):
+        last_evaluated_key = {'requestId': 'request-2', 'recipientConsumerId': 'consumer-123', 'isRead': Decimal(0)}
+        mock_match_requests_table.query.return_value = {
+            'Items': [{
+                'requestId': 'request-1',
+                'senderConsumerId': 'consumer-456',
+                'recipientConsumerId': 'consumer-123',
+                'matchEventType': 'Business',
+                'matchStatus': 'Pending',
+                'startTime#endTime': '2099-01-01T10:00:00#2099-01-01T11:00:00',
+                'isRead': Decimal(0),
+                'timestamp': '2098-12-30T12:00:00'
+            }],
+            'LastEvaluatedKey': last_evaluated_key
+        }
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'consumerId': 'consumer-123', 'box': 'inbox', 'unreadOnly': True, 'limit': 1})
+        }
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(body['matchRequests'], [{
+            'requestId': 'request-1',
+            'senderConsumerId': 'consumer-456',
+            'recipientConsumerId': 'consumer-123',
+            'matchEventType': 'Business',
+            'matchStatus': 'Pending',
+            'startTime': '2099-01-01T10:00:00',
+            'endTime': '2099-01-01T11:00:00',
+            'isRead': False,
+            'requestedAt': '2098-12-30T12:00:00'
+        }])
+        self.assertEqual(decode_cursor(body['nextCursor'], 'inbox', 'consumer-123'), {'requestId': 'request-2', 'recipientConsumerId': 'consumer-123', 'isRead': 0})
+
+        query_kwargs = mock_match_requests_table.query.call_args[1]
+        self.assertEqual(query_kwargs['IndexName'], 'recipientConsumerId-isRead-Index')
+        self.assertEqual(query_kwargs['Limit'], 1)
+
+    @patch('lambda_functions.get_match_requests.app.match_requests_table')
+    def test_lambda_handler_outbox_resumes_from_cursor(self, mock_match_requests_table):
+        mock_match_requests_table.query.return_value = {'Items': []}
+        cursor = encode_cursor({'requestId': 'request-2', 'senderConsumerId': 'consumer-123', 'isRead': 1})
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'consumerId': 'consumer-123', 'box': 'outbox', 'cursor': cursor})
+        }
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertIsNone(json.loads(response['body'])['nextCursor'])
+        query_kwargs = mock_match_requests_table.query.call_args[1]
+        self.assertEqual(query_kwargs['IndexName'], 'senderConsumerId-isRead-Index')
+        self.assertEqual(query_kwargs['ExclusiveStartKey'], {'requestId': 'request-2', 'senderConsumerId': 'consumer-123', 'isRead': 1})
+
+    @patch('lambda_functions.get_match_requests.app.match_requests_table')
+    def test_lambda_handler_rejects_cursor_from_other_consumer(self, mock_match_requests_table):
+        cursor = encode_cursor({'requestId': 'request-2', 'recipientConsumerId': 'consumer-999', 'isRead': 0})
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'consumerId': 'consumer-123', 'cursor': cursor})
+        }
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 400)
+        self.assertEqual(json.loads(response['body'])['error'], 'Invalid cursor')
+        mock_match_requests_table.query.assert_not_called()
+
+    @patch('lambda_functions.get_match_requests.app.match_requests_table')
+    def test_lambda_handler_rejects_non_positive_limit(self, mock_match_requests_table):
+        for limit in (0, -5, 'ten'):
+            event = {
+                'httpMethod': 'POST',
+                'body': json.dumps({'consumerId': 'consumer-123', 'box': 'inbox', 'limit': limit})
+            }
+            response = lambda_handler(event, None)
+
+            self.assertEqual(response['statusCode'], 400)
+            self.assertEqual(json.loads(response['body'])['error'], 'limit must be a positive integer')
+        mock_match_requests_table.query.assert_not_called()
+
+    def test_lambda_handler_invalid_box(self):
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'consumerId': 'consumer-123', 'box': 'archive'})
+        }
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 400)
+
+if __name__ == '__main__':
+    unittest.main()
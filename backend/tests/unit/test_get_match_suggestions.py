@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+import json
+from decimal import Decimal
+from lambda_functions.get_match_suggestions.app import lambda_handler
+
+def build_suggestion(booking_id, candidate_consumer_id, candidate_booking_id, score):
+    return {
+        'consumerId': 'consumer-1',
+        'suggestionId': f"{booking_id}#{candidate_booking_id}",
+        'bookingId': booking_id,
+        'oocpChargePointId': 'charger-1',
+        'candidateConsumerId': candidate_consumer_id,
+        'candidateBookingId': candidate_booking_id,
+        'candidateChargePointId': 'charger-2',
+        'overlapStartTime': '2099-01-01T10:00:00+00:00',
+        'overlapEndTime': '2099-01-01T11:00:00+00:00',
+        'distanceKm': Decimal('0.331'),
+        'score': Decimal(score),
+        'expiresAt': Decimal(4070912400)
+    }
+
+
+class TestGetMatchSuggestions(unittest.TestCase):
+
+    @patch('lambda_functions.get_match_suggestions.app.match_suggestions_table')
+    def test_lambda_handler_ranks_suggestions(self, mock_match_suggestions_table):
+        mock_match_suggestions_table.query.return_value = {'Items': [
+            build_suggestion('booking-1', 'consumer-2', 'booking-2', '0.4'),
+            build_suggestion('booking-1', 'consumer-3', 'booking-3', '0.9'),
+            build_suggestion('booking-7', 'consumer-2', 'booking-8', '0.6')
+        ]}
+
+        response = lambda_handler({'httpMethod': 'POST', 'body': json.dumps({'consumerId': 'consumer-1', 'limit': 5})}, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        suggestions = json.loads(response['body'])['suggestions']
+        # Best first, and each consumer once with their best booking
+        self.assertEqual([(suggestion['candidateConsumerId'], suggestion['bookingId']) for suggestion in suggestions], [('consumer-3', 'booking-1'), ('consumer-2', 'booking-7')])
+        self.assertEqual(suggestions[0]['score'], 0.9)
+
+    @patch('lambda_functions.get_match_suggestions.app.match_suggestions_table')
+    def test_lambda_handler_for_one_booking(self, mock_match_suggestions_table):
+        mock_match_suggestions_table.query.return_value = {'Items': []}
+
+        response = lambda_handler({'httpMethod': 'POST', 'body': json.dumps({'consumerId': 'consumer-1', 'bookingId': 'booking-1'})}, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        key_condition = mock_match_suggestions_table.query.call_args[1]['KeyConditionExpression']
+        self.assertEqual(key_condition.get_expression()['values'][1].get_expression()['values'][1], 'booking-1#')
+
+    @patch('lambda_functions.get_match_suggestions.app.match_suggestions_table')
+    def test_lambda_handler_missing_consumer(self, mock_match_suggestions_table):
+        response = lambda_handler({'httpMethod': 'POST', 'body': json.dumps({})}, None)
+
+        self.assertEqual(response['statusCode'], 400)
+        mock_match_suggestions_table.query.assert_not_called()
+
+    def test_lambda_handler_options_method(self):
+        response = lambda_handler({'httpMethod': 'OPTIONS'}, None)
+
+        self.assertEqual(response['statusCode'], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+import json
+from lambda_functions.get_producer_earnings.app import lambda_handler
+
+
+def build_event(body):
+    return {'httpMethod': 'POST', 'body': json.dumps(body)}
+
+def build_rollup(rollup_key, day, producer_id='producer-1', successful=2, failed=1, amount=3000):
+    return {
+        'rollupKey': rollup_key,
+        'day': day,
+        'producerId': producer_id,
+        'transactionCount': Decimal(successful + failed),
+        'successfulCount': Decimal(successful),
+        'failedCount': Decimal(failed),
+        'totalAmount': Decimal(amount)
+    }
+
+
+class TestGetProducerEarnings(unittest.TestCase):
+
+    @patch('lambda_functions.get_producer_earnings.app.transaction_rollups_table')
+    def test_lambda_handler_returns_daily_rollups_and_totals(self, mock_transaction_rollups_table):
+        mock_transaction_rollups_table.query.return_value = {'Items': [
+            build_rollup('producer#producer-1', '2025-01-05'),
+            build_rollup('producer#producer-1', '2025-01-06', successful=1, failed=0, amount=500)
+        ]}
+
+        response = lambda_handler(build_event({'producerId': 'producer-1', 'fromDate': '2025-01-01', 'toDate': '2025-01-31'}), None)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(len(body['days']), 2)
+        self.assertEqual(body['days'][0], {'date': '2025-01-05', 'transactionCount': 3, 'successfulCount': 2, 'failedCount': 1, 'totalAmount': 3000})
+        self.assertEqual(body['totals'], {'transactionCount': 4, 'successfulCount': 3, 'failedCount': 1, 'totalAmount': 3500})
+
+        key_condition = mock_transaction_rollups_table.query.call_args[1]['KeyConditionExpression'].get_expression()
+        self.assertEqual(key_condition['values'][0].get_expression()['values'][1], 'producer#producer-1')
+
+    @patch('lambda_functions.get_producer_earnings.app.transaction_rollups_table')
+    def test_lambda_handler_hides_other_producers_chargers(self, mock_transaction_rollups_table):
+        mock_transaction_rollups_table.query.return_value = {'Items': [
+            build_rollup('chargingPoint#cp-9', '2025-01-05', producer_id='producer-2')
+        ]}
+
+        response = lambda_handler(build_event({'producerId': 'producer-1', 'chargingPointId': 'cp-9', 'fromDate': '2025-01-01', 'toDate': '2025-01-31'}), None)
+
+        body = json.loads(response['body'])
+        self.assertEqual(body['days'], [])
+        self.assertEqual(body['totals']['totalAmount'], 0)
+
+    def test_lambda_handler_rejects_invalid_range(self):
+        for body in [
+            {'producerId': 'producer-1', 'fromDate': '2025-01-01'},
+            {'producerId': 'producer-1', 'fromDate': '01/01/2025', 'toDate': '2025-01-31'},
+            {'producerId': 'producer-1', 'fromDate': '2025-02-01', 'toDate': '2025-01-01'},
+            {'producerId': 'producer-1', 'fromDate': '2024-01-01', 'toDate': '2025-01-31'}
+        ]:
+            response = lambda_handler(build_event(body), None)
+            self.assertEqual(response['statusCode'], 400, body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from unittest.mock import patch
+import json
+from decimal import Decimal
+from lambda_functions.get_unread_match_count.app import lambda_handler
+
+
+class TestGetUnreadMatchCount(unittest.TestCase):
+
+    @patch('lambda_functions.get_unread_match_count.app.notification_counters_table')
+    def test_lambda_handler_returns_counter(self, mock_notification_counters_table):
+        mock_notification_counters_table.get_item.return_value = {'Item': {'unreadMatchRequests': Decimal(3)}}
+
+        response = lambda_handler({'httpMethod': 'POST', 'body': json.dumps({'consumerId': 'consumer-123'})}, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body']), {'unreadCount': 3})
+        mock_notification_counters_table.get_item.assert_called_once_with(
+            Key={'consumerId': 'consumer-123'},
+            ProjectionExpression='unreadMatchRequests'
+        )
+
+    @patch('lambda_functions.get_unread_match_count.app.notification_counters_table')
+    def test_lambda_handler_without_counter(self, mock_notification_counters_table):
+        mock_notification_counters_table.get_item.return_value = {}
+
+        response = lambda_handler({'httpMethod': 'POST', 'body': json.dumps({'consumerId': 'consumer-123'})}, None)
+
+        self.assertEqual(json.loads(response['body']), {'unreadCount': 0})
+
+    def test_lambda_handler_missing_consumer(self):
+        response = lambda_handler({'httpMethod': 'POST', 'body': json.dumps({})}, None)
+
+        self.assertEqual(response['statusCode'], 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,23 +1,39 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import json
-from lambda_functions.handle_match_request_response.app import lambda_handler, get_user_email, send_email_notification_to_sender
-
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+from lambda_functions.handle_match_request_response.app import lambda_handler
+
+serializer = TypeSerializer()
+
+def build_response_event(request_response='Accept', recipient_consumer_id='mock-recipient-id'):
+    return {
+        'httpMethod': 'POST',
+        'body': json.dumps({
+            'requestId': 'mock-request-id',
+            'senderConsumerId': 'mock-sender-id',
+            'recipientConsumerId': recipient_consumer_id,
+            'requestResponse': request_response
+        })
+    }
+
+def build_condition_failure(match_request):
+    reason = {'Code': 'ConditionalCheckFailed'}
+    if match_request is not None:
+        # TransactionCanceledException carries the old item as raw attribute values
+        reason['Item'] = {key: serializer.serialize(value) for key, value in match_request.items()}
+    return ClientError(
+        {
+            'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+            'CancellationReasons': [reason, {'Code': 'None'}]
+        },
+        'TransactWriteItems'
+    )
 
 class TestLambdaFunction(unittest.TestCase):
-    @patch('lambda_functions.handle_match_request_response.app.match_requests_table')
-    @patch('lambda_functions.handle_match_request_response.app.users_table')
-    @patch('lambda_functions.handle_match_request_response.app.ses_client')
-    @patch('lambda_functions.handle_match_request_response.app.ssm_client')
-    def test_lambda_handler_success(self, mock_ssm_client, mock_ses_client, mock_users_table, mock_match_requests_table):
-        mock_ssm_client.get_parameter.return_value = {
-            'Parameter': {'Value': 'mock-ses-email@example.com'}
-        }
-        mock_users_table.query.return_value = {
-            'Items': [{'email': 'sender@example.com'}]
-        }
-        mock_match_requests_table.update_item.return_value = {}
-
+    @patch('lambda_functions.handle_match_request_response.app.dynamodb')
+    def test_lambda_handler_success(self, mock_dynamodb):
         event = {
             'httpMethod': 'POST',
             'body': json.dumps({
@@ -34,11 +50,24 @@ class TestLambdaFunction(unittest.TestCase):
         body = json.loads(response['body'])
         self.assertEqual(body['message'], 'Match request response sent successfully')
 
-        mock_match_requests_table.update_item.assert_called_once()
-        mock_ses_client.send_email.assert_called_once()
-
-    @patch('lambda_functions.handle_match_request_response.app.match_requests_table')
-    def test_lambda_handler_missing_parameters(self, mock_match_requests_table):
+        # The status update and the sender's notification are written together
+        mock_dynamodb.meta.client.transact_write_items.assert_called_once()
+        status_update, notification_put = mock_dynamodb.meta.client.transact_write_items.call_args[1]['TransactItems']
+        self.assertEqual(status_update['Update']['Key'], {'requestId': 'mock-request-id'})
+        self.assertEqual(status_update['Update']['ExpressionAttributeValues'][':match_status'], 'Accepted')
+        # Only a pending request addressed to the responder can change
+        self.assertIn('matchStatus IN (:from_status_0)', status_update['Update']['ConditionExpression'])
+        self.assertEqual(status_update['Update']['ExpressionAttributeValues'][':from_status_0'], 'Pending')
+        self.assertEqual(status_update['Update']['ExpressionAttributeValues'][':recipient_consumer_id'], 'mock-recipient-id')
+        self.assertIn('REMOVE expiryStatus', status_update['Update']['UpdateExpression'])
+        notification = notification_put['Put']['Item']
+        self.assertEqual(notification['notificationId'], 'match-response#mock-request-id#Accepted')
+        self.assertEqual(notification['notificationType'], 'MatchResponse')
+        self.assertEqual(notification['recipientConsumerId'], 'mock-sender-id')
+        self.assertEqual(notification['responderConsumerId'], 'mock-recipient-id')
+
+    @patch('lambda_functions.handle_match_request_response.app.dynamodb')
+    def test_lambda_handler_missing_parameters(self, mock_dynamodb):
         event = {
             'httpMethod': 'POST',
             'body': json.dumps({
@@ -52,13 +81,13 @@ class TestLambdaFunction(unittest.TestCase):
         self.assertEqual(response['statusCode'], 400)
         body = json.loads(response['body'])
         self.assertEqual(body['error'], 'Missing required fields in request body')
-        mock_match_requests_table.update_item.assert_not_called()
+        mock_dynamodb.meta.client.transact_write_items.assert_not_called()
 
-    @patch('lambda_functions.handle_match_request_response.app.users_table')
-    @patch('lambda_functions.handle_match_request_response.app.match_requests_table')
-    @patch('lambda_functions.handle_match_request_response.app.ses_client')
-    def test_lambda_handler_user_not_found(self, mock_ses_client, mock_match_requests_table, mock_users_table):
-        mock_users_table.query.return_value = {'Items': []}
+    @patch('lambda_functions.handle_match_request_response.app.dynamodb')
+    def test_lambda_handler_write_failure(self, mock_dynamodb):
+        mock_dynamodb.meta.client.transact_write_items.side_effect = ClientError(
+            {'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'}}, 'TransactWriteItems'
+        )
 
         event = {
             'httpMethod': 'POST',
@@ -72,58 +101,68 @@ class TestLambdaFunction(unittest.TestCase):
         context = {}
         response = lambda_handler(event, context)
 
-        self.assertEqual(response['statusCode'], 404)
+        self.assertEqual(response['statusCode'], 500)
         body = json.loads(response['body'])
-        self.assertEqual(body['error'], 'Sender user not found')
-        mock_ses_client.send_email.assert_not_called()
+        self.assertIn('Transaction cancelled', body['error'])
 
-    @patch('lambda_functions.handle_match_request_response.app.users_table')
-    @patch('lambda_functions.handle_match_request_response.app.ses_client')
-    @patch('lambda_functions.handle_match_request_response.app.match_requests_table')
-    def test_lambda_handler_ses_failure(self, match_requests_table, mock_ses_client, mock_users_table):
-        mock_users_table.query.return_value = {'Items': [{'email': 'sender@example.com'}]}
-        
-        mock_ses_client.send_email.side_effect = Exception("SES failed to send email")
+    @patch('lambda_functions.handle_match_request_response.app.dynamodb')
+    def test_lambda_handler_invalid_response(self, mock_dynamodb):
+        response = lambda_handler(build_response_event(request_response='Maybe'), {})
 
-        event = {
-            'httpMethod': 'POST',
-            'body': json.dumps({
-                'requestId': 'mock-request-id',
-                'senderConsumerId': 'mock-sender-id',
-                'recipientConsumerId': 'mock-recipient-id',
-                'requestResponse': 'Accept'
-            })
-        }
-        context = {}
-        response = lambda_handler(event, context)
+        self.assertEqual(response['statusCode'], 400)
+        mock_dynamodb.meta.client.transact_write_items.assert_not_called()
 
-        self.assertEqual(response['statusCode'], 500)
-        body = json.loads(response['body'])
-        self.assertIn('SES failed to send email', body['error'])
+    @patch('lambda_functions.handle_match_request_response.app.dynamodb')
+    def test_lambda_handler_repeated_response_is_a_no_op(self, mock_dynamodb):
+        mock_dynamodb.meta.client.transact_write_items.side_effect = build_condition_failure({
+            'requestId': 'mock-request-id',
+            'senderConsumerId': 'mock-sender-id',
+            'recipientConsumerId': 'mock-recipient-id',
+            'matchStatus': 'Accepted',
+            'meetingEndAt': 1735729200
+        })
 
-    @patch('lambda_functions.handle_match_request_response.app.users_table')
-    def test_get_user_email(self, mock_users_table):
-        mock_users_table.query.return_value = {
-            'Items': [{'email': 'test@example.com'}]
-        }
-        email = get_user_email('mock-consumer-id')
-        self.assertEqual(email, 'test@example.com')
-
-        mock_users_table.query.return_value = {'Items': []}
-        email = get_user_email('nonexistent-id')
-        self.assertIsNone(email)
-
-    @patch('lambda_functions.handle_match_request_response.app.ses_client')
-    def test_send_email_notification_to_sender(self, mock_ses_client):
-        send_email_notification_to_sender(
-            ses_email='mock-ses@example.com',
-            sender_email='sender@example.com',
-            recipient_consumer_id='mock-recipient-id'
-        )
-        mock_ses_client.send_email.assert_called_once()
-        args, kwargs = mock_ses_client.send_email.call_args
-        self.assertEqual(kwargs['Destination']['ToAddresses'], ['sender@example.com'])
-        self.assertIn('mock-recipient-id', kwargs['Message']['Body']['Text']['Data'])
+        response = lambda_handler(build_response_event(), {})
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body'])['matchStatus'], 'Accepted')
+        # The failed conditional write is the only call made
+        mock_dynamodb.meta.client.transact_write_items.assert_called_once()
+
+    @patch('lambda_functions.handle_match_request_response.app.dynamodb')
+    def test_lambda_handler_conflicting_response(self, mock_dynamodb):
+        mock_dynamodb.meta.client.transact_write_items.side_effect = build_condition_failure({
+            'requestId': 'mock-request-id',
+            'senderConsumerId': 'mock-sender-id',
+            'recipientConsumerId': 'mock-recipient-id',
+            'matchStatus': 'Rejected'
+        })
+
+        response = lambda_handler(build_response_event(request_response='Accept'), {})
+
+        self.assertEqual(response['statusCode'], 409)
+        self.assertEqual(json.loads(response['body'])['matchStatus'], 'Rejected')
+
+    @patch('lambda_functions.handle_match_request_response.app.dynamodb')
+    def test_lambda_handler_response_from_other_consumer(self, mock_dynamodb):
+        mock_dynamodb.meta.client.transact_write_items.side_effect = build_condition_failure({
+            'requestId': 'mock-request-id',
+            'senderConsumerId': 'mock-sender-id',
+            'recipientConsumerId': 'mock-recipient-id',
+            'matchStatus': 'Pending'
+        })
+
+        response = lambda_handler(build_response_event(recipient_consumer_id='someone-else'), {})
+
+        self.assertEqual(response['statusCode'], 403)
+
+    @patch('lambda_functions.handle_match_request_response.app.dynamodb')
+    def test_lambda_handler_unknown_request(self, mock_dynamodb):
+        mock_dynamodb.meta.client.transact_write_items.side_effect = build_condition_failure(None)
+
+        response = lambda_handler(build_response_event(), {})
+
+        self.assertEqual(response['statusCode'], 404)
 
 
 if __name__ == '__main__':
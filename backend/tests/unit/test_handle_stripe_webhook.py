@@ -0,0 +1,90 @@
+import hashlib
+import hmac
+import json
+import time
+import unittest
+from unittest.mock import patch
+from botocore.exceptions import ClientError
+from lambda_functions.handle_stripe_webhook.app import lambda_handler, resolve_payment_status
+
+WEBHOOK_SECRET = 'whsec_test'
+
+def build_webhook_event(stripe_event, secret=WEBHOOK_SECRET):
+    payload = json.dumps(stripe_event)
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return {
+        'httpMethod': 'POST',
+        'headers': {'Stripe-Signature': f"t={timestamp},v1={signature}"},
+        'body': payload
+    }
+
+def build_stripe_event(event_id, event_type, stripe_object):
+    return {
+        'id': event_id,
+        'object': 'event',
+        'type': event_type,
+        'created': 1736150400,
+        'data': {'object': stripe_object}
+    }
+
+
+@patch('lambda_functions.handle_stripe_webhook.app.webhook_secret', WEBHOOK_SECRET)
+class TestHandleStripeWebhook(unittest.TestCase):
+
+    @patch('lambda_functions.handle_stripe_webhook.app.stripe_events_table')
+    def test_lambda_handler_stores_verified_payment_event(self, mock_stripe_events_table):
+        stripe_event = build_stripe_event('evt_1', 'charge.refunded', {
+            'id': 'ch_1', 'object': 'charge', 'payment_intent': 'pi_1', 'amount': 1000, 'amount_refunded': 1000
+        })
+
+        response = lambda_handler(build_webhook_event(stripe_event), None)
+
+        self.assertEqual(response['statusCode'], 200)
+        put_kwargs = mock_stripe_events_table.put_item.call_args[1]
+        self.assertEqual(put_kwargs['Item']['eventId'], 'evt_1')
+        self.assertEqual(put_kwargs['Item']['paymentIntentId'], 'pi_1')
+        self.assertEqual(put_kwargs['Item']['paymentStatus'], 'Refunded')
+        self.assertEqual(put_kwargs['Item']['amountRefunded'], 1000)
+        self.assertEqual(put_kwargs['ConditionExpression'], 'attribute_not_exists(eventId)')
+
+    @patch('lambda_functions.handle_stripe_webhook.app.stripe_events_table')
+    def test_lambda_handler_acknowledges_duplicate_event(self, mock_stripe_events_table):
+        mock_stripe_events_table.put_item.side_effect = ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}, 'PutItem')
+        stripe_event = build_stripe_event('evt_1', 'payment_intent.succeeded', {'id': 'pi_1', 'object': 'payment_intent'})
+
+        response = lambda_handler(build_webhook_event(stripe_event), None)
+
+        self.assertEqual(response['statusCode'], 200)
+
+    @patch('lambda_functions.handle_stripe_webhook.app.stripe_events_table')
+    def test_lambda_handler_rejects_invalid_signature(self, mock_stripe_events_table):
+        stripe_event = build_stripe_event('evt_1', 'payment_intent.succeeded', {'id': 'pi_1', 'object': 'payment_intent'})
+
+        response = lambda_handler(build_webhook_event(stripe_event, secret='whsec_other'), None)
+
+        self.assertEqual(response['statusCode'], 400)
+        mock_stripe_events_table.put_item.assert_not_called()
+
+    @patch('lambda_functions.handle_stripe_webhook.app.stripe_events_table')
+    def test_lambda_handler_ignores_unrelated_event_types(self, mock_stripe_events_table):
+        stripe_event = build_stripe_event('evt_1', 'customer.created', {'id': 'cus_1', 'object': 'customer'})
+
+        response = lambda_handler(build_webhook_event(stripe_event), None)
+
+        self.assertEqual(response['statusCode'], 200)
+        mock_stripe_events_table.put_item.assert_not_called()
+
+    def test_resolve_payment_status(self):
+        self.assertEqual(
+            resolve_payment_status(build_stripe_event('evt_1', 'charge.refunded', {'payment_intent': 'pi_1', 'amount': 1000, 'amount_refunded': 400})),
+            ('pi_1', 'PartiallyRefunded')
+        )
+        self.assertEqual(
+            resolve_payment_status(build_stripe_event('evt_2', 'charge.dispute.closed', {'payment_intent': 'pi_1', 'status': 'lost'})),
+            ('pi_1', 'DisputeLost')
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from unittest.mock import patch
+import json
+from botocore.exceptions import ClientError
+from lambda_functions.mark_match_requests_read.app import lambda_handler
+
+def build_cancellation(codes):
+    error = ClientError(
+        {'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'}},
+        'TransactWriteItems'
+    )
+    error.response['CancellationReasons'] = [{'Code': code} for code in codes]
+    return error
+
+def build_event(body):
+    return {'httpMethod': 'POST', 'body': json.dumps(body)}
+
+
+class TestMarkMatchRequestsRead(unittest.TestCase):
+
+    @patch('lambda_functions.mark_match_requests_read.app.dynamodb')
+    def test_lambda_handler_marks_requests_and_decrements_counter(self, mock_dynamodb):
+        response = lambda_handler(build_event({'consumerId': 'consumer-123', 'requestIds': ['request-1', 'request-2', 'request-1']}), None)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body']), {'marked': 2})
+        transact_items = mock_dynamodb.meta.client.transact_write_items.call_args[1]['TransactItems']
+        self.assertEqual([item['Update']['Key'] for item in transact_items[:-1]], [{'requestId': 'request-1'}, {'requestId': 'request-2'}])
+        self.assertIn('recipientConsumerId = :consumer_id', transact_items[0]['Update']['ConditionExpression'])
+        self.assertEqual(transact_items[-1]['Update']['Key'], {'consumerId': 'consumer-123'})
+        self.assertEqual(transact_items[-1]['Update']['ExpressionAttributeValues'], {':read_count': -2})
+
+    @patch('lambda_functions.mark_match_requests_read.app.dynamodb')
+    def test_lambda_handler_skips_requests_already_read(self, mock_dynamodb):
+        mock_dynamodb.meta.client.transact_write_items.side_effect = [
+            build_cancellation(['None', 'ConditionalCheckFailed', 'None']),
+            None
+        ]
+
+        response = lambda_handler(build_event({'consumerId': 'consumer-123', 'requestIds': ['request-1', 'request-2']}), None)
+
+        self.assertEqual(json.loads(response['body']), {'marked': 1})
+        retried_items = mock_dynamodb.meta.client.transact_write_items.call_args[1]['TransactItems']
+        self.assertEqual(retried_items[0]['Update']['Key'], {'requestId': 'request-1'})
+        self.assertEqual(retried_items[-1]['Update']['ExpressionAttributeValues'], {':read_count': -1})
+
+    @patch('lambda_functions.mark_match_requests_read.app.dynamodb')
+    def test_lambda_handler_fails_on_unrelated_cancellation(self, mock_dynamodb):
+        mock_dynamodb.meta.client.transact_write_items.side_effect = build_cancellation(['TransactionConflict', 'None'])
+
+        response = lambda_handler(build_event({'consumerId': 'consumer-123', 'requestIds': ['request-1']}), None)
+
+        self.assertEqual(response['statusCode'], 500)
+
+    @patch('lambda_functions.mark_match_requests_read.app.dynamodb')
+    @patch('lambda_functions.mark_match_requests_read.app.match_requests_table')
+    def test_lambda_handler_mark_all(self, mock_match_requests_table, mock_dynamodb):
+        mock_match_requests_table.query.side_effect = [
+            {'Items': [{'requestId': 'request-1'}], 'LastEvaluatedKey': {'requestId': 'request-1'}},
+            {'Items': [{'requestId': 'request-2'}]}
+        ]
+
+        response = lambda_handler(build_event({'consumerId': 'consumer-123', 'markAll': True}), None)
+
+        self.assertEqual(json.loads(response['body']), {'marked': 2})
+        self.assertEqual(mock_match_requests_table.query.call_args[1]['IndexName'], 'recipientConsumerId-isRead-Index')
+
+    def test_lambda_handler_missing_fields(self):
+        response = lambda_handler(build_event({'consumerId': 'consumer-123'}), None)
+
+        self.assertEqual(response['statusCode'], 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,24 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import json
-from lambda_functions.process_payment.app import lambda_handler, get_stripe_account_for_producer, log_payment_to_dynamodb
+import threading
+from botocore.exceptions import ClientError
+import stripe
+import lambda_functions.process_payment.app as process_payment_app
+from lambda_functions.process_payment.app import lambda_handler, get_stripe_account_for_producer, audit_payment, call_stripe, check_payment_method_exists, store_payment_method
 
 
 class TestLambdaFunction(unittest.TestCase):
+
+    def setUp(self):
+        process_payment_app.producer_account_cache.clear()
         
-    @patch('lambda_functions.process_payment.app.stripe.PaymentIntent.create')
-    @patch('lambda_functions.process_payment.app.stripe.Transfer.create')
-    @patch('lambda_functions.process_payment.app.transactions_table')
+    @patch('stripe.PaymentIntent.create')
+    @patch('stripe.Transfer.create')
+    @patch('lambda_functions.process_payment.app.audit_payment')
     @patch('lambda_functions.process_payment.app.producers_table')
     @patch('lambda_functions.process_payment.app.customer_payment_info_table')
-    def test_lambda_handler_successful_payment(self, mock_customer_payment_info_table, mock_producers_table, mock_transactions_table, mock_payment_intent_create, mock_transfer_create):
+    def test_lambda_handler_successful_payment(self, mock_customer_payment_info_table, mock_producers_table, mock_audit_payment, mock_payment_intent_create, mock_transfer_create):
         mock_producers_table.get_item.return_value = {
             'Item': {
                 'stripeAccountId': 'mock-stripe-account-id',
@@ -19,18 +26,10 @@ class TestLambdaFunction(unittest.TestCase):
             }
         }
         
-        mock_transactions_table.put_item.return_value = 'Updated'
-        
         mock_payment_intent_create.return_value = MagicMock(id="pi_12345")
         mock_transfer_create.return_value = MagicMock(id="tr_12345")
 
-        mock_customer_payment_info_table.query.return_value = {
-            'Items': [{
-                'consumerId': 'consumer123',
-                'paymentMethodId': 'pm_card_visa_old', 
-                'other-field': 'some-data', 
-            }]
-        }
+        mock_customer_payment_info_table.get_item.return_value = {}
         event = {
             'httpMethod': 'POST', 
             'body':json.dumps(
@@ -54,15 +53,16 @@ class TestLambdaFunction(unittest.TestCase):
         self.assertIn('payment_intent', body)
         self.assertIn('transfer', body)
 
-        # Verify the payment record in DynamoDB
-        mock_transactions_table.put_item.assert_called_once()
-        put_item_call_args = mock_transactions_table.put_item.call_args[1]['Item']
-        self.assertEqual(put_item_call_args['consumerId'], 'consumer123')
-        self.assertEqual(put_item_call_args['producerId'], 'producer123')
-        self.assertTrue(put_item_call_args['isSuccessful'])
+        # Verify the payment was audited
+        mock_audit_payment.assert_called_once()
+        audit_args = mock_audit_payment.call_args[0]
+        self.assertEqual(audit_args[0], 'consumer123')
+        self.assertEqual(audit_args[1], 'producer123')
+        self.assertTrue(audit_args[6])
+        self.assertEqual(audit_args[8], body['payment_intent'])
 
-    @patch('lambda_functions.process_payment.app.transactions_table')
-    def test_lambda_handler_missing_parameters(self, mock_transactions_table):
+    @patch('lambda_functions.process_payment.app.audit_payment')
+    def test_lambda_handler_missing_parameters(self, mock_audit_payment):
         event = {
             'httpMethod': 'POST', 
             'body': json.dumps({
@@ -81,13 +81,12 @@ class TestLambdaFunction(unittest.TestCase):
         self.assertIn('error', body)
         self.assertEqual(body['error'], 'Missing required parameters')
 
-        mock_transactions_table.put_item.assert_called_once()
+        mock_audit_payment.assert_called_once()
 
-    @patch('lambda_functions.process_payment.app.transactions_table')
+    @patch('lambda_functions.process_payment.app.audit_payment')
     @patch('lambda_functions.process_payment.app.producers_table')
-    def test_lambda_handler_invalid_producer(self, mock_producers_table, mock_transactions_table):
+    def test_lambda_handler_invalid_producer(self, mock_producers_table, mock_audit_payment):
         mock_producers_table.get_item.return_value = {}
-        mock_transactions_table.put_item.return_value = 'Updated'
         
         event = {
             'httpMethod': 'POST', 
@@ -109,7 +108,7 @@ class TestLambdaFunction(unittest.TestCase):
         self.assertIn('error', body)
         self.assertIn('does not have a valid Stripe account', body['error'])
 
-        mock_transactions_table.put_item.assert_called_once()
+        mock_audit_payment.assert_called_once()
 
     @patch('lambda_functions.process_payment.app.producers_table')
     def test_get_stripe_account_for_producer(self, mock_producers_table):
@@ -130,11 +129,9 @@ class TestLambdaFunction(unittest.TestCase):
         stripe_account_id = get_stripe_account_for_producer(invalid_producer_id)
         self.assertIsNone(stripe_account_id)
 
-    @patch('lambda_functions.process_payment.app.transactions_table')
-    def test_log_payment_to_dynamodb(self, mock_transactions_table):
-        mock_transactions_table.put_item.return_value = 'Updated'
-        
-        log_payment_to_dynamodb(
+    @patch('builtins.print')
+    def test_audit_payment(self, mock_print):
+        audit_payment(
             consumer_id='consumer123',
             producer_id='producer123',
             charging_point_id='cp123',
@@ -142,15 +139,268 @@ class TestLambdaFunction(unittest.TestCase):
             amount=1000,
             payment_method_id='pm_card_visa',
             is_successful=True,
-            message='Test payment success'
+            message='Test payment success',
+            payment_intent_id='pi_12345'
         )
 
-        mock_transactions_table.put_item.assert_called_once()
-        args, kwargs = mock_transactions_table.put_item.call_args
-        item = kwargs['Item']
+        mock_print.assert_called_once()
+        audit_line = mock_print.call_args[0][0]
+        self.assertTrue(audit_line.startswith(process_payment_app.PAYMENT_AUDIT_LOG_PREFIX))
+        item = json.loads(audit_line[len(process_payment_app.PAYMENT_AUDIT_LOG_PREFIX):])
+        self.assertEqual(item['transactionId'], 'pi_12345')
         self.assertEqual(item['consumerId'], 'consumer123')
         self.assertEqual(item['producerId'], 'producer123')
         self.assertTrue(item['isSuccessful'])
 
+    @patch('lambda_functions.process_payment.app.get_stripe_api_key')
+    @patch('lambda_functions.process_payment.app.audit_payment')
+    @patch('lambda_functions.process_payment.app.stripe', None)
+    def test_lambda_handler_does_not_load_stripe_without_payment(self, mock_audit_payment, mock_get_stripe_api_key):
+        lambda_handler({'httpMethod': 'OPTIONS'}, {})
+        lambda_handler({'httpMethod': 'POST', 'body': json.dumps({'amount': 1000})}, {})
+
+        self.assertIsNone(process_payment_app.stripe)
+        mock_get_stripe_api_key.assert_not_called()
+
+    @patch('lambda_functions.process_payment.app.get_stripe_api_key')
+    @patch('lambda_functions.process_payment.app.stripe', None)
+    def test_call_stripe_refreshes_key_on_authentication_error(self, mock_get_stripe_api_key):
+        mock_get_stripe_api_key.side_effect = ['sk_test_rotated_out', 'sk_test_current']
+        operation = MagicMock(side_effect=[stripe.error.AuthenticationError('Invalid API Key'), 'ok'])
+
+        result = call_stripe(operation)
+
+        self.assertEqual(result, 'ok')
+        self.assertEqual(operation.call_count, 2)
+        self.assertEqual(process_payment_app.stripe.api_key, 'sk_test_current')
+
+    def build_payment_event(self, idempotency_key):
+        return {
+            'httpMethod': 'POST',
+            'headers': {'Idempotency-Key': idempotency_key},
+            'body': json.dumps({
+                'paymentMethodId': 'pm_card_visa',
+                'amount': 1000,
+                'consumerId': 'consumer123',
+                'producerId': 'producer123',
+                'chargingPointId': 'cp123',
+                'oocpChargePointId': 'oocp123'
+            })
+        }
+
+    @patch('stripe.PaymentIntent.create')
+    @patch('stripe.Transfer.create')
+    @patch('lambda_functions.process_payment.app.payment_idempotency_table')
+    @patch('lambda_functions.process_payment.app.audit_payment')
+    @patch('lambda_functions.process_payment.app.producers_table')
+    @patch('lambda_functions.process_payment.app.customer_payment_info_table')
+    def test_lambda_handler_passes_idempotency_key_to_stripe(self, mock_customer_payment_info_table, mock_producers_table, mock_audit_payment, mock_idempotency_table, mock_transfer_create, mock_payment_intent_create):
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'mock-stripe-account-id'}}
+        mock_customer_payment_info_table.get_item.return_value = {'Item': {'paymentMethodId': 'pm_card_visa'}}
+        mock_payment_intent_create.return_value = MagicMock(id='pi_12345')
+        mock_transfer_create.return_value = MagicMock(id='tr_12345')
+
+        response = lambda_handler(self.build_payment_event('key-123'), {})
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(mock_payment_intent_create.call_args[1]['idempotency_key'], 'key-123-payment-intent')
+        self.assertEqual(mock_transfer_create.call_args[1]['idempotency_key'], 'key-123-transfer')
+
+        claim_kwargs = mock_idempotency_table.put_item.call_args[1]
+        self.assertEqual(claim_kwargs['Item']['status'], 'InProgress')
+        self.assertIn('attribute_not_exists(idempotencyKey)', claim_kwargs['ConditionExpression'])
+        complete_kwargs = mock_idempotency_table.update_item.call_args[1]
+        self.assertEqual(complete_kwargs['ExpressionAttributeValues'][':status_code'], 200)
+
+    @patch('stripe.PaymentIntent.create')
+    @patch('lambda_functions.process_payment.app.payment_idempotency_table')
+    @patch('lambda_functions.process_payment.app.producers_table')
+    def test_lambda_handler_replays_completed_payment(self, mock_producers_table, mock_idempotency_table, mock_payment_intent_create):
+        event = self.build_payment_event('key-123')
+        stored_body = json.dumps({'message': 'Payment processed successfully', 'payment_intent': 'pi_12345', 'transfer': 'tr_12345'})
+        mock_idempotency_table.put_item.side_effect = ClientError(
+            {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}, 'PutItem'
+        )
+        mock_idempotency_table.get_item.return_value = {
+            'Item': {
+                'idempotencyKey': 'key-123',
+                'status': 'Completed',
+                'requestHash': process_payment_app.build_request_hash(json.loads(event['body'])),
+                'responseStatusCode': 200,
+                'responseBody': stored_body
+            }
+        }
+
+        response = lambda_handler(event, {})
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(response['body'], stored_body)
+        mock_producers_table.get_item.assert_not_called()
+        mock_payment_intent_create.assert_not_called()
+
+    @patch('lambda_functions.process_payment.app.payment_idempotency_table')
+    def test_lambda_handler_rejects_reused_idempotency_key(self, mock_idempotency_table):
+        mock_idempotency_table.put_item.side_effect = ClientError(
+            {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}, 'PutItem'
+        )
+        mock_idempotency_table.get_item.return_value = {
+            'Item': {'idempotencyKey': 'key-123', 'status': 'InProgress', 'requestHash': 'another-request'}
+        }
+
+        response = lambda_handler(self.build_payment_event('key-123'), {})
+
+        self.assertEqual(response['statusCode'], 422)
+
+    @patch('lambda_functions.process_payment.app.producers_table')
+    def test_get_stripe_account_for_producer_is_cached(self, mock_producers_table):
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'mock-stripe-account-id'}}
+
+        self.assertEqual(get_stripe_account_for_producer('producer123'), 'mock-stripe-account-id')
+        self.assertEqual(get_stripe_account_for_producer('producer123'), 'mock-stripe-account-id')
+        mock_producers_table.get_item.assert_called_once()
+
+        # Producers without an account are cached too, for a shorter time
+        mock_producers_table.get_item.return_value = {}
+        self.assertIsNone(get_stripe_account_for_producer('producer456'))
+        self.assertIsNone(get_stripe_account_for_producer('producer456'))
+        self.assertEqual(mock_producers_table.get_item.call_count, 2)
+
+    @patch('lambda_functions.process_payment.app.time.monotonic')
+    @patch('lambda_functions.process_payment.app.producers_table')
+    def test_get_stripe_account_for_producer_cache_expires(self, mock_producers_table, mock_monotonic):
+        mock_monotonic.return_value = 1000
+        mock_producers_table.get_item.return_value = {}
+        self.assertIsNone(get_stripe_account_for_producer('producer123'))
+
+        mock_monotonic.return_value = 1000 + process_payment_app.PRODUCER_ACCOUNT_NEGATIVE_CACHE_TTL_SECONDS
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'new-stripe-account-id'}}
+        self.assertEqual(get_stripe_account_for_producer('producer123'), 'new-stripe-account-id')
+
+        # A changed account is picked up once the positive entry expires
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'changed-stripe-account-id'}}
+        mock_monotonic.return_value += process_payment_app.PRODUCER_ACCOUNT_CACHE_TTL_SECONDS - 1
+        self.assertEqual(get_stripe_account_for_producer('producer123'), 'new-stripe-account-id')
+        mock_monotonic.return_value += 1
+        self.assertEqual(get_stripe_account_for_producer('producer123'), 'changed-stripe-account-id')
+
+    @patch('stripe.PaymentIntent.create')
+    @patch('stripe.Transfer.create')
+    @patch('lambda_functions.process_payment.app.audit_payment')
+    @patch('lambda_functions.process_payment.app.producers_table')
+    def test_lambda_handler_invalidates_rejected_stripe_account(self, mock_producers_table, mock_audit_payment, mock_transfer_create, mock_payment_intent_create):
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'disconnected-account-id'}}
+        mock_payment_intent_create.return_value = MagicMock(id='pi_12345')
+        mock_transfer_create.side_effect = stripe.error.InvalidRequestError('No such destination', param='destination')
+
+        response = lambda_handler({
+            'httpMethod': 'POST',
+            'body': json.dumps({
+                'paymentMethodId': 'pm_card_visa',
+                'amount': 1000,
+                'consumerId': 'consumer123',
+                'producerId': 'producer123',
+                'chargingPointId': 'cp123',
+                'oocpChargePointId': 'oocp123'
+            })
+        }, {})
+
+        self.assertEqual(response['statusCode'], 400)
+        self.assertNotIn('producer123', process_payment_app.producer_account_cache)
+
+    @patch('stripe.PaymentIntent.create')
+    @patch('stripe.Transfer.create')
+    @patch('lambda_functions.process_payment.app.payment_idempotency_table')
+    @patch('lambda_functions.process_payment.app.audit_payment')
+    @patch('lambda_functions.process_payment.app.producers_table')
+    @patch('lambda_functions.process_payment.app.customer_payment_info_table')
+    def test_lambda_handler_runs_post_payment_writes_concurrently(self, mock_customer_payment_info_table, mock_producers_table, mock_audit_payment, mock_idempotency_table, mock_transfer_create, mock_payment_intent_create):
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'mock-stripe-account-id'}}
+        mock_customer_payment_info_table.get_item.return_value = {}
+        mock_payment_intent_create.return_value = MagicMock(id='pi_12345')
+        mock_transfer_create.return_value = MagicMock(id='tr_12345')
+
+        # Both writes must be in flight at the same time to get past the barrier
+        barrier = threading.Barrier(2, timeout=2)
+        mock_customer_payment_info_table.put_item.side_effect = lambda **kwargs: barrier.wait()
+        mock_idempotency_table.update_item.side_effect = lambda **kwargs: barrier.wait()
+
+        response = lambda_handler(self.build_payment_event('key-123'), {})
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertFalse(barrier.broken)
+        mock_customer_payment_info_table.put_item.assert_called_once()
+        mock_idempotency_table.update_item.assert_called_once()
+        mock_audit_payment.assert_called_once()
+
+    @patch('lambda_functions.process_payment.app.PAYOUT_MODE', 'deferred')
+    @patch('stripe.PaymentIntent.create')
+    @patch('stripe.Transfer.create')
+    @patch('lambda_functions.process_payment.app.producer_earnings_table')
+    @patch('lambda_functions.process_payment.app.payment_idempotency_table')
+    @patch('lambda_functions.process_payment.app.audit_payment')
+    @patch('lambda_functions.process_payment.app.producers_table')
+    @patch('lambda_functions.process_payment.app.customer_payment_info_table')
+    def test_lambda_handler_defers_producer_payout(self, mock_customer_payment_info_table, mock_producers_table, mock_audit_payment, mock_idempotency_table, mock_producer_earnings_table, mock_transfer_create, mock_payment_intent_create):
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'mock-stripe-account-id'}}
+        mock_customer_payment_info_table.get_item.return_value = {'Item': {'paymentMethodId': 'pm_card_visa'}}
+        mock_payment_intent_create.return_value = MagicMock(id='pi_12345')
+
+        response = lambda_handler(self.build_payment_event('key-123'), {})
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body'])['payout'], 'Deferred')
+        mock_transfer_create.assert_not_called()
+        # The batched payout Transfer is grouped by payout, not by this charge
+        self.assertNotIn('transfer_group', mock_payment_intent_create.call_args[1])
+
+        earning = mock_producer_earnings_table.put_item.call_args[1]['Item']
+        self.assertEqual(earning['earningId'], 'pi_12345')
+        self.assertEqual(earning['producerId'], 'producer123')
+        self.assertEqual(earning['amount'], 1000)
+        self.assertEqual(earning['payoutStatus'], 'Pending')
+
+    @patch('lambda_functions.process_payment.app.PAYOUT_MODE', 'deferred')
+    @patch('stripe.PaymentIntent.create')
+    @patch('lambda_functions.process_payment.app.producer_earnings_table')
+    @patch('lambda_functions.process_payment.app.payment_idempotency_table')
+    @patch('lambda_functions.process_payment.app.audit_payment')
+    @patch('lambda_functions.process_payment.app.producers_table')
+    @patch('lambda_functions.process_payment.app.customer_payment_info_table')
+    def test_lambda_handler_fails_when_earning_is_not_recorded(self, mock_customer_payment_info_table, mock_producers_table, mock_audit_payment, mock_idempotency_table, mock_producer_earnings_table, mock_payment_intent_create):
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'mock-stripe-account-id'}}
+        mock_customer_payment_info_table.get_item.return_value = {'Item': {'paymentMethodId': 'pm_card_visa'}}
+        mock_payment_intent_create.return_value = MagicMock(id='pi_12345')
+        mock_producer_earnings_table.put_item.side_effect = ClientError({'Error': {'Code': 'InternalServerError', 'Message': 'DynamoDB error'}}, 'PutItem')
+
+        response = lambda_handler(self.build_payment_event('key-123'), {})
+
+        # The claim is released so a retry replays the charge and records the earning
+        self.assertEqual(response['statusCode'], 500)
+        mock_idempotency_table.delete_item.assert_called_once_with(Key={'idempotencyKey': 'key-123'})
+
+    @patch('lambda_functions.process_payment.app.customer_payment_info_table')
+    def test_check_payment_method_exists_reads_keyed_item(self, mock_customer_payment_info_table):
+        mock_customer_payment_info_table.get_item.return_value = {'Item': {'paymentMethodId': 'pm_card_visa'}}
+
+        self.assertTrue(check_payment_method_exists('consumer123', 'pm_card_visa'))
+        mock_customer_payment_info_table.get_item.assert_called_once_with(
+            Key={'consumerId': 'consumer123', 'paymentMethodId': 'pm_card_visa'},
+            ProjectionExpression='paymentMethodId'
+        )
+
+        mock_customer_payment_info_table.get_item.return_value = {}
+        self.assertFalse(check_payment_method_exists('consumer123', 'pm_card_mastercard'))
+
+    @patch('lambda_functions.process_payment.app.customer_payment_info_table')
+    def test_store_payment_method_ignores_card_already_saved(self, mock_customer_payment_info_table):
+        mock_customer_payment_info_table.put_item.side_effect = ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}, 'PutItem')
+
+        store_payment_method('consumer123', 'pm_card_visa')
+
+        put_kwargs = mock_customer_payment_info_table.put_item.call_args[1]
+        self.assertEqual(put_kwargs['Item']['consumerId'], 'consumer123')
+        self.assertEqual(put_kwargs['Item']['paymentMethodId'], 'pm_card_visa')
+        self.assertEqual(put_kwargs['ConditionExpression'], 'attribute_not_exists(paymentMethodId)')
+
 if __name__ == '__main__':
     unittest.main()
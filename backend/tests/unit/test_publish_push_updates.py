@@ -0,0 +1,116 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+from lambda_functions.publish_push_updates.app import lambda_handler
+
+serializer = TypeSerializer()
+
+def build_stream_record(table_name, new_image, old_image=None):
+    record = {
+        'eventName': 'MODIFY' if old_image else 'INSERT',
+        'eventSourceARN': f'arn:aws:dynamodb:eu-west-2:123456789012:table/{table_name}/stream/2025-01-01T00:00:00.000',
+        'dynamodb': {'NewImage': {key: serializer.serialize(value) for key, value in new_image.items()}}
+    }
+    if old_image:
+        record['dynamodb']['OldImage'] = {key: serializer.serialize(value) for key, value in old_image.items()}
+    return record
+
+def build_match_request(match_status='Pending', is_read=0):
+    return {
+        'requestId': 'request-1',
+        'senderConsumerId': 'consumer-1',
+        'recipientConsumerId': 'consumer-2',
+        'matchEventType': 'Business',
+        'matchStatus': match_status,
+        'startTime#endTime': '2099-01-01T10:00:00Z#2099-01-01T11:00:00Z',
+        'isRead': is_read
+    }
+
+def build_charging_point(is_available):
+    return {
+        'oocpChargePointId': 'charger-1',
+        'chargingPointId': 'point-1',
+        'location': '51.5074,-0.1278',
+        'geohash': 'gcpvj',
+        'isAvailable': is_available
+    }
+
+
+@patch('lambda_functions.publish_push_updates.app.apigateway_management_client')
+@patch('lambda_functions.publish_push_updates.app.push_subscriptions_table')
+class TestPublishPushUpdates(unittest.TestCase):
+
+    def test_lambda_handler_pushes_latest_match_status_to_both_consumers(self, mock_push_subscriptions_table, mock_apigateway_management_client):
+        mock_push_subscriptions_table.query.side_effect = lambda **kwargs: {'Items': [
+            {'connectionId': f"connection-for-{kwargs['KeyConditionExpression'].get_expression()['values'][1]}"}
+        ]}
+
+        response = lambda_handler({'Records': [
+            build_stream_record('test-MATCH_REQUESTS', build_match_request()),
+            build_stream_record('test-MATCH_REQUESTS', build_match_request('Accepted'), build_match_request()),
+            # Only the response time changed
+            build_stream_record('test-MATCH_REQUESTS', {**build_match_request('Accepted'), 'statusUpdatedAt': 'now'}, build_match_request('Accepted'))
+        ]}, None)
+
+        self.assertEqual(response, {'pushed': 2, 'connections': 2})
+        posts = {call[1]['ConnectionId']: json.loads(call[1]['Data']) for call in mock_apigateway_management_client.post_to_connection.call_args_list}
+        self.assertEqual(set(posts), {'connection-for-consumer#consumer-1', 'connection-for-consumer#consumer-2'})
+        # Both changes in the batch collapse into the latest state
+        updates = posts['connection-for-consumer#consumer-1']['updates']
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(updates[0]['matchStatus'], 'Accepted')
+        self.assertEqual(updates[0]['type'], 'matchRequest')
+
+    def test_lambda_handler_pushes_charger_availability_to_viewports(self, mock_push_subscriptions_table, mock_apigateway_management_client):
+        mock_push_subscriptions_table.query.side_effect = lambda **kwargs: {'Items': [{'connectionId': 'map-connection'}]} \
+            if kwargs['KeyConditionExpression'].get_expression()['values'][1] == 'geohash#gcpv' else {'Items': []}
+
+        lambda_handler({'Records': [
+            build_stream_record('test-CHARGING_POINTS', build_charging_point(False), build_charging_point(True))
+        ]}, None)
+
+        topics = {call[1]['KeyConditionExpression'].get_expression()['values'][1] for call in mock_push_subscriptions_table.query.call_args_list}
+        self.assertEqual(topics, {'geohash#gcpvj', 'geohash#gcpv'})
+        update = json.loads(mock_apigateway_management_client.post_to_connection.call_args[1]['Data'])['updates'][0]
+        self.assertEqual(update, {
+            'type': 'chargingPoint',
+            'oocpChargePointId': 'charger-1',
+            'chargingPointId': 'point-1',
+            'location': '51.5074,-0.1278',
+            'isAvailable': False
+        })
+
+    def test_lambda_handler_skips_unchanged_availability(self, mock_push_subscriptions_table, mock_apigateway_management_client):
+        response = lambda_handler({'Records': [
+            build_stream_record('test-CHARGING_POINTS', {**build_charging_point(True), 'statusUpdatedAt': 'now'}, build_charging_point(True))
+        ]}, None)
+
+        self.assertEqual(response['pushed'], 0)
+        mock_push_subscriptions_table.query.assert_not_called()
+
+    def test_lambda_handler_removes_gone_connections(self, mock_push_subscriptions_table, mock_apigateway_management_client):
+        mock_batch = MagicMock()
+        mock_push_subscriptions_table.batch_writer.return_value.__enter__.return_value = mock_batch
+        mock_push_subscriptions_table.query.side_effect = lambda **kwargs: {'Items': [
+            {'topic': 'consumer#consumer-1', 'connectionId': 'stale-connection'}
+        ]}
+        mock_apigateway_management_client.post_to_connection.side_effect = ClientError(
+            {'Error': {'Code': 'GoneException', 'Message': 'Gone'}}, 'PostToConnection'
+        )
+        booking = {
+            'bookingId': 'booking-1',
+            'consumerId': 'consumer-1',
+            'oocpChargePointId': 'charger-1',
+            'startTime#endTime': '2099-01-01T10:00:00Z#2099-01-01T11:00:00Z'
+        }
+
+        response = lambda_handler({'Records': [build_stream_record('test-BOOKINGS', booking)]}, None)
+
+        self.assertEqual(response, {'pushed': 1, 'connections': 0})
+        mock_batch.delete_item.assert_called_once_with(Key={'topic': 'consumer#consumer-1', 'connectionId': 'stale-connection'})
+
+
+if __name__ == '__main__':
+    unittest.main()
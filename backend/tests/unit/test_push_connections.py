@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+from lambda_functions.push_connections.app import lambda_handler, geohash_cells_in_viewport, encode_geohash
+
+def build_route_event(route_key, body=None, query_string_parameters=None):
+    return {
+        'requestContext': {'routeKey': route_key, 'connectionId': 'connection-1'},
+        'queryStringParameters': query_string_parameters,
+        'body': json.dumps(body) if body is not None else None
+    }
+
+# A few streets around Trafalgar Square
+LONDON_VIEWPORT = {'north': 51.52, 'south': 51.49, 'east': -0.10, 'west': -0.15}
+
+
+@patch('lambda_functions.push_connections.app.push_subscriptions_table')
+class TestPushConnections(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_batch = MagicMock()
+
+    def test_connect_subscribes_to_consumer_updates(self, mock_push_subscriptions_table):
+        mock_push_subscriptions_table.batch_writer.return_value.__enter__.return_value = self.mock_batch
+
+        response = lambda_handler(build_route_event('$connect', query_string_parameters={'consumerId': 'consumer-1'}), None)
+
+        self.assertEqual(response['statusCode'], 200)
+        item = self.mock_batch.put_item.call_args[1]['Item']
+        self.assertEqual((item['topic'], item['connectionId']), ('consumer#consumer-1', 'connection-1'))
+        self.assertIn('expiresAt', item)
+
+    def test_connect_without_consumer_is_refused(self, mock_push_subscriptions_table):
+        response = lambda_handler(build_route_event('$connect'), None)
+
+        self.assertEqual(response['statusCode'], 400)
+        mock_push_subscriptions_table.batch_writer.assert_not_called()
+
+    def test_subscribe_viewport_replaces_cells(self, mock_push_subscriptions_table):
+        mock_push_subscriptions_table.batch_writer.return_value.__enter__.return_value = self.mock_batch
+        cells = geohash_cells_in_viewport(LONDON_VIEWPORT)
+        kept_cell = sorted(cells)[0]
+        mock_push_subscriptions_table.query.return_value = {'Items': [
+            {'topic': 'consumer#consumer-1', 'connectionId': 'connection-1'},
+            {'topic': f'geohash#{kept_cell}', 'connectionId': 'connection-1'},
+            {'topic': 'geohash#u09tv', 'connectionId': 'connection-1'}
+        ]}
+
+        response = lambda_handler(build_route_event('subscribeViewport', body={'action': 'subscribeViewport', 'viewport': LONDON_VIEWPORT}), None)
+
+        self.assertEqual(response['statusCode'], 200)
+        # The old Paris cell goes, the consumer subscription and cells still in view stay
+        deleted = [call[1]['Key']['topic'] for call in self.mock_batch.delete_item.call_args_list]
+        self.assertEqual(deleted, ['geohash#u09tv'])
+        added = {call[1]['Item']['topic'] for call in self.mock_batch.put_item.call_args_list}
+        self.assertEqual(added, {f'geohash#{cell}' for cell in cells} - {f'geohash#{kept_cell}'})
+
+    def test_subscribe_viewport_rejects_invalid_viewport(self, mock_push_subscriptions_table):
+        response = lambda_handler(build_route_event('subscribeViewport', body={'action': 'subscribeViewport', 'viewport': {'north': 'up'}}), None)
+
+        self.assertEqual(response['statusCode'], 400)
+        mock_push_subscriptions_table.batch_writer.assert_not_called()
+
+    def test_disconnect_removes_subscriptions(self, mock_push_subscriptions_table):
+        mock_push_subscriptions_table.batch_writer.return_value.__enter__.return_value = self.mock_batch
+        mock_push_subscriptions_table.query.return_value = {'Items': [
+            {'topic': 'consumer#consumer-1', 'connectionId': 'connection-1'},
+            {'topic': 'geohash#gcpvj', 'connectionId': 'connection-1'}
+        ]}
+
+        response = lambda_handler(build_route_event('$disconnect'), None)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(mock_push_subscriptions_table.query.call_args[1]['IndexName'], 'connectionId-Index')
+        self.assertEqual(self.mock_batch.delete_item.call_count, 2)
+
+
+class TestViewportCells(unittest.TestCase):
+
+    def test_geohash_cells_in_viewport_covers_corners(self):
+        cells = geohash_cells_in_viewport(LONDON_VIEWPORT)
+
+        self.assertTrue(all(len(cell) == 5 for cell in cells))
+        for latitude in (51.49, 51.52):
+            for longitude in (-0.15, -0.10):
+                self.assertIn(encode_geohash(latitude, longitude), cells)
+
+    def test_geohash_cells_in_viewport_uses_coarser_cells_for_large_viewports(self):
+        cells = geohash_cells_in_viewport({'north': 51.9, 'south': 51.2, 'east': 0.3, 'west': -0.6})
+
+        self.assertTrue(all(len(cell) == 4 for cell in cells))
+        self.assertIn(encode_geohash(51.5074, -0.1278, 4), cells)
+
+    def test_geohash_cells_in_viewport_rejects_huge_viewports(self):
+        with self.assertRaises(ValueError):
+            geohash_cells_in_viewport({'north': 60, 'south': 40, 'east': 20, 'west': -20})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import patch
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+from lambda_functions.reconcile_stripe_events.app import lambda_handler
+
+serializer = TypeSerializer()
+
+def build_stream_record(sequence_number, event_id, payment_intent_id, payment_status, created):
+    stripe_event = {
+        'eventId': event_id,
+        'paymentIntentId': payment_intent_id,
+        'paymentStatus': payment_status,
+        'created': created
+    }
+    return {
+        'eventName': 'INSERT',
+        'dynamodb': {
+            'SequenceNumber': sequence_number,
+            'NewImage': {key: serializer.serialize(value) for key, value in stripe_event.items()}
+        }
+    }
+
+
+class TestReconcileStripeEvents(unittest.TestCase):
+
+    @patch('lambda_functions.reconcile_stripe_events.app.transactions_table')
+    def test_lambda_handler_applies_newest_event_per_payment(self, mock_transactions_table):
+        response = lambda_handler({'Records': [
+            build_stream_record('1', 'evt_2', 'pi_1', 'Disputed', 200),
+            build_stream_record('2', 'evt_1', 'pi_1', 'Succeeded', 100),
+            build_stream_record('3', 'evt_3', 'pi_2', 'Refunded', 150)
+        ]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+        self.assertEqual(mock_transactions_table.update_item.call_count, 2)
+        first_update = mock_transactions_table.update_item.call_args_list[0][1]
+        self.assertEqual(first_update['Key'], {'transactionId': 'pi_1'})
+        self.assertEqual(first_update['ExpressionAttributeValues'][':payment_status'], 'Disputed')
+        self.assertIn('paymentStatusEventCreated <= :created', first_update['ConditionExpression'])
+        # Only a Succeeded event may create the transaction
+        self.assertTrue(first_update['ConditionExpression'].startswith('attribute_exists(transactionId)'))
+
+    @patch('lambda_functions.reconcile_stripe_events.app.transactions_table')
+    def test_lambda_handler_creates_transaction_only_for_succeeded_payments(self, mock_transactions_table):
+        lambda_handler({'Records': [
+            build_stream_record('1', 'evt_1', 'pi_1', 'Succeeded', 100),
+            build_stream_record('2', 'evt_2', 'pi_2', 'Failed', 100)
+        ]}, None)
+
+        conditions = [call[1]['ConditionExpression'] for call in mock_transactions_table.update_item.call_args_list]
+        self.assertNotIn('attribute_exists(transactionId)', conditions[0])
+        self.assertIn('attribute_exists(transactionId)', conditions[1])
+
+    @patch('lambda_functions.reconcile_stripe_events.app.transactions_table')
+    def test_lambda_handler_ignores_stale_events_and_reports_failures(self, mock_transactions_table):
+        mock_transactions_table.update_item.side_effect = [
+            ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}, 'UpdateItem'),
+            ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'Throttled'}}, 'UpdateItem')
+        ]
+
+        response = lambda_handler({'Records': [
+            build_stream_record('1', 'evt_1', 'pi_1', 'Succeeded', 100),
+            build_stream_record('2', 'evt_2', 'pi_2', 'Refunded', 150),
+            build_stream_record('3', 'evt_3', 'pi_2', 'PartiallyRefunded', 120)
+        ]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': [{'itemIdentifier': '2'}, {'itemIdentifier': '3'}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from unittest.mock import patch
+from botocore.exceptions import ClientError
+from lambda_functions.release_expired_bookings.app import lambda_handler, release_booking
+
+
+def conditional_check_failed():
+    return ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}, 'UpdateItem')
+
+def build_booking(booking_id, release_at):
+    return {
+        'bookingId': booking_id,
+        'consumerId': 'consumer-123',
+        'oocpChargePointId': 'point-1',
+        'timestamp': '2025-01-06T09:00:00',
+        'releaseStatus': 'Pending',
+        'releaseAt': release_at
+    }
+
+
+class TestReleaseExpiredBookings(unittest.TestCase):
+
+    @patch('lambda_functions.release_expired_bookings.app.time.time')
+    @patch('lambda_functions.release_expired_bookings.app.charging_points_table')
+    @patch('lambda_functions.release_expired_bookings.app.bookings_table')
+    def test_lambda_handler_releases_due_bookings(self, mock_bookings_table, mock_charging_points_table, mock_time):
+        mock_time.return_value = 1000
+        mock_bookings_table.query.return_value = {
+            'Items': [build_booking('booking-1', 940), build_booking('booking-2', 990)]
+        }
+
+        summary = lambda_handler({}, None)
+
+        self.assertEqual(summary['released'], 2)
+        self.assertEqual(summary['maxReleaseLagSeconds'], 60)
+        query_kwargs = mock_bookings_table.query.call_args[1]
+        self.assertEqual(query_kwargs['IndexName'], 'releaseStatus-releaseAt-Index')
+        self.assertEqual(mock_charging_points_table.update_item.call_count, 2)
+
+        mark_released_kwargs = mock_bookings_table.update_item.call_args[1]
+        self.assertIn('REMOVE releaseStatus', mark_released_kwargs['UpdateExpression'])
+
+    @patch('lambda_functions.release_expired_bookings.app.charging_points_table')
+    @patch('lambda_functions.release_expired_bookings.app.bookings_table')
+    def test_release_booking_keeps_newer_hold(self, mock_bookings_table, mock_charging_points_table):
+        mock_charging_points_table.update_item.side_effect = conditional_check_failed()
+
+        lag_seconds = release_booking(build_booking('booking-1', 940), 1000)
+
+        # The charger was re-booked, so only the booking is marked as released
+        self.assertEqual(lag_seconds, 60)
+        mock_bookings_table.update_item.assert_called_once()
+
+    @patch('lambda_functions.release_expired_bookings.app.charging_points_table')
+    @patch('lambda_functions.release_expired_bookings.app.bookings_table')
+    def test_release_booking_retries_on_error(self, mock_bookings_table, mock_charging_points_table):
+        mock_charging_points_table.update_item.side_effect = ClientError(
+            {'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'Throttled'}}, 'UpdateItem'
+        )
+
+        self.assertIsNone(release_booking(build_booking('booking-1', 940), 1000))
+        mock_bookings_table.update_item.assert_not_called()
+
+    @patch('lambda_functions.release_expired_bookings.app.bookings_table')
+    def test_lambda_handler_nothing_due(self, mock_bookings_table):
+        mock_bookings_table.query.return_value = {'Items': []}
+
+        summary = lambda_handler({}, None)
+
+        self.assertEqual(summary['released'], 0)
+        mock_bookings_table.update_item.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
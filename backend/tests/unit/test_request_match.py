@@ -1,26 +1,34 @@
 import unittest
-from unittest.mock import patch, MagicMock, ANY
+from unittest.mock import patch
 import json
-import os
-from lambda_functions.request_match.app import lambda_handler, get_ssm_parameter
+from botocore.exceptions import ClientError
+from lambda_functions.request_match.app import lambda_handler, bulk_lambda_handler
+
+def build_match_request_event(meeting_start_time='2025-01-01T10:00:00Z', meeting_end_time='2025-01-01T11:00:00Z'):
+    return {
+        'httpMethod': 'POST',
+        'body': json.dumps({
+            'senderConsumerId': '123',
+            'recipientConsumerId': '456',
+            'meetingStartTime': meeting_start_time,
+            'meetingEndTime': meeting_end_time,
+            'matchEventType': 'Business'
+        })
+    }
 
 class TestMatchRequestLambdaFunction(unittest.TestCase):
+
+    def setUp(self):
+        users_table_patcher = patch('lambda_functions.request_match.app.users_table')
+        self.mock_users_table = users_table_patcher.start()
+        self.addCleanup(users_table_patcher.stop)
+        # Every recipient is a registered user unless a test says otherwise
+        self.mock_users_table.query.return_value = {'Count': 1}
     
     @patch('lambda_functions.request_match.app.match_requests_table')
-    @patch('lambda_functions.request_match.app.users_table')
-    @patch('lambda_functions.request_match.app.ses_client')
-    @patch('lambda_functions.request_match.app.ssm_client')
-    def test_lambda_handler_success(self, mock_ssm_client, mock_ses_client, mock_users_table, mock_match_requests_table):
-        mock_email_domain = 'mock-email-domain'
-        mock_recipient_email = f'recipient@{mock_email_domain}.com'
-        mock_ses_email = f'no-reply@{mock_email_domain}.com'
-        
-        mock_users_table.query.return_value = {
-            'Items': [{'email': mock_recipient_email}]
-        }
-
-        mock_ssm_client.get_parameter.return_value = {'Parameter': {'Value': mock_ses_email}}
-
+    @patch('lambda_functions.request_match.app.dynamodb')
+    def test_lambda_handler_success(self, mock_dynamodb, mock_match_requests_table):
+        mock_match_requests_table.query.return_value = {'Items': []}
         # Define the input event
         event = {
             'httpMethod': 'POST',
@@ -40,27 +48,130 @@ class TestMatchRequestLambdaFunction(unittest.TestCase):
         response_body = json.loads(response['body'])
         self.assertEqual(response_body['message'], 'Match request sent successfully')
 
-        mock_match_requests_table.put_item.assert_called_once()
+        # The match request and its notification are written together
+        mock_dynamodb.meta.client.transact_write_items.assert_called_once()
+        match_request_put, notification_put, unread_counter_update = mock_dynamodb.meta.client.transact_write_items.call_args[1]['TransactItems']
+        self.assertEqual(match_request_put['Put']['Item']['requestId'], response_body['requestId'])
+        self.assertEqual(match_request_put['Put']['Item']['matchStatus'], 'Pending')
+        # The request expires when the meeting ends; only expiring it schedules its deletion
+        self.assertEqual(match_request_put['Put']['Item']['expiryStatus'], 'Pending')
+        self.assertEqual(match_request_put['Put']['Item']['meetingEndAt'], 1735729200)
+        self.assertNotIn('expiresAt', match_request_put['Put']['Item'])
+        notification = notification_put['Put']['Item']
+        self.assertEqual(notification['notificationId'], f"match-request#{response_body['requestId']}")
+        self.assertEqual(notification['notificationType'], 'MatchRequest')
+        self.assertEqual(notification['notificationStatus'], 'Pending')
+        self.assertEqual(notification['recipientConsumerId'], '456')
+        self.assertEqual(notification['senderConsumerId'], '123')
+        self.assertEqual(unread_counter_update['Update']['Key'], {'consumerId': '456'})
+        self.assertEqual(unread_counter_update['Update']['UpdateExpression'], 'ADD unreadMatchRequests :one')
 
-        mock_users_table.query.assert_called_once_with(
-            IndexName='consumerIdEmailIndex',
-            KeyConditionExpression=ANY
+    @patch('lambda_functions.request_match.app.match_requests_table')
+    @patch('lambda_functions.request_match.app.dynamodb')
+    def test_lambda_handler_write_failure(self, mock_dynamodb, mock_match_requests_table):
+        mock_match_requests_table.query.return_value = {'Items': []}
+        mock_dynamodb.meta.client.transact_write_items.side_effect = ClientError(
+            {'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'}}, 'TransactWriteItems'
         )
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({
+                'senderConsumerId': '123',
+                'recipientConsumerId': '456',
+                'meetingStartTime': '2025-01-01T10:00:00Z',
+                'meetingEndTime': '2025-01-01T11:00:00Z'
+            })
+        }
+
+        response = lambda_handler(event, None)
 
-        mock_ses_client.send_email.assert_called_once_with(
-            Source=mock_ses_email,
-            Destination={'ToAddresses': [mock_recipient_email]},
-            Message={
-                'Subject': {'Data': ANY},
-                'Body': {'Text': {'Data': ANY}}
+        self.assertEqual(response['statusCode'], 500)
+
+    @patch('lambda_functions.request_match.app.match_requests_table')
+    @patch('lambda_functions.request_match.app.dynamodb')
+    def test_lambda_handler_rejects_overlap_with_accepted_match(self, mock_dynamodb, mock_match_requests_table):
+        mock_match_requests_table.query.side_effect = lambda **kwargs: {'Items': [{
+            'requestId': 'accepted-request',
+            'senderConsumerId': '789',
+            'recipientConsumerId': '456',
+            'matchStatus': 'Accepted',
+            # Same instant as 10:30Z, written with another offset
+            'startTime#endTime': '2025-01-01T11:30:00+01:00#2025-01-01T12:30:00+01:00'
+        }] if kwargs['IndexName'].startswith('recipient') else []}
+
+        response = lambda_handler(build_match_request_event(), None)
+
+        self.assertEqual(response['statusCode'], 409)
+        self.assertEqual(json.loads(response['body'])['conflictingRequestId'], 'accepted-request')
+        mock_dynamodb.meta.client.transact_write_items.assert_not_called()
+        key_condition = mock_match_requests_table.query.call_args[1]['KeyConditionExpression']
+        self.assertEqual(key_condition.get_expression()['values'][1].get_expression()['values'][1:], ('2024-12-30', '2025-01-03'))
+
+    @patch('lambda_functions.request_match.app.match_requests_table')
+    @patch('lambda_functions.request_match.app.dynamodb')
+    def test_lambda_handler_rejects_duplicate_pending_request(self, mock_dynamodb, mock_match_requests_table):
+        mock_match_requests_table.query.side_effect = lambda **kwargs: {'Items': [{
+            'requestId': 'pending-request',
+            'senderConsumerId': '123',
+            'recipientConsumerId': '456',
+            'matchStatus': 'Pending',
+            'startTime#endTime': '2025-01-01T10:00:00Z#2025-01-01T11:00:00Z'
+        }]}
+
+        response = lambda_handler(build_match_request_event(), None)
+
+        self.assertEqual(response['statusCode'], 409)
+        self.assertEqual(json.loads(response['body'])['error'], 'A pending match request already covers this meeting')
+        mock_dynamodb.meta.client.transact_write_items.assert_not_called()
+
+    @patch('lambda_functions.request_match.app.match_requests_table')
+    @patch('lambda_functions.request_match.app.dynamodb')
+    def test_lambda_handler_allows_adjacent_and_unrelated_pending_matches(self, mock_dynamodb, mock_match_requests_table):
+        mock_match_requests_table.query.side_effect = lambda **kwargs: {'Items': [
+            {
+                'requestId': 'adjacent-accepted',
+                'senderConsumerId': '456',
+                'recipientConsumerId': '789',
+                'matchStatus': 'Accepted',
+                'startTime#endTime': '2025-01-01T11:00:00Z#2025-01-01T12:00:00Z'
+            },
+            {
+                'requestId': 'other-pending',
+                'senderConsumerId': '789',
+                'recipientConsumerId': '456',
+                'matchStatus': 'Pending',
+                'startTime#endTime': '2025-01-01T10:00:00Z#2025-01-01T11:00:00Z'
             }
-        )
+        ]}
+
+        response = lambda_handler(build_match_request_event(), None)
+
+        self.assertEqual(response['statusCode'], 200)
+        mock_dynamodb.meta.client.transact_write_items.assert_called_once()
 
     @patch('lambda_functions.request_match.app.match_requests_table')
-    @patch('lambda_functions.request_match.app.users_table')
-    @patch('lambda_functions.request_match.app.ses_client')
-    @patch('lambda_functions.request_match.app.ssm_client')
-    def test_lambda_handler_missing_fields(self, mock_ssm_client, mock_ses_client, mock_users_table, mock_match_requests_table):
+    @patch('lambda_functions.request_match.app.dynamodb')
+    def test_lambda_handler_unknown_recipient(self, mock_dynamodb, mock_match_requests_table):
+        mock_match_requests_table.query.return_value = {'Items': []}
+        self.mock_users_table.query.return_value = {'Count': 0}
+
+        response = lambda_handler(build_match_request_event(), None)
+
+        self.assertEqual(response['statusCode'], 404)
+        self.assertEqual(json.loads(response['body'])['error'], 'Recipient user not found')
+        self.assertEqual(self.mock_users_table.query.call_args[1]['IndexName'], 'consumerIdEmailIndex')
+        mock_dynamodb.meta.client.transact_write_items.assert_not_called()
+
+    def test_lambda_handler_rejects_invalid_meeting_window(self):
+        event = build_match_request_event(meeting_start_time='2025-01-01T11:00:00Z', meeting_end_time='2025-01-01T10:00:00Z')
+
+        response = lambda_handler(event, None)
+
+        self.assertEqual(response['statusCode'], 400)
+        self.assertEqual(json.loads(response['body'])['error'], 'meetingEndTime must be after meetingStartTime')
+
+    @patch('lambda_functions.request_match.app.dynamodb')
+    def test_lambda_handler_missing_fields(self, mock_dynamodb):
         event = {
             'httpMethod': 'POST',
             'body': json.dumps({
@@ -77,28 +188,7 @@ class TestMatchRequestLambdaFunction(unittest.TestCase):
         response_body = json.loads(response['body'])
         self.assertIn('error', response_body)
         self.assertEqual(response_body['error'], 'Missing required fields in request body')
-
-    @patch('lambda_functions.request_match.app.ssm_client')
-    def test_get_ssm_parameter(self, mock_ssm_client):
-
-        mock_param_key = 'mock-param-key'
-        mock_param_value = 'mock-param-value'
-    
-        mock_ssm_client.get_parameter.return_value = {
-            'Parameter': {
-                'Name': mock_param_key, 
-                'Value': mock_param_value
-            }
-        }
-        
-        
-        result = get_ssm_parameter(mock_param_key)
-        
-        # Assertions
-        self.assertEqual(result, mock_param_value)
-        mock_ssm_client.get_parameter.assert_called_once_with(
-            Name=mock_param_key, WithDecryption=True
-        )
+        mock_dynamodb.meta.client.transact_write_items.assert_not_called()
 
     def test_lambda_handler_options_method(self):
         event = {
@@ -111,5 +201,96 @@ class TestMatchRequestLambdaFunction(unittest.TestCase):
         self.assertEqual(response['statusCode'], 200)
         self.assertIn('Access-Control-Allow-Origin', response['headers'])
 
+def build_bulk_match_request_event(recipient_consumer_ids):
+    return {
+        'httpMethod': 'POST',
+        'body': json.dumps({
+            'senderConsumerId': '123',
+            'recipientConsumerIds': recipient_consumer_ids,
+            'meetingStartTime': '2025-01-01T10:00:00Z',
+            'meetingEndTime': '2025-01-01T11:00:00Z',
+            'matchEventType': 'Meetup'
+        })
+    }
+
+class TestBulkMatchRequestLambdaFunction(unittest.TestCase):
+
+    def setUp(self):
+        users_table_patcher = patch('lambda_functions.request_match.app.users_table')
+        self.mock_users_table = users_table_patcher.start()
+        self.addCleanup(users_table_patcher.stop)
+        # Every recipient is a registered user unless a test says otherwise
+        self.mock_users_table.query.return_value = {'Count': 1}
+
+    @patch('lambda_functions.request_match.app.match_requests_table')
+    @patch('lambda_functions.request_match.app.dynamodb')
+    def test_bulk_lambda_handler_success(self, mock_dynamodb, mock_match_requests_table):
+        # r5 already has an accepted match at that time
+        mock_match_requests_table.query.side_effect = lambda **kwargs: {'Items': [{
+            'requestId': 'accepted-request',
+            'senderConsumerId': 'r5',
+            'recipientConsumerId': '789',
+            'matchStatus': 'Accepted',
+            'startTime#endTime': '2025-01-01T10:30:00Z#2025-01-01T11:30:00Z'
+        }] if kwargs['KeyConditionExpression'].get_expression()['values'][0].get_expression()['values'][1] == 'r5' else []}
+
+        # A failed transaction only fails the recipients written in it
+        def transact_write_items(TransactItems):
+            if any(item.get('Update', {}).get('Key') == {'consumerId': 'r40'} for item in TransactItems):
+                raise ClientError({'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'}}, 'TransactWriteItems')
+        mock_dynamodb.meta.client.transact_write_items.side_effect = transact_write_items
+        # r7 is not a registered user
+        self.mock_users_table.query.side_effect = lambda **kwargs: {
+            'Count': 0 if kwargs['KeyConditionExpression'].get_expression()['values'][1] == 'r7' else 1
+        }
+
+        recipient_consumer_ids = [f'r{index}' for index in range(68)] + ['123', 'r0']
+        response = bulk_lambda_handler(build_bulk_match_request_event(recipient_consumer_ids), None)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        statuses = [result['status'] for result in body['results']]
+        self.assertEqual(statuses[5], 'conflict')
+        self.assertEqual(body['results'][5]['conflictingRequestId'], 'accepted-request')
+        self.assertEqual(statuses[7], 'not_found')
+        self.assertEqual(statuses[68:], ['rejected', 'rejected'])
+        self.assertEqual(statuses[40], 'failed')
+        self.assertEqual(statuses.count('requested'), body['requestedCount'])
+        self.assertEqual(body['requestedCount'], 66 - 33)
+        # Each distinct recipient is looked up once
+        self.assertEqual(self.mock_users_table.query.call_count, 68)
+        self.assertEqual(body['results'][0]['recipientConsumerId'], 'r0')
+        self.assertIn('requestId', body['results'][0])
+
+        # 66 requests of three items each, in transactions of at most 33 requests
+        transactions = [call[1]['TransactItems'] for call in mock_dynamodb.meta.client.transact_write_items.call_args_list]
+        self.assertEqual(sorted(len(transact_items) for transact_items in transactions), [99, 99])
+        # The sender's schedule is read once, not once per recipient
+        queried_consumers = [call[1]['KeyConditionExpression'].get_expression()['values'][0].get_expression()['values'][1] for call in mock_match_requests_table.query.call_args_list]
+        self.assertEqual(queried_consumers.count('123'), 2)
+
+    @patch('lambda_functions.request_match.app.dynamodb')
+    def test_bulk_lambda_handler_too_many_recipients(self, mock_dynamodb):
+        response = bulk_lambda_handler(build_bulk_match_request_event([f'r{index}' for index in range(101)]), None)
+
+        self.assertEqual(response['statusCode'], 400)
+        mock_dynamodb.meta.client.transact_write_items.assert_not_called()
+
+    @patch('lambda_functions.request_match.app.dynamodb')
+    def test_bulk_lambda_handler_rejects_recipients_that_are_not_a_list(self, mock_dynamodb):
+        response = bulk_lambda_handler(build_bulk_match_request_event('r1,r2'), None)
+
+        self.assertEqual(response['statusCode'], 400)
+        self.assertEqual(json.loads(response['body'])['error'], 'recipientConsumerIds must be a list')
+        mock_dynamodb.meta.client.transact_write_items.assert_not_called()
+
+    @patch('lambda_functions.request_match.app.dynamodb')
+    def test_bulk_lambda_handler_missing_fields(self, mock_dynamodb):
+        response = bulk_lambda_handler(build_bulk_match_request_event([]), None)
+
+        self.assertEqual(response['statusCode'], 400)
+        self.assertEqual(json.loads(response['body'])['error'], 'Missing required fields in request body')
+
+
 if __name__ == '__main__':
     unittest.main()
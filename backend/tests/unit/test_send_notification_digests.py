@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import patch
+import json
+from botocore.exceptions import ClientError
+from lambda_functions.send_notification_digests.app import lambda_handler, build_digest_data
+
+def build_notification(notification_id, recipient_consumer_id, created_at, attempts=None):
+    notification = {
+        'notificationId': notification_id,
+        'notificationType': 'MatchRequest',
+        'notificationStatus': 'Pending',
+        'recipientConsumerId': recipient_consumer_id,
+        'senderConsumerId': 'sender-1',
+        'matchEventType': 'Business',
+        'meetingStartTime': '2025-01-01T10:00:00Z',
+        'meetingEndTime': '2025-01-01T11:00:00Z',
+        'createdAt': created_at
+    }
+    if attempts is not None:
+        notification['attempts'] = attempts
+    return notification
+
+def get_status_updates(mock_outbox_table):
+    return {
+        call[1]['Key']['notificationId']: call[1]['ExpressionAttributeValues'].get(':status')
+        for call in mock_outbox_table.update_item.call_args_list
+    }
+
+
+@patch('lambda_functions.send_notification_digests.app.NOTIFICATION_DELIVERY_MODE', 'digest')
+@patch('lambda_functions.send_notification_digests.app.time.sleep')
+@patch('lambda_functions.send_notification_digests.app.get_ssm_parameter', return_value='no-reply@example.com')
+@patch('lambda_functions.send_notification_digests.app.ses_client')
+@patch('lambda_functions.send_notification_digests.app.users_table')
+@patch('lambda_functions.send_notification_digests.app.notification_counters_table')
+@patch('lambda_functions.send_notification_digests.app.notification_outbox_table')
+class TestSendNotificationDigests(unittest.TestCase):
+
+    def test_lambda_handler_sends_one_digest_per_recipient(self, mock_outbox_table, mock_counters_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_sleep):
+        mock_outbox_table.query.return_value = {'Items': [
+            build_notification('match-request#1', 'recipient-1', '2025-01-01T09:00:00'),
+            build_notification('match-request#2', 'recipient-2', '2025-01-01T09:01:00'),
+            build_notification('match-request#3', 'recipient-1', '2025-01-01T09:02:00')
+        ]}
+        mock_users_table.query.side_effect = [
+            {'Items': [{'email': 'one@example.com'}]},
+            {'Items': [{'email': 'two@example.com'}]}
+        ]
+        mock_ses_client.send_bulk_templated_email.return_value = {'Status': [{'Status': 'Success'}, {'Status': 'Success'}]}
+
+        response = lambda_handler({}, None)
+
+        self.assertEqual(response, {'recipients': 2, 'notifications': 3})
+        mock_ses_client.send_bulk_templated_email.assert_called_once()
+        destinations = mock_ses_client.send_bulk_templated_email.call_args[1]['Destinations']
+        self.assertEqual(destinations[0]['Destination'], {'ToAddresses': ['one@example.com']})
+        self.assertEqual(json.loads(destinations[0]['ReplacementTemplateData'])['notificationCount'], 2)
+        self.assertEqual(set(get_status_updates(mock_outbox_table).values()), {'Sent'})
+        counter_updates = {call[1]['Key']['consumerId']: call[1]['ExpressionAttributeValues'][':notification_count'] for call in mock_counters_table.update_item.call_args_list}
+        self.assertEqual(counter_updates, {'recipient-1': 2, 'recipient-2': 1})
+
+    def test_lambda_handler_keeps_failed_digests_pending(self, mock_outbox_table, mock_counters_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_sleep):
+        mock_outbox_table.query.return_value = {'Items': [
+            build_notification('match-request#1', 'recipient-1', '2025-01-01T09:00:00'),
+            build_notification('match-request#2', 'recipient-2', '2025-01-01T09:01:00', attempts=4)
+        ]}
+        mock_users_table.query.return_value = {'Items': [{'email': 'someone@example.com'}]}
+        mock_ses_client.send_bulk_templated_email.side_effect = ClientError(
+            {'Error': {'Code': 'Throttling', 'Message': 'Maximum sending rate exceeded.'}}, 'SendBulkTemplatedEmail'
+        )
+
+        response = lambda_handler({}, None)
+
+        self.assertEqual(response, {'recipients': 0, 'notifications': 0})
+        status_updates = get_status_updates(mock_outbox_table)
+        # Retried in the next digest until the attempts run out
+        self.assertIsNone(status_updates['match-request#1'])
+        self.assertEqual(status_updates['match-request#2'], 'Failed')
+        mock_counters_table.update_item.assert_not_called()
+
+    def test_lambda_handler_fails_notifications_for_unknown_recipient(self, mock_outbox_table, mock_counters_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_sleep):
+        mock_outbox_table.query.return_value = {'Items': [build_notification('match-request#1', 'recipient-1', '2025-01-01T09:00:00')]}
+        mock_users_table.query.return_value = {'Items': []}
+
+        lambda_handler({}, None)
+
+        mock_ses_client.send_bulk_templated_email.assert_not_called()
+        self.assertEqual(get_status_updates(mock_outbox_table), {'match-request#1': 'Failed'})
+
+
+class TestDigestContent(unittest.TestCase):
+
+    @patch('lambda_functions.send_notification_digests.app.NOTIFICATION_DELIVERY_MODE', 'immediate')
+    @patch('lambda_functions.send_notification_digests.app.notification_outbox_table')
+    def test_lambda_handler_does_nothing_in_immediate_mode(self, mock_outbox_table):
+        response = lambda_handler({}, None)
+
+        self.assertEqual(response, {'recipients': 0, 'notifications': 0})
+        mock_outbox_table.query.assert_not_called()
+
+    def test_build_digest_data_orders_notifications(self):
+        digest_data = build_digest_data([
+            {'notificationType': 'MatchResponse', 'responderConsumerId': 'user-2', 'createdAt': '2025-01-01T09:05:00'},
+            build_notification('match-request#1', 'recipient-1', '2025-01-01T09:00:00')
+        ])
+
+        self.assertEqual(digest_data['notificationCount'], 2)
+        self.assertIn('sender-1', digest_data['notifications'][0])
+        self.assertIn('user-2', digest_data['notifications'][1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,226 @@
+import unittest
+from unittest.mock import patch
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+import lambda_functions.send_notifications.app as send_notifications_app
+from lambda_functions.send_notifications.app import lambda_handler, render_notification, get_ssm_parameter, get_user_email
+
+serializer = TypeSerializer()
+
+def clear_caches():
+    send_notifications_app.user_email_cache.clear()
+    send_notifications_app.ssm_parameter_cache.clear()
+
+def build_stream_record(sequence_number, notification_id, notification_type='MatchRequest'):
+    notification = {
+        'notificationId': notification_id,
+        'notificationType': notification_type,
+        'notificationStatus': 'Pending',
+        'recipientConsumerId': 'recipient-1',
+        'senderConsumerId': 'sender-1',
+        'matchEventType': 'Coffee & Chat',
+        'meetingStartTime': '2025-01-01T10:00:00Z',
+        'meetingEndTime': '2025-01-01T11:00:00Z'
+    }
+    return {
+        'eventName': 'INSERT',
+        'dynamodb': {
+            'SequenceNumber': sequence_number,
+            'NewImage': {key: serializer.serialize(value) for key, value in notification.items()}
+        }
+    }
+
+def build_client_error(code, operation_name):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, operation_name)
+
+
+@patch('lambda_functions.send_notifications.app.wait_for_send_slot')
+@patch('lambda_functions.send_notifications.app.get_ssm_parameter', return_value='no-reply@example.com')
+@patch('lambda_functions.send_notifications.app.ses_client')
+@patch('lambda_functions.send_notifications.app.users_table')
+@patch('lambda_functions.send_notifications.app.notification_outbox_table')
+@patch('lambda_functions.send_notifications.app.notification_counters_table')
+class TestSendNotifications(unittest.TestCase):
+
+    def setUp(self):
+        clear_caches()
+
+    def test_lambda_handler_sends_and_marks_notifications(self, mock_counters_table, mock_outbox_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_wait_for_send_slot):
+        mock_outbox_table.update_item.return_value = {'Attributes': {'attempts': 1}}
+        mock_users_table.query.return_value = {'Items': [{'email': 'recipient@example.com'}]}
+
+        response = lambda_handler({'Records': [
+            build_stream_record('1', 'match-request#1'),
+            build_stream_record('2', 'match-request#2')
+        ]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+        self.assertEqual(mock_ses_client.send_email.call_count, 2)
+        self.assertEqual(mock_wait_for_send_slot.call_count, 2)
+        send_kwargs = mock_ses_client.send_email.call_args[1]
+        self.assertEqual(send_kwargs['Source'], 'no-reply@example.com')
+        self.assertEqual(send_kwargs['Destination'], {'ToAddresses': ['recipient@example.com']})
+        self.assertIn('sender-1', send_kwargs['Message']['Body']['Text']['Data'])
+        mark_sent = mock_outbox_table.update_item.call_args_list[1][1]
+        self.assertEqual(mark_sent['ExpressionAttributeValues'][':status'], 'Sent')
+        self.assertEqual(mock_counters_table.update_item.call_count, 2)
+        self.assertEqual(mock_counters_table.update_item.call_args[1]['Key'], {'consumerId': 'recipient-1'})
+        # The second notification to the same recipient reuses the cached email
+        mock_users_table.query.assert_called_once()
+
+    def test_lambda_handler_drops_cached_email_when_it_changes(self, mock_counters_table, mock_outbox_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_wait_for_send_slot):
+        mock_outbox_table.update_item.return_value = {'Attributes': {'attempts': 1}}
+        mock_users_table.query.side_effect = [
+            {'Items': [{'email': 'old@example.com'}]},
+            {'Items': [{'email': 'new@example.com'}]}
+        ]
+
+        lambda_handler({'Records': [
+            build_stream_record('1', 'match-request#1'),
+            build_stream_record('2', 'email-changed#recipient-1', notification_type='UserEmailChanged'),
+            build_stream_record('3', 'match-request#2')
+        ]}, None)
+
+        recipients = [call[1]['Destination']['ToAddresses'] for call in mock_ses_client.send_email.call_args_list]
+        self.assertEqual(recipients, [['old@example.com'], ['new@example.com']])
+
+    @patch('lambda_functions.send_notifications.app.NOTIFICATION_DELIVERY_MODE', 'digest')
+    def test_lambda_handler_leaves_notifications_for_digest(self, mock_counters_table, mock_outbox_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_wait_for_send_slot):
+        response = lambda_handler({'Records': [build_stream_record('1', 'match-request#1')]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+        mock_outbox_table.update_item.assert_not_called()
+        mock_ses_client.send_email.assert_not_called()
+
+    def test_lambda_handler_skips_notifications_no_longer_pending(self, mock_counters_table, mock_outbox_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_wait_for_send_slot):
+        mock_outbox_table.update_item.side_effect = build_client_error('ConditionalCheckFailedException', 'UpdateItem')
+
+        response = lambda_handler({'Records': [build_stream_record('1', 'match-request#1')]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+        mock_ses_client.send_email.assert_not_called()
+
+    def test_lambda_handler_stops_batch_when_throttled(self, mock_counters_table, mock_outbox_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_wait_for_send_slot):
+        mock_outbox_table.update_item.return_value = {'Attributes': {'attempts': 1}}
+        mock_users_table.query.return_value = {'Items': [{'email': 'recipient@example.com'}]}
+        mock_ses_client.send_email.side_effect = [{'MessageId': 'ses-message-1'}, build_client_error('Throttling', 'SendEmail')]
+
+        response = lambda_handler({'Records': [
+            build_stream_record('1', 'match-request#1'),
+            build_stream_record('2', 'match-request#2'),
+            build_stream_record('3', 'match-request#3')
+        ]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': [{'itemIdentifier': '2'}]})
+        self.assertEqual(mock_ses_client.send_email.call_count, 2)
+
+    def test_lambda_handler_fails_notification_that_used_up_its_attempts(self, mock_counters_table, mock_outbox_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_wait_for_send_slot):
+        claim_failed = build_client_error('ConditionalCheckFailedException', 'UpdateItem')
+        claim_failed.response['Item'] = {'notificationStatus': {'S': 'Pending'}, 'attempts': {'N': '5'}}
+        mock_outbox_table.update_item.side_effect = [claim_failed, None]
+
+        response = lambda_handler({'Records': [build_stream_record('1', 'match-request#1')]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+        mock_ses_client.send_email.assert_not_called()
+        mark_failed = mock_outbox_table.update_item.call_args_list[1][1]
+        self.assertEqual(mark_failed['ExpressionAttributeValues'][':status'], 'Failed')
+
+    def test_lambda_handler_does_not_resend_when_marking_sent_fails(self, mock_counters_table, mock_outbox_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_wait_for_send_slot):
+        mock_outbox_table.update_item.side_effect = [{'Attributes': {'attempts': 1}}, build_client_error('InternalServerError', 'UpdateItem')]
+        mock_users_table.query.return_value = {'Items': [{'email': 'recipient@example.com'}]}
+        mock_ses_client.send_email.return_value = {'MessageId': 'ses-message-1'}
+
+        response = lambda_handler({'Records': [build_stream_record('1', 'match-request#1')]}, None)
+
+        # The record is not delivered again, and the claim keeps it Sending meanwhile
+        self.assertEqual(response, {'batchItemFailures': []})
+        claim = mock_outbox_table.update_item.call_args_list[0][1]
+        self.assertEqual(claim['ExpressionAttributeValues'][':sending'], 'Sending')
+        self.assertEqual(mock_outbox_table.update_item.call_args_list[1][1]['ExpressionAttributeValues'][':ses_message_id'], 'ses-message-1')
+
+    def test_lambda_handler_releases_throttled_notification(self, mock_counters_table, mock_outbox_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_wait_for_send_slot):
+        mock_outbox_table.update_item.return_value = {'Attributes': {'attempts': 1}}
+        mock_users_table.query.return_value = {'Items': [{'email': 'recipient@example.com'}]}
+        mock_ses_client.send_email.side_effect = build_client_error('Throttling', 'SendEmail')
+
+        response = lambda_handler({'Records': [build_stream_record('1', 'match-request#1')]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': [{'itemIdentifier': '1'}]})
+        release = mock_outbox_table.update_item.call_args_list[1][1]
+        self.assertEqual(release['ExpressionAttributeValues'][':status'], 'Pending')
+
+    def test_lambda_handler_fails_notification_after_last_attempt(self, mock_counters_table, mock_outbox_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_wait_for_send_slot):
+        mock_outbox_table.update_item.return_value = {'Attributes': {'attempts': 5}}
+        mock_users_table.query.return_value = {'Items': [{'email': 'recipient@example.com'}]}
+        mock_ses_client.send_email.side_effect = build_client_error('Throttling', 'SendEmail')
+
+        response = lambda_handler({'Records': [build_stream_record('1', 'match-request#1')]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+        mark_failed = mock_outbox_table.update_item.call_args_list[1][1]
+        self.assertEqual(mark_failed['ExpressionAttributeValues'][':status'], 'Failed')
+
+    def test_lambda_handler_fails_notification_for_unknown_recipient(self, mock_counters_table, mock_outbox_table, mock_users_table, mock_ses_client, mock_get_ssm_parameter, mock_wait_for_send_slot):
+        mock_outbox_table.update_item.return_value = {'Attributes': {'attempts': 1}}
+        mock_users_table.query.return_value = {'Items': []}
+
+        response = lambda_handler({'Records': [build_stream_record('1', 'match-request#1')]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+        mock_ses_client.send_email.assert_not_called()
+        mark_failed = mock_outbox_table.update_item.call_args_list[1][1]
+        self.assertEqual(mark_failed['ExpressionAttributeValues'][':error_message'], 'Recipient user not found')
+
+
+class TestNotificationHelpers(unittest.TestCase):
+
+    def setUp(self):
+        clear_caches()
+
+    def test_render_match_response(self):
+        subject, body = render_notification({'notificationType': 'MatchResponse', 'responderConsumerId': 'mock-recipient-id'})
+
+        self.assertEqual(subject, 'Someone responded to your match request!')
+        self.assertIn('mock-recipient-id', body)
+
+    @patch.dict('os.environ', {'SES_EMAIL': ''})
+    @patch('lambda_functions.send_notifications.app.ssm_client')
+    def test_get_ssm_parameter(self, mock_ssm_client):
+        mock_ssm_client.get_parameter.return_value = {'Parameter': {'Value': 'mock-param-value'}}
+
+        result = get_ssm_parameter('mock-param-key')
+
+        self.assertEqual(result, 'mock-param-value')
+        mock_ssm_client.get_parameter.assert_called_once_with(Name='mock-param-key', WithDecryption=True)
+
+    @patch.dict('os.environ', {'SES_EMAIL': ''})
+    @patch('lambda_functions.send_notifications.app.time.monotonic')
+    @patch('lambda_functions.send_notifications.app.ssm_client')
+    def test_get_ssm_parameter_is_cached(self, mock_ssm_client, mock_monotonic):
+        mock_ssm_client.get_parameter.return_value = {'Parameter': {'Value': 'mock-param-value'}}
+        mock_monotonic.return_value = 1000
+
+        get_ssm_parameter('mock-param-key')
+        get_ssm_parameter('mock-param-key')
+        self.assertEqual(mock_ssm_client.get_parameter.call_count, 1)
+
+        mock_monotonic.return_value = 1000 + send_notifications_app.SSM_PARAMETER_CACHE_TTL_SECONDS + 1
+        get_ssm_parameter('mock-param-key')
+        self.assertEqual(mock_ssm_client.get_parameter.call_count, 2)
+
+    @patch('lambda_functions.send_notifications.app.USER_EMAIL_CACHE_MAX_ENTRIES', 2)
+    @patch('lambda_functions.send_notifications.app.users_table')
+    def test_get_user_email_evicts_least_recently_used(self, mock_users_table):
+        mock_users_table.query.side_effect = lambda **kwargs: {'Items': [{'email': 'someone@example.com'}]}
+
+        get_user_email('consumer-1')
+        get_user_email('consumer-2')
+        get_user_email('consumer-1')
+        get_user_email('consumer-3')
+
+        self.assertEqual(list(send_notifications_app.user_email_cache), ['consumer-1', 'consumer-3'])
+        self.assertEqual(mock_users_table.query.call_count, 3)
+
+if __name__ == '__main__':
+    unittest.main()
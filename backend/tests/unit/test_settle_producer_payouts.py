@@ -0,0 +1,103 @@
+import unittest
+from decimal import Decimal
+from unittest.mock import patch, MagicMock
+from botocore.exceptions import ClientError
+import stripe
+from lambda_functions.settle_producer_payouts.app import lambda_handler, claim_earnings
+
+
+def build_earning(earning_id, producer_id, amount, payout_status='Pending', payout_id=None):
+    earning = {
+        'earningId': earning_id,
+        'producerId': producer_id,
+        'amount': Decimal(amount),
+        'payoutStatus': payout_status,
+        'createdAt': '2025-01-06T09:00:00'
+    }
+    if payout_id:
+        earning['payoutId'] = payout_id
+    return earning
+
+def query_by_status(earnings):
+    def query(**kwargs):
+        payout_status = kwargs['KeyConditionExpression'].get_expression()['values'][1]
+        return {'Items': [earning for earning in earnings if earning['payoutStatus'] == payout_status]}
+    return query
+
+
+class TestSettleProducerPayouts(unittest.TestCase):
+
+    @patch('stripe.Transfer.create')
+    @patch('lambda_functions.settle_producer_payouts.app.producers_table')
+    @patch('lambda_functions.settle_producer_payouts.app.producer_earnings_table')
+    def test_lambda_handler_pays_out_one_transfer_per_producer(self, mock_producer_earnings_table, mock_producers_table, mock_transfer_create):
+        mock_producer_earnings_table.query.side_effect = query_by_status([
+            build_earning('pi_1', 'producer-1', 1000),
+            build_earning('pi_2', 'producer-1', 500),
+            build_earning('pi_3', 'producer-2', 700)
+        ])
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'acct_123'}}
+        mock_transfer_create.return_value = MagicMock(id='tr_123')
+
+        summary = lambda_handler({}, None)
+
+        self.assertEqual(summary, {'payouts': 2, 'failed': 0, 'earnings': 3, 'amount': 2200})
+        self.assertEqual(mock_transfer_create.call_count, 2)
+        transfer_kwargs = mock_transfer_create.call_args_list[0][1]
+        self.assertEqual(transfer_kwargs['amount'], 1500)
+        self.assertTrue(transfer_kwargs['transfer_group'].startswith('payout#'))
+        self.assertTrue(transfer_kwargs['transfer_group'].endswith('#producer-1'))
+        self.assertEqual(transfer_kwargs['idempotency_key'], transfer_kwargs['transfer_group'])
+
+        mark_settled_kwargs = mock_producer_earnings_table.update_item.call_args[1]
+        self.assertIn('REMOVE payoutStatus', mark_settled_kwargs['UpdateExpression'])
+
+    @patch('stripe.Transfer.list')
+    @patch('stripe.Transfer.create')
+    @patch('lambda_functions.settle_producer_payouts.app.producers_table')
+    @patch('lambda_functions.settle_producer_payouts.app.producer_earnings_table')
+    def test_lambda_handler_finishes_interrupted_payout(self, mock_producer_earnings_table, mock_producers_table, mock_transfer_create, mock_transfer_list):
+        mock_producer_earnings_table.query.side_effect = query_by_status([
+            build_earning('pi_1', 'producer-1', 1000, 'Settling', 'payout#2025-01-06T00:00:00#producer-1')
+        ])
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'acct_123'}}
+        mock_transfer_list.return_value = MagicMock(data=[MagicMock(id='tr_existing')])
+
+        summary = lambda_handler({}, None)
+
+        # The transfer was already made, so the earning is only marked settled
+        self.assertEqual(summary['payouts'], 1)
+        mock_transfer_list.assert_called_once_with(transfer_group='payout#2025-01-06T00:00:00#producer-1', limit=1)
+        mock_transfer_create.assert_not_called()
+        mark_settled_kwargs = mock_producer_earnings_table.update_item.call_args[1]
+        self.assertEqual(mark_settled_kwargs['ExpressionAttributeValues'][':transfer_id'], 'tr_existing')
+
+    @patch('stripe.Transfer.create')
+    @patch('lambda_functions.settle_producer_payouts.app.producers_table')
+    @patch('lambda_functions.settle_producer_payouts.app.producer_earnings_table')
+    def test_lambda_handler_leaves_failed_payout_for_next_run(self, mock_producer_earnings_table, mock_producers_table, mock_transfer_create):
+        mock_producer_earnings_table.query.side_effect = query_by_status([build_earning('pi_1', 'producer-1', 1000)])
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'acct_123'}}
+        mock_transfer_create.side_effect = stripe.error.InvalidRequestError('Insufficient funds', param='amount')
+
+        summary = lambda_handler({}, None)
+
+        self.assertEqual(summary['payouts'], 0)
+        self.assertEqual(summary['failed'], 1)
+        # Only the claim was written; the earning stays Settling
+        self.assertEqual(mock_producer_earnings_table.update_item.call_count, 1)
+
+    @patch('lambda_functions.settle_producer_payouts.app.producer_earnings_table')
+    def test_claim_earnings_skips_earnings_already_claimed(self, mock_producer_earnings_table):
+        mock_producer_earnings_table.update_item.side_effect = [
+            None,
+            ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}, 'UpdateItem')
+        ]
+
+        claimed = claim_earnings([build_earning('pi_1', 'producer-1', 1000), build_earning('pi_2', 'producer-1', 500)], 'payout-1')
+
+        self.assertEqual([earning['earningId'] for earning in claimed], ['pi_1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -91,3 +91,16 @@ def test_lambda_handler_partial_update(mock_dynamodb, apigw_event):
     assert response['statusCode'] == 200
     body = json.loads(response['body'])
     assert body['message'] == "User details updated successfully"
+
+@patch('lambda_functions.store_new_user_details.app.dynamodb')
+def test_lambda_handler_email_change_invalidates_cached_email(mock_dynamodb, apigw_event):
+    with patch.dict(os.environ, {'NOTIFICATION_OUTBOX_TABLE_NAME': 'NotificationOutboxTable'}):
+        response = lambda_handler(apigw_event, "")
+
+    assert response['statusCode'] == 200
+    user_update, email_change_notice = mock_dynamodb.transact_write_items.call_args[1]['TransactItems']
+    assert user_update['Update']['Key'] == {'userId': {'S': 'user123'}}
+    assert email_change_notice['Put']['TableName'] == 'NotificationOutboxTable'
+    assert email_change_notice['Put']['Item']['notificationType'] == {'S': 'UserEmailChanged'}
+    assert email_change_notice['Put']['Item']['recipientConsumerId'] == {'S': 'consumer123'}
+    assert 'notificationStatus' not in email_change_notice['Put']['Item']
@@ -0,0 +1,85 @@
+import base64
+import gzip
+import json
+import unittest
+from decimal import Decimal
+from unittest.mock import patch, MagicMock
+from botocore.exceptions import ClientError
+from lambda_functions.store_payment_audit_records.app import lambda_handler, redrive_lambda_handler, parse_payment_audit_record
+
+
+def build_logs_event(messages):
+    log_data = {
+        'logGroup': '/social-charger-club/dev/process-payment',
+        'logEvents': [{'id': str(index), 'timestamp': 0, 'message': message} for index, message in enumerate(messages)]
+    }
+    return {'awslogs': {'data': base64.b64encode(gzip.compress(json.dumps(log_data).encode())).decode()}}
+
+def build_audit_line(transaction_id, amount=1000):
+    return 'PAYMENT_AUDIT ' + json.dumps({'transactionId': transaction_id, 'consumerId': 'consumer123', 'amount': amount, 'isSuccessful': False})
+
+def build_dead_letter_record(message_id, messages):
+    failed_invocation = {
+        'version': '1.0',
+        'requestContext': {'condition': 'RetriesExhausted', 'approximateInvokeCount': 3},
+        'requestPayload': build_logs_event(messages)
+    }
+    return {'messageId': message_id, 'body': json.dumps(failed_invocation)}
+
+
+class TestStorePaymentAuditRecords(unittest.TestCase):
+
+    @patch('lambda_functions.store_payment_audit_records.app.transactions_table')
+    def test_lambda_handler_writes_audit_records_in_batch(self, mock_transactions_table):
+        mock_batch = MagicMock()
+        mock_transactions_table.batch_writer.return_value.__enter__.return_value = mock_batch
+
+        response = lambda_handler(build_logs_event([
+            build_audit_line('txn-1'),
+            'Error: unrelated log line',
+            build_audit_line('txn-2', amount=12.5)
+        ]), None)
+
+        self.assertEqual(response, {'stored': 2})
+        mock_transactions_table.batch_writer.assert_called_once_with(overwrite_by_pkeys=['transactionId'])
+        items = [call[1]['Item'] for call in mock_batch.put_item.call_args_list]
+        self.assertEqual([item['transactionId'] for item in items], ['txn-1', 'txn-2'])
+        self.assertEqual(items[1]['amount'], Decimal('12.5'))
+
+    @patch('lambda_functions.store_payment_audit_records.app.transactions_table')
+    def test_lambda_handler_merges_successful_payment_into_reconciled_item(self, mock_transactions_table):
+        mock_batch = MagicMock()
+        mock_transactions_table.batch_writer.return_value.__enter__.return_value = mock_batch
+        audit_line = 'PAYMENT_AUDIT ' + json.dumps({'transactionId': 'pi_1', 'paymentIntentId': 'pi_1', 'amount': 1000, 'isSuccessful': True})
+
+        lambda_handler(build_logs_event([audit_line]), None)
+
+        mock_batch.put_item.assert_not_called()
+        update_kwargs = mock_transactions_table.update_item.call_args[1]
+        self.assertEqual(update_kwargs['Key'], {'transactionId': 'pi_1'})
+        self.assertEqual(sorted(update_kwargs['ExpressionAttributeNames'].values()), ['amount', 'isSuccessful', 'paymentIntentId'])
+
+    def test_parse_payment_audit_record_unwraps_json_log_format(self):
+        wrapped = json.dumps({'timestamp': '2025-01-06T09:00:00Z', 'level': 'INFO', 'message': build_audit_line('txn-1')})
+
+        self.assertEqual(parse_payment_audit_record(wrapped)['transactionId'], 'txn-1')
+        self.assertIsNone(parse_payment_audit_record('PAYMENT_AUDIT {not json'))
+
+
+    @patch('lambda_functions.store_payment_audit_records.app.transactions_table')
+    def test_redrive_lambda_handler_stores_dead_lettered_deliveries(self, mock_transactions_table):
+        mock_batch = MagicMock()
+        mock_transactions_table.batch_writer.return_value.__enter__.return_value = mock_batch
+        # The first delivery is written, the second still fails and stays on the queue
+        mock_batch.put_item.side_effect = [None, ClientError({'Error': {'Code': 'InternalServerError', 'Message': 'DynamoDB error'}}, 'BatchWriteItem')]
+
+        response = redrive_lambda_handler({'Records': [
+            build_dead_letter_record('message-1', [build_audit_line('txn-1')]),
+            build_dead_letter_record('message-2', [build_audit_line('txn-2')])
+        ]}, None)
+
+        self.assertEqual(response, {'batchItemFailures': [{'itemIdentifier': 'message-2'}]})
+        self.assertEqual([call[1]['Item']['transactionId'] for call in mock_batch.put_item.call_args_list], ['txn-1', 'txn-2'])
+
+if __name__ == '__main__':
+    unittest.main()
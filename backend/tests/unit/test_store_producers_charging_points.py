@@ -48,6 +48,8 @@ def test_lambda_handler_success(mock_dynamodb, apigw_event):
     body = json.loads(response['body'])
     assert body['message'] == "Charging points added successfully"
     mock_dynamodb.put_item.assert_called()  # Ensure put_item was called
+    # The charger is indexed by the geohash cell it falls in
+    assert mock_dynamodb.put_item.call_args[1]['Item']['geohash'] == {'S': 'dr5re'}
 
 @patch('lambda_functions.store_producers_charging_points.app.dynamodb')
 def test_lambda_handler_missing_latitude(mock_dynamodb, apigw_event):
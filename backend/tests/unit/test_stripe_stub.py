@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch
+import json
+import stripe
+import lambda_functions.process_payment.app as process_payment_app
+from lambda_functions.process_payment.app import lambda_handler
+from tests.benchmark.stripe_stub import StripeStub
+
+
+def build_payment_event(idempotency_key):
+    return {
+        'httpMethod': 'POST',
+        'headers': {'Idempotency-Key': idempotency_key},
+        'body': json.dumps({
+            'paymentMethodId': 'pm_card_visa',
+            'amount': 1000,
+            'consumerId': 'consumer123',
+            'producerId': 'producer123',
+            'chargingPointId': 'cp123',
+            'oocpChargePointId': 'oocp123'
+        })
+    }
+
+
+@patch('lambda_functions.process_payment.app.audit_payment')
+@patch('lambda_functions.process_payment.app.payment_idempotency_table')
+@patch('lambda_functions.process_payment.app.producers_table')
+@patch('lambda_functions.process_payment.app.customer_payment_info_table')
+class TestProcessPaymentAgainstStripeStub(unittest.TestCase):
+
+    def setUp(self):
+        process_payment_app.producer_account_cache.clear()
+        self.original_api_base = stripe.api_base
+
+    def tearDown(self):
+        stripe.api_base = self.original_api_base
+
+    def start_stub(self, **options):
+        stub = StripeStub(**options)
+        self.addCleanup(stub.stop)
+        stripe.api_base = stub.start()
+        return stub
+
+    def test_successful_payment_goes_through_stripe_sdk(self, mock_customer_payment_info_table, mock_producers_table, mock_idempotency_table, mock_audit_payment):
+        stub = self.start_stub()
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'acct_123'}}
+        mock_customer_payment_info_table.get_item.return_value = {}
+
+        response = lambda_handler(build_payment_event('key-123'), {})
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertTrue(body['payment_intent'].startswith('pi_'))
+        self.assertEqual(stub.request_counts, {'/v1/payment_intents': 1, '/v1/transfers': 1})
+        self.assertEqual(stub.transfers[0]['destination'], 'acct_123')
+        self.assertEqual(stub.transfers[0]['amount'], 1000)
+
+    def test_declined_card_is_a_stripe_error(self, mock_customer_payment_info_table, mock_producers_table, mock_idempotency_table, mock_audit_payment):
+        stub = self.start_stub(decline_rate=1.0)
+        mock_producers_table.get_item.return_value = {'Item': {'stripeAccountId': 'acct_123'}}
+        mock_customer_payment_info_table.get_item.return_value = {}
+
+        response = lambda_handler(build_payment_event('key-123'), {})
+
+        self.assertEqual(response['statusCode'], 400)
+        self.assertIn('Stripe error', json.loads(response['body'])['error'])
+        self.assertEqual(stub.transfers, [])
+
+    def test_stub_replays_idempotent_requests(self, *mocks):
+        stub = self.start_stub()
+        stripe_sdk = process_payment_app.get_stripe()
+
+        first = stripe_sdk.Transfer.create(amount=500, currency='gbp', destination='acct_123', idempotency_key='transfer-1')
+        second = stripe_sdk.Transfer.create(amount=500, currency='gbp', destination='acct_123', idempotency_key='transfer-1')
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(len(stub.transfers), 1)
+
+if __name__ == '__main__':
+    unittest.main()